@@ -0,0 +1,279 @@
+import numpy as np
+from ClueDo import ClueGame
+from Knowledge import HAS_CARD, UNKNOWN, NOT_HAS_CARD
+
+class BatchResult:
+
+    # outcome of each game in a batch: the seat of the winner (-1 if nobody accused correctly), the number of turns taken,
+    # the turn of each seat's accusation (-1 if it made none) and whether it was wrong
+    def __init__(self, winners, n_turns, accusation_turns, wrong_accusations):
+        self.winners = winners
+        self.n_turns = n_turns
+        self.accusation_turns = accusation_turns
+        self.wrong_accusations = wrong_accusations
+
+    # fraction of games won from each seat
+    def win_rates(self):
+        return np.array([(self.winners == seat).mean() for seat in range(self.wrong_accusations.shape[1])])
+
+class BatchSimulator:
+
+    # initialize with the characters playing and the number of games to play in lockstep; every seat plays ClueGame's rules
+    # without the solver and the sampler: it heads for the rooms no player is known to hold (all weighted equally) and
+    # suggests the top card of each category by score, as get_top_suggestions does when the solver cannot be used
+    def __init__(self, players, n_games, seed = None, max_turns = 500, max_constraints = 64, max_iterations = 50):
+        assert all([player in ClueGame.characters for player in players])
+        self.players = [player for player in ClueGame.player_order if player in players]
+        self.n_games = n_games
+        self.n_players = len(self.players)
+        self.rng = np.random.default_rng(seed)
+        self.max_turns = max_turns
+        self.max_constraints = max_constraints
+        self.max_iterations = max_iterations
+        registry = ClueGame.registry
+        self.n_cards = registry.n_cards
+        self.category_slices = list(registry.category_slices.values())
+        self.card_bits = np.left_shift(np.int64(1), np.arange(self.n_cards, dtype = np.int64))
+        # cards dealt round robin from the first seat give every game the same hand sizes
+        self.hand_sizes = np.array([len(range(seat, self.n_cards - 3, self.n_players)) for seat in range(self.n_players)])
+
+        # board lookups: the room card at each square (-1 off the rooms), and the squares reachable with each roll
+        planner = ClueGame.movement_planner
+        self.planner = planner
+        n_squares = planner.board.index.n_squares
+        self.room_ids = registry.ids(sorted(ClueGame.locations))
+        self.room_card_at = np.full(n_squares, -1, dtype = np.intp)
+        self.room_square_of_card = np.full(self.n_cards, -1, dtype = np.intp)
+        for room_id in self.room_ids:
+            self.room_square_of_card[room_id] = ClueGame.room_locations[registry.cards[room_id]]
+            self.room_card_at[self.room_square_of_card[room_id]] = room_id
+        self.reachable = np.zeros((13, n_squares, n_squares), dtype = bool)
+        for roll, reachable in planner.tables()['reachable'].items():
+            self.reachable[roll] = reachable
+        # seat of the player named by each character card (-1 if the character is not playing)
+        self.seat_of_card = np.full(self.n_cards, -1, dtype = np.intp)
+        for seat, player in enumerate(self.players):
+            self.seat_of_card[registry.id(player)] = seat
+        self.deal()
+
+    # deal every game: one envelope card per category, and the other cards shuffled round robin into the hands (as bitmasks)
+    def deal(self):
+        games = np.arange(self.n_games)
+        keys = self.rng.random((self.n_games, self.n_cards))
+        self.envelopes = np.stack([category_slice.start + self.rng.integers(category_slice.stop - category_slice.start, size = self.n_games)
+                                   for category_slice in self.category_slices], axis = 1)
+        keys[games[:, None], self.envelopes] = 2.0
+        order = np.argsort(keys, axis = 1)[:, :self.n_cards - 3]
+        seats = np.arange(self.n_cards - 3) % self.n_players
+        self.hands = np.zeros((self.n_games, self.n_players), dtype = np.int64)
+        for seat in range(self.n_players):
+            self.hands[:, seat] = self.card_bits[order[:, seats == seat]].sum(axis = 1)
+
+        # knowledge[game, seat, player, card] is what each seat knows, as in ClueGame.knowledge
+        owners = self.holds(self.hands)
+        self.knowledge = np.zeros((self.n_games, self.n_players, self.n_players, self.n_cards), dtype = np.int8)
+        self.knowledge[:] = np.where(owners[:, :, None, :], NOT_HAS_CARD, UNKNOWN)
+        seat_index = np.arange(self.n_players)
+        self.knowledge[:, seat_index, seat_index] = np.where(owners, HAS_CARD, NOT_HAS_CARD)
+        # cards each seat still thinks could be in the envelope, as ClueGame.envelope
+        self.envelope_possible = ~owners
+        # constraints of each seat that a player holds one of the cards in a bitmask
+        self.constraint_players = np.zeros((self.n_games, self.n_players, self.max_constraints), dtype = np.intp)
+        self.constraint_masks = np.zeros((self.n_games, self.n_players, self.max_constraints), dtype = np.int64)
+        self.n_constraints = np.zeros((self.n_games, self.n_players), dtype = np.intp)
+
+        self.positions = np.tile(np.array([ClueGame.char_starting_positions[player] for player in self.players]), (self.n_games, 1))
+        self.active = np.ones((self.n_games, self.n_players), dtype = bool)
+        self.current = np.zeros(self.n_games, dtype = np.intp)
+        self.n_turns = np.zeros(self.n_games, dtype = np.intp)
+        self.winners = np.full(self.n_games, -1, dtype = np.intp)
+        self.finished = np.zeros(self.n_games, dtype = bool)
+        self.accusation_turns = np.full((self.n_games, self.n_players), -1, dtype = np.intp)
+        self.wrong_accusations = np.zeros((self.n_games, self.n_players), dtype = bool)
+        self.propagate()
+
+    # which cards are set in each bitmask, as a boolean array with a trailing card axis
+    def holds(self, masks):
+        return (masks[..., None] & self.card_bits) != 0
+
+    # bitmask of the set entries along the trailing card axis
+    def pack(self, flags):
+        return flags.astype(np.int64) @ self.card_bits
+
+    # apply ClueGame's deduction rules to every seat of the given games until nothing changes: constraints with one card left,
+    # a held card is held by nobody else, the hand-size rules, a category with one card not held has it in the envelope, and
+    # once a category's envelope card is known every other card of the category is held by someone
+    def propagate(self, games = None):
+        games = np.arange(self.n_games) if games is None else games
+        updated = games
+        hand_sizes = self.hand_sizes[None, None, :, None]
+        for iteration in range(self.max_iterations):
+            if len(games) == 0:
+                break
+            knowledge = self.knowledge[games]
+            before = knowledge.copy()
+            # only the constraint slots in use by some seat of these games are examined
+            n_slots = int(self.n_constraints[games].max())
+            if n_slots > 0:
+                players = self.constraint_players[games, :, :n_slots]
+                masks = self.constraint_masks[games, :, :n_slots]
+                valid = np.arange(n_slots) < self.n_constraints[games][:, :, None]
+                player_has = np.take_along_axis(self.pack(knowledge == HAS_CARD), players, axis = 2)
+                player_unknown = np.take_along_axis(self.pack(knowledge == UNKNOWN), players, axis = 2)
+                remaining = masks & player_unknown
+                single = valid & ((masks & player_has) == 0) & (remaining != 0) & ((remaining & (remaining - 1)) == 0)
+                if single.any():
+                    rows, seats, slots = np.nonzero(single)
+                    knowledge[rows, seats, players[single], np.log2(remaining[single]).astype(np.intp)] = HAS_CARD
+            held = knowledge == HAS_CARD
+            knowledge[held.any(axis = 2, keepdims = True) & ~held] = NOT_HAS_CARD
+            n_has = (knowledge == HAS_CARD).sum(axis = 3, keepdims = True)
+            unknown = knowledge == UNKNOWN
+            n_unknown = unknown.sum(axis = 3, keepdims = True)
+            knowledge[unknown & (n_has >= hand_sizes)] = NOT_HAS_CARD
+            knowledge[unknown & (n_has < hand_sizes) & (n_has + n_unknown == hand_sizes)] = HAS_CARD
+            held = (knowledge == HAS_CARD).any(axis = 2)
+            for category_slice in self.category_slices:
+                not_held = ~held[:, :, category_slice]
+                last = not_held & (not_held.sum(axis = 2, keepdims = True) == 1)
+                view = knowledge[:, :, :, category_slice]
+                view[np.broadcast_to(last[:, :, None, :], view.shape)] = NOT_HAS_CARD
+                # a card that is not held and not in the known envelope card is held by its only possible holder
+                candidates = view != NOT_HAS_CARD
+                in_envelope = ~candidates.any(axis = 2)
+                unplaced = ~(view == HAS_CARD).any(axis = 2) & ~in_envelope & (in_envelope.sum(axis = 2, keepdims = True) == 1)
+                view[candidates & (unplaced & (candidates.sum(axis = 2) == 1))[:, :, None, :]] = HAS_CARD
+            self.knowledge[games] = knowledge
+            # games where nothing changed have nothing more to deduce
+            games = games[(knowledge != before).any(axis = (1, 2, 3))]
+        # the envelope mask, as in update_possible_guesses
+        knowledge = self.knowledge[updated]
+        envelope_possible = self.envelope_possible[updated] & ~(knowledge == HAS_CARD).any(axis = 2)
+        in_envelope = (knowledge == NOT_HAS_CARD).all(axis = 2)
+        for category_slice in self.category_slices:
+            known = in_envelope[:, :, category_slice]
+            envelope_possible[:, :, category_slice] &= np.where(known.any(axis = 2, keepdims = True), known, True)
+        self.envelope_possible[updated] = envelope_possible
+
+    # random choice among the True entries of each row (rows with none give an arbitrary index)
+    def choose(self, flags):
+        return np.argmax(np.where(flags, self.rng.random(flags.shape), -1.0), axis = -1)
+
+    # move the seat whose turn it is in each game, as move_on_board does with unweighted rooms
+    def move(self, games, seats, rolls):
+        room_knowledge = self.knowledge[games, seats][:, :, self.room_ids]
+        possible_rooms = ~(room_knowledge == HAS_CARD).any(axis = 1)
+        room_masks = possible_rooms.astype(np.int64) @ (1 << np.arange(len(self.room_ids)))
+        unique_masks, inverse = np.unique(room_masks, return_inverse = True)
+        landings = np.stack([self.landing(mask) for mask in unique_masks])[inverse]
+        reachable = self.reachable[rolls, self.positions[games, seats]]
+        values = np.where(reachable, landings, np.inf)
+        best = reachable & np.isclose(values, values.min(axis = 1, keepdims = True), atol = self.planner.tolerance, rtol = 0)
+        self.positions[games, seats] = self.choose(best)
+
+    # value of ending a move on each square, for the set of target rooms in a bitmask
+    def landing(self, room_mask):
+        rooms = [ClueGame.registry.cards[room_id] for bit, room_id in enumerate(self.room_ids) if room_mask >> bit & 1]
+        return self.planner.expected_turns(self.planner.room_costs(rooms))[1]
+
+    # the top character and weapon by score for each suggester, as get_top_suggestions does without the solver
+    def suggestions(self, games, seats, rooms):
+        knowledge = self.knowledge[games, seats]
+        preferences = np.where((knowledge == HAS_CARD).any(axis = 1), -np.inf, -knowledge.sum(axis = 1, dtype = np.int16).astype(float))
+        top_cards = [category_slice.start + np.argmax(preferences[:, category_slice], axis = 1) for category_slice in self.category_slices[:2]]
+        return np.stack(top_cards + [rooms], axis = 1)
+
+    # answer each game's suggestion in order after the suggester, and update every seat's knowledge with what it sees
+    def answer(self, games, seats, cards):
+        n = len(games)
+        seat_index = np.arange(self.n_players)
+        # the suggested character is moved to the room
+        moved = self.seat_of_card[cards[:, 0]] >= 0
+        self.positions[games[moved], self.seat_of_card[cards[moved, 0]]] = self.room_square_of_card[cards[moved, 2]]
+
+        # order in which each seat is asked (the suggester is never asked), and the first seat holding a suggested card
+        ranks = (seat_index[None, :] - seats[:, None]) % self.n_players - 1
+        ranks[ranks < 0] = self.n_players
+        holding = self.holds(self.hands[games])[np.arange(n)[:, None, None], seat_index[None, :, None], cards[:, None, :]]
+        can_show = holding.any(axis = 2)
+        shower_ranks = np.where(can_show, ranks, self.n_players).min(axis = 1)
+        shown = shower_ranks < self.n_players
+        shower = np.argmax(ranks == shower_ranks[:, None], axis = 1)
+
+        # seats asked before the shower hold none of the cards, which every other seat learns
+        no_show = ranks < shower_ranks[:, None]
+        index = np.broadcast_to(cards[:, None, None, :], (n, self.n_players, self.n_players, 3))
+        values = np.take_along_axis(self.knowledge[games], index, axis = 3)
+        learns = no_show[:, None, :, None] & (seat_index[:, None] != seat_index[None, :])[None, :, :, None] & (values == UNKNOWN)
+        values = np.where(learns, NOT_HAS_CARD, values)
+        knowledge = self.knowledge[games]
+        np.put_along_axis(knowledge, index, values, axis = 3)
+        self.knowledge[games] = knowledge
+
+        # the suggester sees the card shown (chosen at random among the ones held), the other seats only that one was shown
+        shown_games, shown_seats, shown_showers = games[shown], seats[shown], shower[shown]
+        shown_cards = cards[shown, self.choose(holding[shown, shown_showers])]
+        self.knowledge[shown_games, shown_seats, shown_showers, shown_cards] = HAS_CARD
+        masks = self.card_bits[cards[shown]].sum(axis = 1)
+        for observer in range(self.n_players):
+            adds = (observer != shown_seats) & (observer != shown_showers)
+            add_games = shown_games[adds]
+            slots = self.n_constraints[add_games, observer]
+            # constraints past the capacity are dropped, losing only information
+            fits = slots < self.max_constraints
+            self.constraint_players[add_games[fits], observer, slots[fits]] = shown_showers[adds][fits]
+            self.constraint_masks[add_games[fits], observer, slots[fits]] = masks[adds][fits]
+            self.n_constraints[add_games[fits], observer] += 1
+
+    # accuse for the seat whose turn it is if it knows one card in each category, as get_accusation does without the solver
+    def accuse(self, games, seats):
+        possible = self.envelope_possible[games, seats]
+        in_envelope = (self.knowledge[games, seats] == NOT_HAS_CARD).all(axis = 1)
+        known_cards = []
+        ready = np.ones(len(games), dtype = bool)
+        for category_slice in self.category_slices:
+            known = in_envelope[:, category_slice] | (possible[:, category_slice] & (possible[:, category_slice].sum(axis = 1, keepdims = True) == 1))
+            ready &= known.any(axis = 1)
+            known_cards.append(category_slice.start + np.argmax(known, axis = 1))
+        accusations = np.stack(known_cards, axis = 1)
+        games, seats, accusations = games[ready], seats[ready], accusations[ready]
+        correct = (accusations == self.envelopes[games]).all(axis = 1)
+        self.accusation_turns[games, seats] = self.n_turns[games] + 1
+        self.winners[games[correct]] = seats[correct]
+        self.finished[games[correct]] = True
+        wrong_games, wrong_seats, wrong_accusations = games[~correct], seats[~correct], accusations[~correct]
+        self.wrong_accusations[wrong_games, wrong_seats] = True
+        self.active[wrong_games, wrong_seats] = False
+        # every other seat learns that the three cards are not all in the envelope, as in observe_failed_accusation
+        in_envelope = (self.knowledge[wrong_games] == NOT_HAS_CARD).all(axis = 2)
+        accused_in_envelope = np.take_along_axis(in_envelope, np.broadcast_to(wrong_accusations[:, None, :], (len(wrong_games), self.n_players, 3)), axis = 2)
+        third = accused_in_envelope.sum(axis = 2) == 2
+        rows, observers = np.nonzero(third & (np.arange(self.n_players)[None, :] != wrong_seats[:, None]))
+        cards = wrong_accusations[rows, np.argmax(~accused_in_envelope[rows, observers], axis = 1)]
+        self.envelope_possible[wrong_games[rows], observers, cards] = False
+
+    # play one turn in every unfinished game
+    def step(self):
+        games = np.flatnonzero(~self.finished)
+        seats = self.current[games]
+        rolls = self.rng.integers(1, 7, size = (len(games), 2)).sum(axis = 1)
+        self.move(games, seats, rolls)
+        rooms = self.room_card_at[self.positions[games, seats]]
+        in_room = rooms >= 0
+        if in_room.any():
+            self.answer(games[in_room], seats[in_room], self.suggestions(games[in_room], seats[in_room], rooms[in_room]))
+        self.propagate(games)
+        self.accuse(games, seats)
+        self.n_turns[games] += 1
+        # the next seat that is still active takes the next turn
+        offsets = np.arange(1, self.n_players + 1)
+        following = (seats[:, None] + offsets[None, :]) % self.n_players
+        next_active = self.active[games[:, None], following]
+        self.current[games] = following[np.arange(len(games)), np.argmax(next_active, axis = 1)]
+        self.finished[games] |= ~next_active.any(axis = 1) | (self.n_turns[games] >= self.max_turns)
+
+    # play every game to the end
+    def run(self):
+        while not self.finished.all():
+            self.step()
+        return BatchResult(self.winners, self.n_turns, self.accusation_turns, self.wrong_accusations)
@@ -0,0 +1,210 @@
+import argparse
+import copy
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import numpy as np
+from ClueDo import ClueGame
+from HeadlessGame import HeadlessGame
+from BatchSimulator import BatchSimulator
+from Tournament import STRATEGIES
+from EnvelopeSolver import EnvelopeSolver
+
+# players, seeds and number of turns played to reach the mid-game knowledge states that are benchmarked
+STATE_PLAYERS = ['Miss Scarlett', 'Colonel Mustard', 'Dr Orchid', 'Rev Green']
+STATE_SEEDS = [11, 12, 13, 14, 15]
+STATE_TURNS = 12
+
+# bots of several seeded headless games, stopped part way through so their knowledge is realistic
+def mid_game_states(seeds = STATE_SEEDS, n_turns = STATE_TURNS):
+    states = []
+    for seed in seeds:
+        game = HeadlessGame(STATE_PLAYERS, seed, {player: STRATEGIES['information'] for player in STATE_PLAYERS})
+        for turn in range(n_turns):
+            if game.winner is not None:
+                break
+            game.take_turn(game.players[turn % len(game.players)])
+        states.extend(game.bots.values())
+    return states
+
+# time a function over fresh copies of the states: setup(state, rng) prepares each copy (untimed) and returns the arguments
+# to call the function with; one untimed call on every state first fills the shared tables (e.g. the movement planner's),
+# so that the steady state is measured; returns summary statistics of the times in seconds
+def time_calls(states, setup, function, repeats, seed = 0):
+    rng = np.random.default_rng(seed)
+    for state in states:
+        state = copy.deepcopy(state)
+        function(state, *setup(state, rng))
+    rng = np.random.default_rng(seed)
+    times = []
+    for repeat in range(repeats):
+        state = copy.deepcopy(states[repeat % len(states)])
+        args = setup(state, rng)
+        start = time.perf_counter()
+        function(state, *args)
+        times.append(time.perf_counter() - start)
+    return summarise(times)
+
+def summarise(times):
+    return {'repeats': len(times), 'median_s': float(np.median(times)), 'min_s': float(np.min(times)), 'mean_s': float(np.mean(times))}
+
+# a fresh observation for propagation to work through: one player showed one of three random cards to somebody else
+def new_show(state, rng):
+    player = state.other_players[rng.integers(len(state.other_players))]
+    cards = [sorted(category)[rng.integers(len(category))] for category in (ClueGame.characters, ClueGame.weapons, ClueGame.locations)]
+    state.deduction.add_constraint(state.player_registry.id(player), ClueGame.registry.ids(cards), state.current_round)
+    return (player,)
+
+# a fresh observation: one player has none of three random cards
+def new_no_show(state, rng):
+    player = state.other_players[rng.integers(len(state.other_players))]
+    for category in (ClueGame.characters, ClueGame.weapons, ClueGame.locations):
+        state.deduction.set_not_has(state.player_registry.id(player), ClueGame.registry.id(sorted(category)[rng.integers(len(category))]))
+    return ()
+
+# drop the cached solver result, so that decisions using the envelope probabilities solve again
+def fresh_solution(state, rng):
+    state.solution_key = None
+    return ()
+
+# solve for the envelope probabilities ahead of time, so that decisions using them only read the cached result
+def solved(state):
+    state.envelope_solution()
+    return ()
+
+# time a fresh interpreter started with the given arguments in the source directory (e.g. to import a module), until it exits
+def time_start(arguments, repeats):
+    times = []
+    for repeat in range(repeats):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + arguments, stdout = subprocess.DEVNULL, stderr = subprocess.DEVNULL,
+                       cwd = os.path.dirname(os.path.abspath(__file__)))
+        times.append(time.perf_counter() - start)
+    return summarise(times)
+
+# arguments starting a non-interactive game that stops at its first question, as its script of answers is empty
+PLAY_GAME_ARGUMENTS = ['PlayGame.py', '--players'] + STATE_PLAYERS + ['--seat', STATE_PLAYERS[0], '--cards', 'Rope', 'Hall', 'Prof Plum',
+                                                                      '--script', os.devnull]
+
+# headless games per second for a strategy
+def time_headless_games(n_games, strategy, seed = 0):
+    players = STATE_PLAYERS
+    seeds = np.random.SeedSequence(seed).spawn(n_games)
+    start = time.perf_counter()
+    n_turns = 0
+    for game_seed in seeds:
+        n_turns += HeadlessGame(players, game_seed, {player: STRATEGIES[strategy] for player in players}).play().n_turns
+    elapsed = time.perf_counter() - start
+    return {'games': n_games, 'seconds': elapsed, 'games_per_s': n_games / elapsed, 'turns_per_s': n_turns / elapsed}
+
+# batched games per second (after one batch to fill the planner's tables)
+def time_batch_games(n_games, seed = 0):
+    BatchSimulator(STATE_PLAYERS, n_games, seed).run()
+    start = time.perf_counter()
+    result = BatchSimulator(STATE_PLAYERS, n_games, seed + 1).run()
+    elapsed = time.perf_counter() - start
+    return {'games': n_games, 'seconds': elapsed, 'games_per_s': n_games / elapsed, 'turns_per_s': int(result.n_turns.sum()) / elapsed}
+
+# turn limit of the games whose solves are timed, and the most a solve may take (at the 99th percentile and at worst)
+# before the benchmark reports a regression
+SOLVE_TURNS = 200
+SOLVE_BUDGETS = {'p99_s': 0.1, 'max_s': 0.5}
+
+# time every envelope solve of greedy games between six players (whose bots solve on every move, with the most owners to
+# count deals over), each game starting with a solver of its own so that its tables are built as in a fresh process
+def time_solves(n_games, seed = 0):
+    times = []
+    for game_seed in np.random.SeedSequence(seed).spawn(n_games):
+        game = HeadlessGame(ClueGame.player_order, game_seed, {player: STRATEGIES['greedy'] for player in ClueGame.player_order},
+                            SOLVE_TURNS)
+        solver = EnvelopeSolver(ClueGame.registry)
+        solve = solver.solve
+        def timed_solve(*args):
+            start = time.perf_counter()
+            result = solve(*args)
+            times.append(time.perf_counter() - start)
+            return result
+        solver.solve = timed_solve
+        for bot in game.bots.values():
+            bot.solver = solver
+        game.play()
+    return {**summarise(times), 'p99_s': float(np.percentile(times, 99)), 'max_s': float(np.max(times))}
+
+# timings over their budgets, as messages
+def check_budgets(results):
+    return ['%s %s of %.3f s is over the budget of %.3f s' % (name, key, results[name][key], budget)
+            for name, budgets in [('envelope_solves', SOLVE_BUDGETS)] if name in results
+            for key, budget in budgets.items() if results[name][key] > budget]
+
+# the commit the benchmarks were run on, if known
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output = True, text = True, check = True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# run every benchmark; quick runs use fewer repeats and games
+def run_benchmarks(quick = False):
+    repeats = 20 if quick else 200
+    states = mid_game_states()
+    results = {}
+    results['board_import'] = time_start(['-c', 'import BoardGraph'], 3 if quick else 10)
+    results['clue_import'] = time_start(['-c', 'import ClueDo'], 3 if quick else 10)
+    results['play_game_start'] = time_start(PLAY_GAME_ARGUMENTS, 3 if quick else 10)
+    results['get_path_lengths'] = time_calls(states, lambda state, rng: (), lambda state: state.get_path_lengths(), repeats)
+    results['move_on_board'] = time_calls(states, lambda state, rng: solved(state) + (int(rng.integers(1, 7, size = 2).sum()),),
+                                          lambda state, roll: state.move_on_board(roll), repeats)
+    results['move_on_board_solve'] = time_calls(states, lambda state, rng: fresh_solution(state, rng) + (int(rng.integers(1, 7, size = 2).sum()),),
+                                                lambda state, roll: state.move_on_board(roll), repeats)
+    results['update_possible_cards'] = time_calls(states, new_show, lambda state, player: state.update_possible_cards(player), repeats)
+    results['update_possible_guesses'] = time_calls(states, new_no_show, lambda state: state.update_possible_guesses(), repeats)
+    results['get_top_suggestions'] = time_calls(states, fresh_solution, lambda state: state.get_top_suggestions(), repeats)
+    results['envelope_solves'] = time_solves(2 if quick else 10)
+    results['headless_games_greedy'] = time_headless_games(2 if quick else 10, 'greedy')
+    results['headless_games_information'] = time_headless_games(1 if quick else 5, 'information')
+    results['batch_games'] = time_batch_games(500 if quick else 4000)
+    return results
+
+# ratio of each timing to the same timing in an earlier results file (above 1 is slower)
+def compare(results, baseline):
+    ratios = {}
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        if 'median_s' in result:
+            ratios[name] = result['median_s'] / baseline[name]['median_s']
+        else:
+            ratios[name] = baseline[name]['games_per_s'] / result['games_per_s']
+    return ratios
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description = 'Time the decision hot paths and full games, and write the results as JSON.')
+    parser.add_argument('--output', default = 'benchmark.json', help = 'file to write the results to')
+    parser.add_argument('--baseline', default = None, help = 'earlier results file to compare against')
+    parser.add_argument('--quick', action = 'store_true', help = 'use fewer repeats and games')
+    parser.add_argument('--tolerance', type = float, default = None,
+                        help = 'fail if a timing is more than this ratio of the baseline (and if a solve is over its budget)')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.quick)
+    report = {'commit': git_commit(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': platform.python_version(),
+              'numpy': np.__version__, 'machine': platform.machine(), 'quick': args.quick, 'results': results}
+    if args.baseline is not None:
+        with open(args.baseline) as baseline_file:
+            report['ratios'] = compare(results, json.load(baseline_file)['results'])
+    with open(args.output, 'w') as output_file:
+        json.dump(report, output_file, indent = 2)
+    json.dump(report, sys.stdout, indent = 2)
+    print()
+    if args.tolerance is not None:
+        failures = check_budgets(results)
+        failures += ['%s is %.2f times the baseline' % (name, ratio) for name, ratio in report.get('ratios', {}).items()
+                     if ratio > args.tolerance]
+        for failure in failures:
+            print(failure, file = sys.stderr)
+        if failures:
+            sys.exit(1)
@@ -1,298 +1,241 @@
+import os
+import json
 import numpy as np
+from DistanceIndex import DistanceIndex
+from MovementPlanner import room_turn_tables
 
-adj_mat = np.zeros((197,197))
-
-adj_mat[1,23] = 1
-adj_mat[2,6] = 1
-adj_mat[6,7] = 1
-adj_mat[6,10] = 1
-adj_mat[10,11] = 1
-adj_mat[11,7] = 1
-adj_mat[10,14] = 1
-adj_mat[11,15] = 1
-adj_mat[14,15] = 1
-adj_mat[24,14] = 1
-adj_mat[15,25] = 1
-adj_mat[24,25] = 1
-adj_mat[18,19] = 1
-adj_mat[19,20] = 1
-adj_mat[20,21] = 1
-adj_mat[21,22] = 1
-adj_mat[22,23] = 1
-adj_mat[24,25] = 1
-adj_mat[23,24] = 1
-adj_mat[18,29] = 1
-adj_mat[19,30] = 1
-adj_mat[20,31] = 1
-adj_mat[21,32] = 1
-adj_mat[22,33] = 1
-adj_mat[23,34] = 1
-adj_mat[24,35] = 1
-adj_mat[25,36] = 1
-adj_mat[29,30] = 1
-adj_mat[30,31] = 1
-adj_mat[31,32] = 1
-adj_mat[32,33] = 1
-adj_mat[33,34] = 1
-adj_mat[34,35] = 1
-adj_mat[35,36] = 1
-adj_mat[28,29] = 1
-adj_mat[34,39] = 1
-adj_mat[35,40] = 1
-adj_mat[36,41] = 1
-adj_mat[40,50] = 1
-adj_mat[41,51] = 1
-adj_mat[39,40] = 1
-adj_mat[40,41] = 1
-adj_mat[50,51] = 1
-adj_mat[51,52] = 1
-adj_mat[52,53] = 1
-adj_mat[53,54] = 1
-adj_mat[54,55] = 1
-adj_mat[55,56] = 1
-adj_mat[56,57] = 1
-adj_mat[54,3] = 1
-adj_mat[55,3] = 1
-adj_mat[4,9] = 1
-adj_mat[8,9] = 1
-adj_mat[8,12] = 1
-adj_mat[12,13] = 1
-adj_mat[9,13] = 1
-adj_mat[12,16] = 1
-adj_mat[16,17] = 1
-adj_mat[13,17] = 1
-adj_mat[16,26] = 1
-adj_mat[26,27] = 1
-adj_mat[17,27] = 1
-adj_mat[26,37] = 1
-adj_mat[37,38] = 1
-adj_mat[38,27] = 1
-adj_mat[37,42] = 1
-adj_mat[42,43] = 1
-adj_mat[43,38] = 1
-adj_mat[42,58] = 1
-adj_mat[57,58] = 1
-adj_mat[43,44] = 1
-adj_mat[5,44] = 1
-adj_mat[58,59] = 1
-adj_mat[43,59] = 1
-adj_mat[44,45] = 1
-adj_mat[45,46] = 1
-adj_mat[46,47] = 1
-adj_mat[47,48] = 1
-adj_mat[48,49] = 1
-adj_mat[44,60] = 1
-adj_mat[45,61] = 1
-adj_mat[46,62] = 1
-adj_mat[47,63] = 1
-adj_mat[48,64] = 1
-adj_mat[49,65] = 1
-adj_mat[59,60] = 1
-adj_mat[60,61] = 1
-adj_mat[61,62] = 1
-adj_mat[62,63] = 1
-adj_mat[63,64] = 1
-adj_mat[64,65] = 1
-adj_mat[65,66] = 1
-adj_mat[82,67] = 1
-adj_mat[50,67] = 1
-adj_mat[67,68] = 1
-adj_mat[68,51] = 1
-adj_mat[57,69] = 1
-adj_mat[58,70] = 1
-adj_mat[59,71] = 1
-adj_mat[60,72] = 1
-adj_mat[61,73] = 1
-adj_mat[62,74] = 1
-adj_mat[63,75] = 1
-adj_mat[64,76] = 1
-adj_mat[65,77] = 1
-adj_mat[69,70] = 1
-adj_mat[70,71] = 1
-adj_mat[71,72] = 1
-adj_mat[72,73] = 1
-adj_mat[73,74] = 1
-adj_mat[74,75] = 1
-adj_mat[75,76] = 1
-adj_mat[76,77] = 1
-adj_mat[72,87] = 1
-adj_mat[67,78] = 1
-adj_mat[78,79] = 1
-adj_mat[79,85] = 1
-adj_mat[78,84] = 1
-adj_mat[68,79] = 1
-adj_mat[84,85] = 1
-adj_mat[85,95] = 1
-adj_mat[84,94] = 1
-adj_mat[84,83] = 1
-adj_mat[83,93] = 1
-adj_mat[93,94] = 1
-adj_mat[94,95] = 1
-adj_mat[93,92] = 1
-adj_mat[92,91] = 1
-adj_mat[91,90] = 1
-adj_mat[89,90] = 1
-adj_mat[89,88] = 1
-adj_mat[93,99] = 1
-adj_mat[94,100] = 1
-adj_mat[95,101] = 1
-adj_mat[99,100] = 1
-adj_mat[100,101] = 1
-adj_mat[104,105] = 1
-adj_mat[105,106] = 1
-adj_mat[106,112] = 1
-adj_mat[112,111] = 1
-adj_mat[111,110] = 1
-adj_mat[110,115] = 1
-adj_mat[115,116] = 1
-adj_mat[115,109] = 1
-adj_mat[111,116] = 1
-adj_mat[112,117] = 1
-adj_mat[117,116] = 1
-adj_mat[117,118] = 1
-adj_mat[118,119] = 1
-adj_mat[119,120] = 1
-adj_mat[120,121] = 1
-adj_mat[121,122] = 1
-adj_mat[122,123] = 1
-adj_mat[123,124] = 1
-adj_mat[124,125] = 1
-adj_mat[125,126] = 1
-adj_mat[126,127] = 1
-adj_mat[124,114] = 1
-adj_mat[113,123] = 1
-adj_mat[113,114] = 1
-adj_mat[108,107] = 1
-adj_mat[108,114] = 1
-adj_mat[107,113] = 1
-adj_mat[108,103] = 1
-adj_mat[102,107] = 1
-adj_mat[102,103] = 1
-adj_mat[98,103] = 1
-adj_mat[98,97] = 1
-adj_mat[97,102] = 1
-adj_mat[97,85] = 1
-adj_mat[85,86] = 1
-adj_mat[86,98] = 1
-adj_mat[81,86] = 1
-adj_mat[81,80] = 1
-adj_mat[80,85] = 1
-adj_mat[69,80] = 1
-adj_mat[70,81] = 1
-adj_mat[115,128] = 1
-adj_mat[128,129] = 1
-adj_mat[129,130] = 1
-adj_mat[130,131] = 1
-adj_mat[131,132] = 1
-adj_mat[132,133] = 1
-adj_mat[133,134] = 1
-adj_mat[134,135] = 1
-adj_mat[135,136] = 1
-adj_mat[136,137] = 1
-adj_mat[138,137] = 1
-adj_mat[139,138] = 1
-adj_mat[140,139] = 1
-adj_mat[140,141] = 1
-adj_mat[141,142] = 1
-adj_mat[143,142] = 1
-adj_mat[143,144] = 1
-adj_mat[145,146] = 1
-adj_mat[103,87] = 1
-adj_mat[131,190] = 1
-adj_mat[136,190] = 1
-adj_mat[116,129] = 1
-adj_mat[117,130] = 1
-adj_mat[118,131] = 1
-adj_mat[119,132] = 1
-adj_mat[120,133] = 1
-adj_mat[121,134] = 1
-adj_mat[122,135] = 1
-adj_mat[123,136] = 1
-adj_mat[124,137] = 1
-adj_mat[125,138] = 1
-adj_mat[126,139] = 1
-adj_mat[127,140] = 1
-adj_mat[128,151] = 1
-adj_mat[129,152] = 1
-adj_mat[152,151] = 1
-adj_mat[151,150] = 1
-adj_mat[150,149] = 1
-adj_mat[149,148] = 1
-adj_mat[147,148] = 1
-adj_mat[147,146] = 1
-adj_mat[146,161] = 1
-adj_mat[161,162] = 1
-adj_mat[162,147] = 1
-adj_mat[162,163] = 1
-adj_mat[163,148] = 1
-adj_mat[164,149] = 1
-adj_mat[163,164] = 1
-adj_mat[164,165] = 1
-adj_mat[165,150] = 1
-adj_mat[165,166] = 1
-adj_mat[166,151] = 1
-adj_mat[166,167] = 1
-adj_mat[152,167] = 1
-adj_mat[165,186] = 1
-adj_mat[166,170] = 1
-adj_mat[167,171] = 1
-adj_mat[170,171] = 1
-adj_mat[171,190] = 1
-adj_mat[171,175] = 1
-adj_mat[170,174] = 1
-adj_mat[174,175] = 1
-adj_mat[174,178] = 1
-adj_mat[175,179] = 1
-adj_mat[178,179] = 1
-adj_mat[178,182] = 1
-adj_mat[182,183] = 1
-adj_mat[179,183] = 1
-adj_mat[183,187] = 1
-adj_mat[187,188] = 1
-adj_mat[188,189] = 1
-adj_mat[189,195] = 1
-adj_mat[138,153] = 1
-adj_mat[153,154] = 1
-adj_mat[139,154] = 1
-adj_mat[140,155] = 1
-adj_mat[141,156] = 1
-adj_mat[142,157] = 1
-adj_mat[143,158] = 1
-adj_mat[144,159] = 1
-adj_mat[154,155] = 1
-adj_mat[155,156] = 1
-adj_mat[156,157] = 1
-adj_mat[157,158] = 1
-adj_mat[158,159] = 1
-adj_mat[159,160] = 1
-adj_mat[153,168] = 1
-adj_mat[154,169] = 1
-adj_mat[169,168] = 1
-adj_mat[168,172] = 1
-adj_mat[172,190] = 1
-adj_mat[156,194] = 1
-adj_mat[169,173] = 1
-adj_mat[172,173] = 1
-adj_mat[173,177] = 1
-adj_mat[172,176] = 1
-adj_mat[176,177] = 1
-adj_mat[177,181] = 1
-adj_mat[181,180] = 1
-adj_mat[176,180] = 1
-adj_mat[181,185] = 1
-adj_mat[185,184] = 1
-adj_mat[180,184] = 1
-adj_mat[184,193] = 1
-adj_mat[193,192] = 1
-adj_mat[192,191] = 1
-adj_mat[191,196] = 1
-adj_mat[88,109] = 1
-adj_mat[90,82] = 1
-adj_mat[110,104] = 1
-
-adj_mat_tran = adj_mat.transpose()
-full_adj_mat = adj_mat + adj_mat_tran
-full_adj_mat[np.diag_indices(197)] = 1
-
-import networkx as nx
-board_graph = nx.from_numpy_array(full_adj_mat)
+# directory holding one sub-directory per board layout
+BOARD_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'boards')
+DEFAULT_BOARD = 'classic'
+
+# files making up a compiled board
+LAYOUT_FILE = 'board.json'
+COMPILED_FILE = 'compiled.json'
+TABLE_FILES = {'edges': 'edges.npy', 'distances': 'distances.npy', 'next_hop': 'next_hop.npy',
+               'room_turns': 'room_turns.npy', 'entry_probabilities': 'entry_probabilities.npy'}
+
+class Board:
+
+    # initialize with the directory of a board layout; tables are only loaded when first used
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, LAYOUT_FILE)) as layout_file:
+            self.layout = json.load(layout_file)
+        self.name = self.layout['name']
+        self.n_squares = self.layout['n_squares']
+        self.room_locations = self.layout['room_locations']
+        self.starting_positions = self.layout['starting_positions']
+        # pairs of rooms joined by a secret passage printed on the board (taken instead of moving, so they are not edges)
+        self.secret_passages = self.layout.get('secret_passages', [])
+        self._metadata = None
+        self._tables = None
+        self._index = None
+        self._graph = None
+        # distance indexes of the board with extra edges, by set of edges (shared by every overlay with the same edges)
+        self._overlay_indexes = {}
+
+    # digest of the layout file, used to tell whether the compiled tables are stale
+    def layout_digest(self):
+        import hashlib
+        with open(os.path.join(self.directory, LAYOUT_FILE), 'rb') as layout_file:
+            return hashlib.sha1(layout_file.read()).hexdigest()
+
+    # check whether compiled tables exist for the current layout
+    def is_compiled(self):
+        compiled_path = os.path.join(self.directory, COMPILED_FILE)
+        if not os.path.exists(compiled_path) or not all(os.path.exists(os.path.join(self.directory, file)) for file in TABLE_FILES.values()):
+            return False
+        with open(compiled_path) as compiled_file:
+            return json.load(compiled_file)['layout_digest'] == self.layout_digest()
+
+    # compute the tables for the layout and write them next to it
+    def compile(self):
+        tables = self.compute_tables()
+        for table, file in TABLE_FILES.items():
+            np.save(os.path.join(self.directory, file), tables[table])
+        metadata = self.compute_metadata(tables['edges'])
+        with open(os.path.join(self.directory, COMPILED_FILE), 'w') as compiled_file:
+            json.dump(metadata, compiled_file, indent = 4)
+        self._tables = None
+        self._metadata = None
+
+    # edge list, distance matrix and next-hop table of the layout, and the expected turns to each room (in order of name) and
+    # probabilities of entering it within each number of turns
+    def compute_tables(self):
+        edges = np.array(self.layout['edges'], dtype = np.int16).reshape(-1, 2)
+        index = DistanceIndex(Board.adjacency_from_edges(edges, self.n_squares))
+        room_squares = [self.room_locations[room] for room in sorted(self.room_locations)]
+        room_turns, entry_probabilities = room_turn_tables(index, room_squares, self.passage_squares)
+        return {'edges': edges, 'distances': index.distances, 'next_hop': index.next_hop,
+                'room_turns': room_turns, 'entry_probabilities': entry_probabilities}
+
+    # room and door information derived from the layout
+    def compute_metadata(self, edges):
+        adjacency = Board.adjacency_from_edges(edges, self.n_squares)
+        doors = {room: sorted(int(square) for square in np.flatnonzero(adjacency[location]) if square != location)
+                 for room, location in self.room_locations.items()}
+        return {'layout_digest': self.layout_digest(), 'n_edges': len(edges), 'doors': doors, 'rooms': sorted(self.room_locations)}
+
+    # build the adjacency matrix (including self loops, as the board always has) from an edge list
+    @staticmethod
+    def adjacency_from_edges(edges, n_squares):
+        adjacency = np.eye(n_squares, dtype = bool)
+        adjacency[edges[:, 0], edges[:, 1]] = True
+        adjacency[edges[:, 1], edges[:, 0]] = True
+        return adjacency
+
+    # compiled tables, memory mapped from disk (or computed in memory if they cannot be written)
+    @property
+    def tables(self):
+        if self._tables is None:
+            if not self.is_compiled():
+                try:
+                    self.compile()
+                except OSError:
+                    self._tables = self.compute_tables()
+                    return self._tables
+            self._tables = {table: np.load(os.path.join(self.directory, file), mmap_mode = 'r') for table, file in TABLE_FILES.items()}
+        return self._tables
+
+    # room and door metadata of the compiled board
+    @property
+    def metadata(self):
+        if self._metadata is None:
+            if self.is_compiled():
+                with open(os.path.join(self.directory, COMPILED_FILE)) as compiled_file:
+                    self._metadata = json.load(compiled_file)
+            else:
+                self._metadata = self.compute_metadata(self.tables['edges'])
+        return self._metadata
+
+    # squares adjacent to each room
+    @property
+    def doors(self):
+        return self.metadata['doors']
+
+    @property
+    def edges(self):
+        return self.tables['edges']
+
+    # pairs of squares joined by a secret passage
+    @property
+    def passage_squares(self):
+        return [(self.room_locations[room_a], self.room_locations[room_b]) for room_a, room_b in self.secret_passages]
+
+    # adjacency matrix of the board as it was laid out
+    @property
+    def adjacency(self):
+        return Board.adjacency_from_edges(np.asarray(self.edges), self.n_squares)
+
+    # distance index for path queries, sharing the memory mapped tables until an edge is added
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = DistanceIndex(self.adjacency, self.tables['distances'], self.tables['next_hop'])
+        return self._index
+
+    # networkx graph of the board, only built (and networkx only imported) when asked for
+    @property
+    def graph(self):
+        if self._graph is None:
+            import networkx as nx
+            adjacency = self.adjacency if self._index is None else self._index.adjacency.copy()
+            adjacency[np.diag_indices(self.n_squares)] = True
+            self._graph = nx.from_numpy_array(adjacency.astype(float))
+        return self._graph
+
+    # add an edge (e.g. a secret passage) to the board, for every game using it; games add their own edges to an overlay instead
+    def add_edge(self, square_a, square_b):
+        self.index.add_edge(square_a, square_b)
+        if self._graph is not None:
+            self._graph.add_edge(square_a, square_b)
+
+    # the board with no extra edges, for a game to add its own edges to
+    def overlay(self):
+        return BoardOverlay(self)
+
+    # distance index of the board with a set of extra edges, updated from the board's tables the first time the set is used
+    def overlay_index(self, edges):
+        if not edges:
+            return self.index
+        if edges not in self._overlay_indexes:
+            index = DistanceIndex(self.index.adjacency, np.array(self.index.distances), np.array(self.index.next_hop))
+            for square_a, square_b in sorted(edges):
+                index.add_edge(square_a, square_b)
+            self._overlay_indexes[edges] = index
+        return self._overlay_indexes[edges]
+
+    # path queries answered for the board and all of its overlays, for instrumentation
+    @property
+    def n_queries(self):
+        return self.index.n_queries + sum(index.n_queries for index in self._overlay_indexes.values())
+
+class BoardOverlay:
+
+    # a shared board plus the edges one game has added to it (e.g. secret passages); overlays never change, adding an edge gives
+    # a new overlay, so a game can be copied or forked without copying its board
+    def __init__(self, board, edges = frozenset()):
+        self.board = board
+        self.edges = frozenset(edges)
+
+    # the overlay with more edges added (itself if they are all there already)
+    def with_edges(self, edges):
+        new_edges = frozenset(tuple(sorted((int(square_a), int(square_b)))) for square_a, square_b in edges if square_a != square_b)
+        if new_edges <= self.edges:
+            return self
+        return BoardOverlay(self.board, self.edges | new_edges)
+
+    # distance index of the board with the overlay's edges
+    @property
+    def index(self):
+        return self.board.overlay_index(self.edges)
+
+    # squares reachable with each roll on the board with the overlay's edges
+    @property
+    def reachability(self):
+        return self.index.reachability
+
+    def path_length(self, source, target):
+        return self.index.path_length(source, target)
+
+    def step_towards(self, source, target, n_steps):
+        return self.index.step_towards(source, target, n_steps)
+
+    def shortest_path(self, source, target):
+        return self.index.shortest_path(source, target)
+
+    # overlays are pickled as the board's directory and the edges, so they refer to the same loaded board when unpickled
+    def __reduce__(self):
+        return (load_overlay, (self.board.directory, self.edges))
+
+# cache of boards that have already been loaded
+loaded_boards = {}
+
+# load a board layout by name (or from a directory)
+def load_board(name = DEFAULT_BOARD):
+    directory = name if os.path.isdir(name) else os.path.join(BOARD_DIRECTORY, name)
+    if directory not in loaded_boards:
+        loaded_boards[directory] = Board(directory)
+    return loaded_boards[directory]
+
+# an overlay of a board loaded by name (or from a directory)
+def load_overlay(name, edges):
+    return BoardOverlay(load_board(name), edges)
+
+board = load_board()
+
+# the graph, index and adjacency matrix of the default board are built lazily on first access
+def __getattr__(name):
+    if name == 'board_graph':
+        return board.graph
+    elif name == 'board_index':
+        return board.index
+    elif name == 'full_adj_mat':
+        return board.adjacency.astype(float)
+    raise AttributeError('module {} has no attribute {}'.format(__name__, name))
+
+if __name__ == '__main__':
+    # compile every board layout
+    for board_name in sorted(os.listdir(BOARD_DIRECTORY)):
+        load_board(board_name).compile()
+        print('Compiled the {} board'.format(board_name))
@@ -0,0 +1,6 @@
+# the cards of the game, kept apart from ClueDo (with no imports) so that entry points can ask about them before the game and
+# its tables are loaded
+characters = {'Colonel Mustard', 'Miss Scarlett', 'Mrs Peacock', 'Dr Orchid', 'Rev Green', 'Prof Plum'}
+weapons = {'Rope', 'Dagger', 'Wrench', 'Revolver', 'Candlestick', 'Lead Pipe'}
+locations = {'Kitchen', 'Dining Room', 'Lounge', 'Hall', 'Study', 'Library', 'Billiard Room', 'Conservatory', 'Ballroom'}
+all_cards = characters.union(weapons, locations)
@@ -1,193 +1,412 @@
 import numpy as np
-import time
-import networkx as nx
 import sys
-from PyInquirer import prompt
-from BoardGraph import board_graph
+import Cards
+from BoardGraph import board
+from Knowledge import CardRegistry, PlayerRegistry, KnowledgeView, HAS_CARD, NOT_HAS_CARD
+from Deduction import ConstraintEngine, mask_cards
+from EnvelopeSolver import EnvelopeSolver
+from DealSampler import DealSampler
+from SuggestionOptimizer import SuggestionOptimizer
+from MovementPlanner import MovementPlanner
+from Instrumentation import NULL_INSTRUMENTATION
+from GameIO import TerminalIO
+from GameState import GameState
+from GameLog import NULL_LOG, START, MOVE, NO_SHOW, SHOW, CARD_SHOWN, RULE_OUT, SUGGESTION, PASSAGES, CLUE_CARD, ACCUSATION, UNKNOWN_HAND_SIZE
 
 class ClueGame:
     
-    characters = {'Colonel Mustard', 'Miss Scarlett', 'Mrs Peacock', 'Dr Orchid', 'Rev Green', 'Prof Plum'}
-    weapons = {'Rope', 'Dagger', 'Wrench', 'Revolver', 'Candlestick', 'Lead Pipe'}
-    locations = {'Kitchen', 'Dining Room', 'Lounge', 'Hall', 'Study', 'Library', 'Billiard Room', 'Conservatory', 'Ballroom'}
+    characters = Cards.characters
+    weapons = Cards.weapons
+    locations = Cards.locations
     secret_passage_locations = {'Lounge', 'Conservatory', 'Study', 'Kitchen'}
     non_secret_passage_locations = {'Dining Room', 'Hall', 'Library', 'Billiard Room', 'Ballroom'}
-    all_cards = characters.union(weapons, locations)
-    char_starting_positions = {'Colonel Mustard': 66, 'Miss Scarlett': 4, 'Mrs Peacock': 145, 'Dr Orchid': 196, 'Rev Green':95, 'Prof Plum': 28}
-    room_locations = {'Kitchen': 194, 'Dining Room': 87, 'Lounge': 5, 'Hall': 3, 'Study': 1, 'Library': 82, 'Billiard Room': 109, 'Conservatory': 186, 'Ballroom': 190}
+    all_cards = Cards.all_cards
+    # squares of the starting positions and rooms, taken from the board layout
+    char_starting_positions = board.starting_positions
+    room_locations = board.room_locations
+    room_at_square = {square: room for room, square in room_locations.items()}
+    # order of play around the board
+    player_order = ['Miss Scarlett', 'Colonel Mustard', 'Dr Orchid', 'Rev Green', 'Mrs Peacock', 'Prof Plum']
+    # integer ids for the cards, used to index the knowledge matrix
+    registry = CardRegistry(characters, weapons, locations)
+    # planner for moving towards rooms over several turns, shared by every game on the board
+    movement_planner = MovementPlanner(board, room_locations)
+    # solver counting the deals consistent with a game's knowledge, sampler estimating the same probabilities when counting
+    # is too slow (drawing from the solver's tables when few random deals are consistent), and the scorer of suggestions; none
+    # of them keep any state of a game, so every game shares them
+    solver = EnvelopeSolver(registry)
+    sampler = DealSampler(registry, solver = solver)
+    suggestion_optimizer = SuggestionOptimizer(registry)
+    # cache of solved states shared with other games and processes (see SolutionCache.open_cache), or None to always solve;
+    # set on the games that use one, so that other games in the same process are not affected
+    solution_cache = None
+    # table of precomputed decisions for common states, consulted before deciding online (see PolicyTable.open_table), or None;
+    # set on the games that use one, as for the solution cache
+    policy_table = None
+    # strategy settings, which can be overridden on an instance
+    # whether the planner prefers rooms that are more likely to be in the envelope
+    weight_rooms_by_probability = True
+    # sample budget, time budget (in seconds) and limit on the random deals proposed for choosing a suggestion by information
+    # gain (no samples means the top card of each category is suggested instead; see DealSampler.sample)
+    suggestion_samples = 2000
+    suggestion_time_budget = 0.2
+    suggestion_max_proposals = 10 ** 6
     possible_clue_cards = {'Specific card reveal', 'Choice card reveal', 'Secret passage', 'Player movement', 'Positional reveal', 'All reveal', 'Choice player reveal'}
 
-    # initialize with a set of characters, my character, and the cards we are dealt
-    def __init__(self, players, my_char, my_cards):
+    # initialize with a set of characters, my character, the cards we are dealt and optionally the number of cards dealt to each player,
+    # a random number generator (so that games can be replayed from a seed), instrumentation to record each turn with, the
+    # frontend that asks the questions and shows the messages of the game (the terminal by default) and a log to append the
+    # game's events to (none by default)
+    def __init__(self, players, my_char, my_cards, hand_sizes = None, rng = None, instrumentation = None, io = None, log = None):
         assert all([player in ClueGame.characters for player in players])
+        self.log = log if log is not None else NULL_LOG
         self.players = players
+        # every player in order of play, including players eliminated by a wrong accusation (who still show cards)
+        self.seating = [player for player in ClueGame.player_order if player in players]
         self.my_char = my_char
         self.other_players = [player for player in players if player != my_char]
         self.my_cards = my_cards
-        # dictionary for storing knowledge about other players' cards: -1 means they do not have the card, 1 means they do, 0 is ambiguous
-        self.game_state = {player: {card: 1 if card in self.my_cards and player == my_char
-                                    else -1 if card in self.my_cards and player != my_char
-                                    else 0 for card in ClueGame.all_cards} 
-                           for player in self.players}
-        # dictionary for tracking possible cards for each player in each round, based on what they show
-        self.possible_cards = {player: {} for player in self.players}
-        # location on the board
-        self.position = ClueGame.char_starting_positions[self.my_char]
-        # cards that could be inside of the envelope
-        self.possible_characters = ClueGame.characters
-        self.possible_weapons = ClueGame.weapons
-        self.possible_locations = ClueGame.locations
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.io = io if io is not None else TerminalIO()
+        # integer ids for the players, used to index the knowledge matrix
+        self.player_registry = PlayerRegistry(self.players)
+        self.my_id = self.player_registry.id(my_char)
+        # matrix (players x cards) storing knowledge about other players' cards: -1 means they do not have the card, 1 means they do, 0 is ambiguous
+        self.knowledge = np.zeros((self.player_registry.n_players, ClueGame.registry.n_cards), dtype = np.int8)
+        my_card_ids = ClueGame.registry.ids(self.my_cards)
+        self.knowledge[:, my_card_ids] = NOT_HAS_CARD
+        self.knowledge[self.my_id, my_card_ids] = HAS_CARD
+        # string-keyed view of the knowledge matrix
+        self.game_state = KnowledgeView(self.knowledge, self.player_registry, ClueGame.registry)
+        # number of cards in each player's hand (we always know our own)
+        self.hand_sizes = dict(hand_sizes) if hand_sizes is not None else {}
+        self.hand_sizes[my_char] = len(self.my_cards)
+        # engine deducing cards from what players show and from hand sizes
+        self.deduction = ConstraintEngine(self.knowledge, [self.hand_sizes.get(player) for player in self.player_registry.players], ClueGame.registry)
+        # last result of the solver
+        self.solution_key = None
+        self.solution = None
+        # last lookup in the policy table
+        self.policy_key = None
+        self.policy = None
+        # the shared board plus any edges (secret passages) added in this game, and our location on it
+        self.board = board.overlay()
+        self._position = ClueGame.char_starting_positions[self.my_char]
+        # mask of the cards that could be inside of the envelope
+        self.envelope = np.ones(ClueGame.registry.n_cards, dtype = bool)
         # turn tracker
         self.current_turn = 0
         self.current_round = 0
         self.game_is_active = True
+        # instrumentation of each turn (none by default), and counts of the solves and samples it reports
+        self.instrumentation = instrumentation if instrumentation is not None else NULL_INSTRUMENTATION
+        self.n_solves = 0
+        self.n_sampled_deals = 0
         # update possible guesses to start the game
         self.update_possible_guesses()
+        self.instrumentation.reset(self.counters())
+        self.log_event(START, my_char, len(players), players, [self.hand_sizes.get(player, UNKNOWN_HAND_SIZE) for player in players], my_cards)
+
+    # append an event to the game's log, followed by the state of our random number generator if it has been drawn from;
+    # players and cards are given by name, and stored as the ids of their cards
+    def log_event(self, event, *values):
+        if not self.log.enabled:
+            return
+        ids = []
+        for value in values:
+            if isinstance(value, str):
+                ids.append(ClueGame.registry.id(value))
+            elif isinstance(value, (list, tuple)):
+                ids.extend(ClueGame.registry.id(item) if isinstance(item, str) else int(item) for item in value)
+            else:
+                ids.append(int(value))
+        self.log.record(event, ids)
+        self.log.record_rng(self.rng)
+
+    # square we are on; every move is logged
+    @property
+    def position(self):
+        return self._position
+
+    @position.setter
+    def position(self, square):
+        self._position = square
+        self.log_event(MOVE, square)
         
-    # function that asks for input and loops until the input is present in the viable card list
-    @staticmethod
-    def card_input(viable_card_list, input_message, error_message):
-        input = prompt({
-            'type': 'list',
-            'name': 'selection',
-            'message': input_message,
-            'choices': [{'name': card} for card in viable_card_list],
-            'validate': lambda answer: error_message if answer not in viable_card_list else True
-        })
-        card = input['selection']
-        return card
+    # an immutable snapshot of the game's state, to fork hypothetical continuations of the game from
+    def snapshot(self):
+        return GameState(self)
+
+    # a copy of the game from a snapshot of it (the current state by default), which can be played on without changing this game
+    # or the snapshot; it shares everything that does not change as the game is played (registries, hand sizes, strategy
+    # settings, the board overlay and the last solver result), is neither logged nor instrumented, and draws from a copy of
+    # the snapshot's random number generator unless it is given one
+    def fork(self, state = None, rng = None):
+        state = state if state is not None else self.snapshot()
+        game = object.__new__(type(self))
+        game.__dict__.update(self.__dict__)
+        game.knowledge = np.array(state.knowledge)
+        game.game_state = KnowledgeView(game.knowledge, self.player_registry, ClueGame.registry)
+        game.deduction = ConstraintEngine(game.knowledge, self.deduction.hand_sizes, ClueGame.registry, state.constraints)
+        game.envelope = np.array(state.envelope)
+        game.players = list(state.players)
+        game.other_players = [player for player in state.players if player != self.my_char]
+        game.my_cards = list(state.my_cards)
+        game._position = state.position
+        game.board = state.board
+        game.current_turn = state.current_turn
+        game.current_round = state.current_round
+        game.game_is_active = state.game_is_active
+        game.solution_key = state.solution_key
+        game.solution = state.solution
+        game.rng = rng if rng is not None else state.rng()
+        game.log = NULL_LOG
+        game.instrumentation = NULL_INSTRUMENTATION
+        return game
+
+    # function that asks for one of a list of choices through the game's frontend
+    def card_input(self, viable_card_list, input_message, error_message):
+        return self.io.choose(viable_card_list, input_message, error_message)
         
+    # cards in each category that could be inside of the envelope
+    @property
+    def possible_characters(self):
+        return self.possible_in_category('characters')
+
+    @possible_characters.setter
+    def possible_characters(self, cards):
+        self.set_possible_in_category('characters', cards)
+
+    @property
+    def possible_weapons(self):
+        return self.possible_in_category('weapons')
+
+    @possible_weapons.setter
+    def possible_weapons(self, cards):
+        self.set_possible_in_category('weapons', cards)
+
+    @property
+    def possible_locations(self):
+        return self.possible_in_category('locations')
+
+    @possible_locations.setter
+    def possible_locations(self, cards):
+        self.set_possible_in_category('locations', cards)
+
+    def possible_in_category(self, category):
+        category_slice = ClueGame.registry.category_slices[category]
+        return ClueGame.registry.names(np.flatnonzero(self.envelope[category_slice]) + category_slice.start)
+
+    # function for restricting the envelope to the given cards within a category
+    def set_possible_in_category(self, category, cards):
+        self.envelope[ClueGame.registry.category_slices[category]] = False
+        self.envelope[ClueGame.registry.ids(cards)] = True
+
+    # mask of the cards that no player is known to hold
+    def possible_card_mask(self):
+        return ~(self.knowledge == HAS_CARD).any(axis = 0)
+
+    # scores of all cards based on current knowledge (i.e. how many players do not hold them for certain)
+    def card_scores(self):
+        return self.knowledge.sum(axis = 0, dtype = np.int16)
+
+    # hand sizes and active constraints, in the form used by the solver and the sampler
+    def solver_inputs(self):
+        self.deduction.propagate()
+        hand_sizes = [self.hand_sizes.get(player) for player in self.player_registry.players]
+        constraints = [(constraint.player_id, constraint.mask) for constraint in self.deduction.constraints]
+        return hand_sizes, constraints
+
+    # exact solution of which deals are still consistent with our knowledge (None if our knowledge is contradictory)
+    def envelope_solution(self):
+        hand_sizes, constraints = self.solver_inputs()
+        key = (self.knowledge.tobytes(), self.envelope.tobytes(), tuple(constraints))
+        if key != self.solution_key:
+            with self.instrumentation.phase('solve'):
+                if self.solution_cache is not None:
+                    self.solution = self.solution_cache.solve(self.solver, self.knowledge, self.envelope, hand_sizes, constraints)
+                else:
+                    self.solution = self.solver.solve(self.knowledge, self.envelope, hand_sizes, constraints)
+            self.solution_key = key
+            self.n_solves += 1
+        return self.solution
+
+    # the decisions for our knowledge from the policy table (see PolicyTable.PolicyDecisions), or None if there is no table or
+    # it does not hold our state
+    def policy_decisions(self):
+        if self.policy_table is None:
+            return None
+        hand_sizes, constraints = self.solver_inputs()
+        key = (self.knowledge.tobytes(), self.envelope.tobytes(), tuple(constraints))
+        if key != self.policy_key:
+            self.policy = self.policy_table.lookup(self.knowledge, self.envelope, hand_sizes, constraints, ClueGame.registry.card_categories)
+            self.policy_key = key
+        return self.policy
+
+    # probability that each card is in the envelope
+    def envelope_probabilities(self):
+        solution = self.envelope_solution()
+        if solution is None:
+            return None
+        return {card: float(probability) for card, probability in zip(ClueGame.registry.cards, solution.envelope_probabilities)}
+
+    # estimate the probabilities by sampling consistent deals within a sample and/or time budget (needs every hand size)
+    def sample_envelope_probabilities(self, n_samples = None, time_budget = None, seed = None):
+        hand_sizes, constraints = self.solver_inputs()
+        return self.sampler.sample(self.knowledge, self.envelope, hand_sizes, constraints, n_samples, time_budget, seed)
+
+    # preference for each card as a guess (higher is better): the probability that it is in the envelope, ties broken by
+    # score_card; if our knowledge is contradictory, only the scores are used
+    def card_preferences(self):
+        solution = self.envelope_solution()
+        scores = self.card_scores()
+        if solution is None:
+            return -scores.astype(float)
+        # scores are at most the number of players, so scaling them down only separates equal probabilities
+        return solution.envelope_probabilities - scores / 1000.0
+
     # function that returns false if we know that any player has the card
     def is_card_possible(self, card):
-        card_scores = [self.game_state[player][card] for player in self.game_state]
-        return all([score != 1 for score in card_scores])
+        return not (self.knowledge[:, ClueGame.registry.id(card)] == HAS_CARD).any()
             
     # function for scoring a card based on current knowledge (i.e. how many players do not hold it for certain)
     def score_card(self, card):
-        card_scores = [self.game_state[player][card] for player in self.game_state]
-        return sum(card_scores)
+        return int(self.knowledge[:, ClueGame.registry.id(card)].sum())
     
-    # use score_card to find best card from a list
+    # find the card from a list that is most likely to be in the envelope
     def find_best_card(self, card_list):
-        card_scores = {card: self.score_card(card) for card in card_list if self.is_card_possible(card)}
-        best_card = min(card_scores, key = lambda card: card_scores[card])
+        card_ids = ClueGame.registry.ids(card_list)
+        # the policy table holds the best card of each whole category
+        categories = ClueGame.registry.card_categories[card_ids]
+        if (categories == categories[0]).all() and len(card_ids) == (ClueGame.registry.card_categories == categories[0]).sum():
+            policy = self.policy_decisions()
+            if policy is not None:
+                return ClueGame.registry.cards[card_ids[np.argmax(policy.best_cards[card_ids])]]
+        card_ids = card_ids[self.possible_card_mask()[card_ids]]
+        best_card = ClueGame.registry.cards[card_ids[np.argmax(self.card_preferences()[card_ids])]]
         return best_card
     
+    # find the player whose card would tell us the most
+    def find_best_player(self):
+        policy = self.policy_decisions()
+        if policy is not None:
+            return self.player_registry.players[np.argmax(policy.best_players)]
+        # score each player based on our knowledge of their hand - i.e. how many cards we know they have for sure
+        player_scores = (self.knowledge == HAS_CARD).sum(axis = 1)
+        # best player has the least number of 1s in the game state (minimum score)
+        return self.player_registry.players[np.argmin(player_scores)]
+
+    # possible cards for each player in each round, based on what they show
+    @property
+    def possible_cards(self):
+        possible_cards = {player: {} for player in self.player_registry.players}
+        for constraint in self.deduction.constraints:
+            player = self.player_registry.players[constraint.player_id]
+            possible_cards[player][constraint.round] = ClueGame.registry.names(list(mask_cards(constraint.mask)))
+        return possible_cards
+
     # function for updating the game state after we know that a player has a card
     def rule_out_card(self, player, card):
-        for single_player in self.game_state:
-            self.game_state[single_player][card] = 1 if single_player == player else -1
+        self.log_event(RULE_OUT, player, card)
+        self.deduction.set_has(self.player_registry.id(player), ClueGame.registry.id(card))
         if player == self.my_char:
             self.my_cards.remove(card)
             
     # function for making a suggestion on our turn
     def get_top_suggestions(self):
-        
-        char_scores = {}
-        weapon_scores = {}
-        location_scores = {}
-        
-        # for each card of each type, score the card and save to the dictionary
-        for character in ClueGame.characters:
-            if self.is_card_possible(character):
-                char_scores[character] = self.score_card(character)
-        
-        for weapon in ClueGame.weapons:
-            if self.is_card_possible(weapon):
-                weapon_scores[weapon] = self.score_card(weapon)
-        
-        for location in ClueGame.locations:
-            if self.is_card_possible(location):
-                location_scores[location] = self.score_card(location)
+
+        # the first of the best cards in each category, if the policy table holds our state
+        policy = self.policy_decisions()
+        if policy is not None:
+            return tuple(ClueGame.registry.cards[category_slice.start + np.argmax(policy.best_cards[category_slice])]
+                         for category_slice in ClueGame.registry.category_slices.values())
+
+        # rank every card, pushing cards that are known to be held below any possible card
+        preferences = np.where(self.possible_card_mask(), self.card_preferences(), -np.inf)
                  
-        # find the card(s) in each category with the minimum score
-        top_char = min(char_scores, key = lambda char: char_scores[char])
-        top_weapon = min(weapon_scores, key = lambda weapon: weapon_scores[weapon])
-        top_location = min(location_scores, key = lambda location: location_scores[location])
+        # find the card in each category that is most likely to be in the envelope
+        top_cards = [ClueGame.registry.cards[category_slice.start + np.argmax(preferences[category_slice])]
+                     for category_slice in ClueGame.registry.category_slices.values()]
+        top_char, top_weapon, top_location = top_cards
         
         return top_char, top_weapon, top_location
     
+    # players asked to show a card after a player, in order (eliminated players are still asked)
+    def answer_order(self, player):
+        player_position = self.seating.index(player)
+        return [self.seating[pos % len(self.seating)] for pos in range(player_position + 1, player_position + len(self.seating))]
+
+    # function for choosing a suggestion in a room: the character and weapon that are expected to tell us the most about the
+    # envelope, estimated from sampled deals within the time budget; falls back to get_top_suggestions if deals cannot be sampled
+    def choose_suggestion(self, room):
+        with self.instrumentation.phase('suggestion'):
+            hand_sizes, constraints = self.solver_inputs()
+            if self.suggestion_samples and all(hand_size is not None for hand_size in hand_sizes):
+                try:
+                    samples = self.sampler.sample(self.knowledge, self.envelope, hand_sizes, constraints, n_samples = self.suggestion_samples,
+                                                  time_budget = self.suggestion_time_budget, seed = int(self.rng.integers(2 ** 32)),
+                                                  keep_deals = True, max_proposals = self.suggestion_max_proposals)
+                except ValueError:
+                    samples = None
+                if samples is not None:
+                    self.n_sampled_deals += samples.n_accepted
+                if samples is not None and samples.n_accepted > 0:
+                    answer_order = [self.player_registry.id(player) for player in self.answer_order(self.my_char)]
+                    return self.suggestion_optimizer.best_suggestion(samples.deals, self.player_registry.n_players, answer_order,
+                                                                     rooms = [room], preferences = self.card_preferences())
+            top_char, top_weapon, top_location = self.get_top_suggestions()
+            return top_char, top_weapon, room
+
     # function for calculating distances to each room from current position
     def get_path_lengths(self):
         
-        path_lengths =  {room: nx.shortest_path_length(board_graph, self.position, ClueGame.room_locations[room]) for room in ClueGame.room_locations}  
+        path_lengths = {room: self.board.path_length(self.position, ClueGame.room_locations[room]) for room in ClueGame.room_locations}
         return path_lengths
     
-    # function for moving on the board, towards or into the best room 
+    # function for moving on the board, towards or into the best room, planning over the dice rolls of the coming turns
     def move_on_board(self, dice_roll):
+        with self.instrumentation.phase('movement'):
+            # Rooms that could still be in the envelope, weighted by how likely they are to be
+            rooms = ClueGame.registry.category_slices['locations']
+            solution = self.envelope_solution() if self.weight_rooms_by_probability else None
+            levels = ClueGame.movement_planner.room_levels(self.possible_card_mask()[rooms],
+                                                           solution.envelope_probabilities[rooms] if solution is not None else None)
+
+            # Find the squares within the dice roll that minimise the expected number of turns to a room,
+            # pick one of them at random and move to it (the planner caches these decisions)
+            best_moves, headings = ClueGame.movement_planner.decide(self.position, dice_roll, levels, self.board)
+            choice = int(self.rng.choice(len(best_moves)))
+            return int(best_moves[choice]), headings[choice]
 
-        # Calculate distances to each room from current position
-        path_lengths = self.get_path_lengths()
-        
-        # Get scores for each room 
-        room_scores = {room: self.score_card(room) for room in ClueGame.locations if self.is_card_possible(room)}
-   
-        # Filter rooms further away than dice roll
-        possible_rooms = [key for key in room_scores if path_lengths[key] <= dice_roll]
-
-        # If no rooms are reachable in this turn, move to a square on the way to closest room
-        if len(possible_rooms) == 0:
-            
-            # Find the rooms that are still uneliminated, and return those that are closest
-            dist_to_closest_viable_room = min([path_lengths[key] for key in room_scores])
-            possible_rooms = [key for key in room_scores if path_lengths[key] == dist_to_closest_viable_room]
-            # Pick one of these close and viable rooms at random and move to it
-            # by finding shortest path to closest room and moving as far along it as dice roll will allow
-            closest_room = np.random.choice(possible_rooms,size=1)[0]
-            new_location = nx.shortest_path(board_graph, self.position, self.room_locations[closest_room])[dice_roll]
-            return new_location, closest_room
-
-        # If more than one possible, close room same distance apart, pick one at random and move to it
-        elif len(possible_rooms) > 1:
-            
-            best_possible_room_score = min([room_scores[room] for room in possible_rooms])
-            best_possible_rooms = [room for room in possible_rooms if room_scores[room] == best_possible_room_score]
-            # Move to closest room at random
-            room = np.random.choice(best_possible_rooms, size=1)[0]
-            new_location = self.room_locations[room]
-            return new_location, room
-
-        # If only one room available, move to it
-        else:
-            room = possible_rooms[0]
-            new_location = self.room_locations[possible_rooms[0]]
-            return new_location, room
-        
     def which_player_showed_card(self, card):
         
-        character = prompt([{
-            'type': 'list',
-            'name': 'selection',
-            'message': 'Which player showed the card? If none, select None',
-            'choices': [{'name': card} for card in self.other_players + ['None']],
-        }])
-        if character['selection'] == 'None':
-            if card in self.players:
-                self.possible_characters = {card}
-            elif card in self.weapons:
-                self.possible_weapons = {card}
-            elif card in self.locations:
-                self.possible_locations = {card}
+        # eliminated players still show cards, so any player but us may have shown it
+        answer_order = self.answer_order(self.my_char)
+        character = self.card_input(answer_order + ['None'], 'Which player showed the card? If none, select None', 'That\'s not a valid player.')
+        if character == 'None':
+            for player in answer_order:
+                self.observe_no_show(player, [card])
+            self.update_possible_guesses()
         else:
-            self.rule_out_card(character['selection'], card)
-            self.update_possible_cards(character['selection'])
+            self.observe_card_shown(character, card)
 
     # function for processing clue card input/output
     def clue_card(self, whose_turn, dice_roll):
             
         # get the type of clue card being shown
-        clue_card_type = ClueGame.card_input(ClueGame.possible_clue_cards, 'Please choose which type of clue card has been shown.',
+        clue_card_type = self.card_input(ClueGame.possible_clue_cards, 'Please choose which type of clue card has been shown.',
                                              'That\'s not a valid type of clue card. Trust me, we looked through all of them.')
+        self.log_event(CLUE_CARD, sorted(ClueGame.possible_clue_cards).index(clue_card_type), whose_turn)
         # if it is a specific card reveal, take in the specific card and update the game state
         if clue_card_type == 'Specific card reveal':
-            card_shown = ClueGame.card_input(self.all_cards, 'Please enter which card is to be revealed.', 'That doesn\'t look like anything to me...')
+            card_shown = self.card_input(self.all_cards, 'Please enter which card is to be revealed.', 'That doesn\'t look like anything to me...')
             if card_shown in self.my_cards:
                 if card_shown in ClueGame.characters:
-                    print('Here is {}'.format(card_shown))
-                    time.sleep(3)
+                    self.io.say('Here is {}'.format(card_shown))
+                    self.io.pause(3)
                 else:
-                    print('Here is the {}.'.format(card_shown))
-                    time.sleep(3)
+                    self.io.say('Here is the {}.'.format(card_shown))
+                    self.io.pause(3)
                 self.rule_out_card(self.my_char, card_shown)
             else:
                 self.which_player_showed_card(card_shown)
@@ -195,20 +414,20 @@ class ClueGame:
         # if the card says to choose a card to reveal, choose the top card   
         elif clue_card_type == 'Choice card reveal':
             if whose_turn == self.my_char:
-                type_of_choice_reveal = ClueGame.card_input({'Suspect', 'Weapon', 'Location'}, 'Please enter which type of card is to be revealed.', 'That is not a valid type of card')
-                print('Hmmm, what\'s the best card to choose...')
+                type_of_choice_reveal = self.card_input({'Suspect', 'Weapon', 'Location'}, 'Please enter which type of card is to be revealed.', 'That is not a valid type of card')
+                self.io.say('Hmmm, what\'s the best card to choose...')
                 if type_of_choice_reveal == 'Suspect':
                     best_card = self.find_best_card(ClueGame.characters)
                 elif type_of_choice_reveal == 'Weapon':
                     best_card = self.find_best_card(ClueGame.weapons)
                 elif type_of_choice_reveal == 'Location':
                     best_card = self.find_best_card(ClueGame.locations)
-                time.sleep(1)
-                print('If anyone has {}, please show it.'.format(best_card))
-                time.sleep(5)
+                self.io.pause(1)
+                self.io.say('If anyone has {}, please show it.'.format(best_card))
+                self.io.pause(5)
                 self.which_player_showed_card(best_card)
             else:
-                suggested_card = ClueGame.card_input(self.all_cards, 'Please enter which card was suggested.', 'That doesn\'t look like anything to me...')
+                suggested_card = self.card_input(self.all_cards, 'Please enter which card was suggested.', 'That doesn\'t look like anything to me...')
                 self.which_player_showed_card(suggested_card)    
                 
         # if the card is a secret passage card       
@@ -222,7 +441,7 @@ class ClueGame:
                 # if we are not in a room with a secret passage
                 elif self.position in [loc for room, loc in ClueGame.room_locations.items() if room not in ClueGame.secret_passage_locations]:
                     # make a passage from the current room
-                    best_room = ClueGame.room_locations[self.position]
+                    best_room = self.current_room()
                 # if we are not in a room, find possible rooms
                 elif self.position not in [loc for room, loc in ClueGame.room_locations.items()]:
                     path_lengths = self.get_path_lengths()
@@ -239,20 +458,18 @@ class ClueGame:
                     else:
                         path_lengths_non_passage_rooms = {room: path_length for room, path_length in path_lengths.items() if room in ClueGame.non_secret_passage_locations and self.is_card_possible(room)}
                         best_room = min(path_lengths_non_passage_rooms, key = lambda room: path_lengths_non_passage_rooms[room])
-                print('Let\'s make a passage through the {}'.format(best_room))
-                for secret_passage_room in ClueGame.secret_passage_locations:
-                    board_graph.add_edge(ClueGame.room_locations[secret_passage_room], ClueGame.room_locations[best_room])
+                self.io.say('Let\'s make a passage through the {}'.format(best_room))
+                self.add_secret_passages(best_room)
             else:
-                chosen_room = ClueGame.card_input(ClueGame.locations, 'Please enter which room {} would like to connect to the secret passages.'.format(whose_turn)
+                chosen_room = self.card_input(ClueGame.locations, 'Please enter which room {} would like to connect to the secret passages.'.format(whose_turn)
                                                   , 'That\'s not a valid room.')
-                for secret_passage_room in ClueGame.secret_passage_locations:
-                    board_graph.add_edge(ClueGame.room_locations[secret_passage_room], ClueGame.room_locations[chosen_room])
+                self.add_secret_passages(chosen_room)
         
         elif clue_card_type == 'Player movement':
             # find best-scoring room out of all the rooms and move to it
             best_room = self.find_best_card(ClueGame.locations)
             self.position = ClueGame.room_locations[best_room]
-            print('I have moved to the {}.'.format(best_room))
+            self.io.say('I have moved to the {}.'.format(best_room))
             
         elif clue_card_type == 'Positional reveal':
             # take as input the card that was shown
@@ -264,282 +481,300 @@ class ClueGame:
             
             # show a card to the player to our left
             player_to_our_left = self.players[our_index+1] if our_index < len(self.players)-1 else self.players[0]
-            random_card = np.random.choice([card for card in self.my_cards], size = 1)[0]
-            print('I have a card to show {}...'.format(player_to_our_left))
-            time.sleep(3)
-            print('My card is: {}. This message will self-destruct in 5 seconds'.format(random_card), end = '\r')
-            time.sleep(5)
+            random_card = str(self.rng.choice(self.my_cards))
+            self.io.say('I have a card to show {}...'.format(player_to_our_left))
+            self.io.pause(3)
+            self.io.reveal('My card is: {}. This message will self-destruct in 5 seconds'.format(random_card))
             self.rule_out_card(self.my_char, random_card)
             
         elif clue_card_type == 'All reveal':
             for player in self.players:
                 if player == self.my_char:
                     # take a random card
-                    random_card = np.random.choice([card for card in self.my_cards], size = 1)[0]
-                    print('My card is: {}.'.format(random_card))
+                    random_card = str(self.rng.choice(self.my_cards))
+                    self.io.say('My card is: {}.'.format(random_card))
                     self.rule_out_card(self.my_char, random_card)
                 else:    
-                    shown_card = ClueGame.card_input(ClueGame.all_cards, 'Please enter which card {} showed.'.format(player), 'That\'s not a real card. Please don\'t waste my time, I spent so long on this fucking bot.')
+                    shown_card = self.card_input(ClueGame.all_cards, 'Please enter which card {} showed.'.format(player), 'That\'s not a real card. Please don\'t waste my time, I spent so long on this fucking bot.')
                     self.rule_out_card(player, shown_card)
                     self.update_possible_cards(player)
             
         elif clue_card_type == 'Choice player reveal':
             if whose_turn == self.my_char:
-                player_scores = {}
-                # score each player based on our knowledge of their hand - i.e. how many cards we know they have for sure
-                for player in self.game_state:
-                    player_scores[player] = np.count_nonzero([self.game_state[player][item] == 1 for item in self.game_state[player]])
-                # best player has the least number of 1s in the game state (minimum score)
-                best_player = min(player_scores, key = lambda player: player_scores[player])
-                print('I would like {} to reveal a card'.format(best_player))
-                hidden_cards = [card for card in ClueGame.all_cards if self.is_card_possible(card)]
-                shown_card = ClueGame.card_input(hidden_cards, 'Please enter which card {} showed.'.format(best_player), 'Please don\'t waste my time, I spent so long on this fucking bot.')
-                time.sleep(1)
+                best_player = self.find_best_player()
+                self.io.say('I would like {} to reveal a card'.format(best_player))
+                hidden_cards = ClueGame.registry.names(self.possible_card_mask())
+                shown_card = self.card_input(hidden_cards, 'Please enter which card {} showed.'.format(best_player), 'Please don\'t waste my time, I spent so long on this fucking bot.')
+                self.io.pause(1)
                 self.rule_out_card(best_player, shown_card)
                 self.update_possible_cards(best_player)
             else:
-                player_to_reveal_card = ClueGame.card_input(self.players, 'Please enter which player was chosen by {} to reveal a card.'.format(whose_turn), 'That\'s not a valid player. Please don\'t waste my time, I spent so long on this fucking bot.')
+                player_to_reveal_card = self.card_input(self.players, 'Please enter which player was chosen by {} to reveal a card.'.format(whose_turn), 'That\'s not a valid player. Please don\'t waste my time, I spent so long on this fucking bot.')
                 if player_to_reveal_card == self.my_char:
-                    random_card = np.random.choice([card for card in self.my_cards], size = 1)[0]
-                    print('Ready to show my card, but only to {}...'.format(whose_turn))
-                    time.sleep(3)
-                    print('My card is {}. This message will self-destruct in 5 seconds.'.format(random_card), end = '\r')
-                    time.sleep(5)
+                    random_card = str(self.rng.choice(self.my_cards))
+                    self.io.say('Ready to show my card, but only to {}...'.format(whose_turn))
+                    self.io.pause(3)
+                    self.io.reveal('My card is {}. This message will self-destruct in 5 seconds.'.format(random_card))
                     self.rule_out_card(self.my_char, random_card)
                 else:
-                    card_revealed = ClueGame.card_input(ClueGame.all_cards, 'Please enter which card was revealed by {}.'.format(player_to_reveal_card), 'That\'s not a valid card.')
+                    card_revealed = self.card_input(ClueGame.all_cards, 'Please enter which card was revealed by {}.'.format(player_to_reveal_card), 'That\'s not a valid card.')
                     self.rule_out_card(player_to_reveal_card, card_revealed)
-                    self.update_possible_cards(player_to_reveal_card)                             
-                                                                 
+                    self.update_possible_cards(player_to_reveal_card)
+
+    # function for connecting a room to every room with a secret passage, on this game's board only
+    def add_secret_passages(self, room):
+        self.log_event(PASSAGES, room)
+        self.board = self.board.with_edges([(ClueGame.room_locations[secret_passage_room], ClueGame.room_locations[room])
+                                            for secret_passage_room in ClueGame.secret_passage_locations])
+
+    # the room at our position, or None if we are not in a room
+    def current_room(self):
+        return ClueGame.room_at_square.get(self.position)
+
+    # function for recording that a player showed nobody any of the given cards, so holds none of them
+    def observe_no_show(self, player, cards):
+        self.log_event(NO_SHOW, player, cards)
+        for card_id in ClueGame.registry.ids(cards):
+            self.deduction.set_not_has(self.player_registry.id(player), card_id)
+        self.update_possible_cards(player)
+
+    # function for recording that a player showed someone else one of the given cards, without us seeing which
+    def observe_show(self, player, cards):
+        self.log_event(SHOW, player, cards)
+        self.deduction.add_constraint(self.player_registry.id(player), ClueGame.registry.ids(cards), self.current_round)
+        self.update_possible_cards(player)
+
+    # function for recording that a player showed us a card
+    def observe_card_shown(self, player, card):
+        self.log_event(CARD_SHOWN, player, card)
+        self.deduction.set_has(self.player_registry.id(player), ClueGame.registry.id(card))
+        self.update_possible_cards(player)
+
+    # function for moving us to the room of a suggestion that named our character
+    def observe_suggestion(self, character, room):
+        self.log_event(SUGGESTION, character, room)
+        if character == self.my_char:
+            self.position = ClueGame.room_locations[room]
+
+    # function for recording a wrong accusation: the player is out of the game, and if two of the accused cards are known to
+    # be in the envelope, the third one is not
+    def observe_failed_accusation(self, player, accusation):
+        self.log_event(ACCUSATION, player, 0, accusation)
+        self.players.remove(player)
+        self.other_players.remove(player)
+        cards_in_envelope = [item for item in accusation if (self.knowledge[:, ClueGame.registry.id(item)] == NOT_HAS_CARD).all()]
+        cards_not_in_envelope = [item for item in accusation if item not in cards_in_envelope]
+        if len(cards_not_in_envelope) == 1:
+            self.envelope[ClueGame.registry.id(cards_not_in_envelope[0])] = False
+
+    # function for recording a correct accusation, which ends the game
+    def observe_correct_accusation(self, player, accusation):
+        self.log_event(ACCUSATION, player, 1, accusation)
+        self.game_is_active = False
+
+    # the card we show for another player's suggestion (chosen at random among the ones we hold), or None if we hold none
+    def choose_card_to_show(self, suggestion):
+        matching_cards = [card for card in self.my_cards if card in suggestion]
+        if not matching_cards:
+            return None
+        return matching_cards[self.rng.integers(len(matching_cards))]
+
+    # track the current turn and the current round, ending the turn's instrumentation record and its entry in the log
+    def advance_turn(self):
+        if self.instrumentation.enabled:
+            self.instrumentation.end_turn(self.counters(), turn = self.current_turn, round = self.current_round, player = self.my_char)
+        self.current_turn += 1
+        if self.current_turn % len(self.players) == 0:
+            self.current_round = int(self.current_turn / len(self.players))
+        self.log.end_turn(self)
+
+    # running totals of the work done for this game, for instrumentation (the board, its planner and the solver's tables are
+    # shared, so their counts include the work done for other games in the same process)
+    def counters(self):
+        return {'index_queries': board.n_queries, 'planner_solves': ClueGame.movement_planner.n_solves,
+                'constraint_examinations': self.deduction.n_examinations, 'knowledge_updates': self.deduction.n_updates,
+                'envelope_solves': self.n_solves, 'solver_tables_built': ClueGame.solver.n_tables_built,
+                'solver_convolutions': ClueGame.solver.n_convolutions,
+                'solution_cache_hits': self.solution_cache.n_hits if self.solution_cache is not None else 0,
+                'policy_table_hits': self.policy_table.n_hits if self.policy_table is not None else 0,
+                'sampled_deals': self.n_sampled_deals}
+
     # function for taking our turn
     def our_turn(self):
 
-        print('It\'s my turn!\n')
+        self.io.say('It\'s my turn!\n')
         
         # Enter dice roll value for movement
-        dice_roll = int(input('Please Enter Dice Roll.\n'))
-        while type(dice_roll) != int or dice_roll > 12 or dice_roll < 2:
-            print("Uh... I'm gonna need a valid input")
-            time.sleep(1)
-            dice_roll = int(input('Please Enter Dice Roll.\n'))
+        dice_roll = self.io.ask_number('Please Enter Dice Roll.', 2, 12)
             
-        n_clue_cards = int(input('Please enter number of clue cards shown.\n'))
-        while type(n_clue_cards) != int or n_clue_cards > 2 or n_clue_cards < 0:
-            print("Uh... I'm gonna need a valid input")
-            time.sleep(1)
-            n_clue_cards = int(input('Please enter number of clue cards shown.\n'))
+        n_clue_cards = self.io.ask_number('Please enter number of clue cards shown.', 0, 2)
         
         # If we have a clue card, have person enter result
         for i in range(n_clue_cards):
-            self.clue_card(whose_turn = self.my_char, dice_roll = dice_roll)
+            with self.instrumentation.phase('clue_cards'):
+                self.clue_card(whose_turn = self.my_char, dice_roll = dice_roll)
         
         # Complete room movement
         self.position, room = self.move_on_board(dice_roll)
-        
+
         # If we have moved to a new room, make a suggestion
-        if self.position in ClueGame.room_locations.values():
-            print('I have moved to the {}'.format(room))
-            top_char, top_weapon, top_location = self.get_top_suggestions()
-            time.sleep(1)
-            print('Hm... what should I suggest...')
-            time.sleep(5)
-            print('I suggest {} did it with the {} in the {}'.format(top_char, top_weapon, room))
-            which_player = ClueGame.card_input(self.other_players + ['None'], 'If a player showed a card, please enter which one. If not, select None.', 'That\'s not a valid player.')
+        if self.current_room() is not None:
+            room = self.current_room()
+            self.io.say('I have moved to the {}'.format(room))
+            suggestion = self.choose_suggestion(room)
+            top_char, top_weapon, room = suggestion
+            self.io.pause(1)
+            self.io.say('Hm... what should I suggest...')
+            self.io.pause(5)
+            self.io.say('I suggest {} did it with the {} in the {}'.format(top_char, top_weapon, room))
+            # every player asked before the one that showed a card has none of the cards (eliminated players are asked too)
+            answer_order = self.answer_order(self.my_char)
+            which_player = self.card_input(answer_order + ['None'], 'If a player showed a card, please enter which one. If not, select None.', 'That\'s not a valid player.')
+            asked = answer_order[:answer_order.index(which_player)] if which_player != 'None' else answer_order
+            for player in asked:
+                self.observe_no_show(player, suggestion)
             if which_player != 'None':
-                which_card = ClueGame.card_input([top_char, top_weapon, room], 'Please enter which card {} showed.'.format(which_player), 'That\'s not one of the cards I suggested.')
-                self.rule_out_card(which_player, which_card)
-                self.update_possible_cards(which_player)
-            else:
-                self.possible_characters = {top_char}
-                self.possible_weapons = {top_weapon}
-                self.possible_locations = {room}
+                which_card = self.card_input(list(suggestion), 'Please enter which card {} showed.'.format(which_player), 'That\'s not one of the cards I suggested.')
+                self.observe_card_shown(which_player, which_card)
         # If we have not moved to a new room, make our way to a room
         else:
-            time.sleep(1)
-            print('Just moved to square {}'.format(self.position))
-            print('I am on my way to the {}'.format(room))
+            self.io.pause(1)
+            self.io.say('Just moved to square {}'.format(self.position))
+            self.io.say('I am on my way to the {}'.format(room))
             
         # Update possible guesses after clue card is shown
         self.update_possible_guesses()
         
-        if len(self.possible_characters) == 1 and len(self.possible_weapons) == 1 and len(self.possible_locations) == 1:
-            print('I have an accusation to make!\n')
-            character = list(self.possible_characters)[0]
-            weapon = list(self.possible_weapons)[0]
-            location = list(self.possible_locations)[0]
-            print('I accuse {} of doing the crime, with the {} in the {}'.format(character, weapon, location))
-            self.game_is_active = False
-       
-    # update attribute for possible cards (cards that could be in the envelope) in each category
+        accusation = self.get_accusation()
+        if accusation is not None:
+            self.io.say('I have an accusation to make!\n')
+            character, weapon, location = accusation
+            self.io.say('I accuse {} of doing the crime, with the {} in the {}'.format(character, weapon, location))
+            self.observe_correct_accusation(self.my_char, accusation)
+
+        self.advance_turn()
+
+    # the cards in the envelope if we know all of them for certain, otherwise None
+    def get_accusation(self):
+        with self.instrumentation.phase('accusation'):
+            solution = self.envelope_solution()
+            certain = solution.envelope_certain if solution is not None else np.zeros(ClueGame.registry.n_cards, dtype = bool)
+            accusation = []
+            for category_slice in ClueGame.registry.category_slices.values():
+                # a card is known if every consistent deal puts it in the envelope, or if it is the only one left in its category
+                known = certain[category_slice] | ((self.envelope[category_slice].sum() == 1) & self.envelope[category_slice])
+                if not known.any():
+                    return None
+                accusation.append(ClueGame.registry.cards[category_slice.start + np.argmax(known)])
+            return tuple(accusation)
+
+    # update the mask of possible cards (cards that could be in the envelope)
     def update_possible_guesses(self):
-        
-        impossible_characters = []
-        for char in self.possible_characters:
-            if not self.is_card_possible(char):
-                impossible_characters.append(char)
-                
-        self.possible_characters = self.possible_characters.difference(set(impossible_characters))
-                
-        impossible_weapons = []    
-        for weapon in self.possible_weapons:
-            if not self.is_card_possible(weapon):
-                impossible_weapons.append(weapon)
-                
-        self.possible_weapons = self.possible_weapons.difference(set(impossible_weapons))
-         
-        impossible_locations = []
-        for location in self.possible_locations:
-            if not self.is_card_possible(location):
-                impossible_locations.append(location)
-                
-        self.possible_locations = self.possible_locations.difference(set(impossible_locations))        
-                
-    # function for updating the possible cards each player has in each round
+        with self.instrumentation.phase('propagation'):
+            self.deduction.propagate()
+            self.envelope &= self.possible_card_mask()
+            # a card that no player holds is in the envelope, so it is the only possibility left in its category
+            in_envelope = (self.knowledge == NOT_HAS_CARD).all(axis = 0)
+            for category_slice in ClueGame.registry.category_slices.values():
+                if in_envelope[category_slice].any():
+                    self.envelope[category_slice] &= in_envelope[category_slice]
+
+    # function for deducing cards from the constraints on what each player could have shown
     def update_possible_cards(self, player):
-        
-        # only need to update if the input player is a different player
-        if player != self.my_char:
-            
-            # cards that the player cannot have
-            impossible = {card for card in self.game_state[player] if self.game_state[player][card] == -1}
-            
-            # loop through their possible cards
-            for previous_round in self.possible_cards[player]:
-                set_of_possible_cards = self.possible_cards[player][previous_round]
-                # check if any of the cards in the impossible list are in the set of possible cards for each previous round
-                if any([impossible_card in set_of_possible_cards for impossible_card in impossible]):
-                    # if so, take the difference between the sets
-                    impossible_cards_in_set = {card for card in impossible if card in set_of_possible_cards}
-                    self.possible_cards[player][previous_round] = self.possible_cards[player][previous_round].difference(impossible_cards_in_set)
-                # if there is only one possible card, set the game state variable to reflect that
-                if len(self.possible_cards[player][previous_round]) == 1:
-                    card = list(self.possible_cards[player][previous_round])[0]
-                    self.rule_out_card(player, card)
-                
+        with self.instrumentation.phase('propagation'):
+            # the engine only re-examines the constraints touched by new facts, for every player, until nothing more can be deduced
+            self.deduction.propagate()
+
     # turn for other players
     def other_turn(self, player):
 
-        print('It\'s {}\'s turn.'.format(player))
+        self.io.say('It\'s {}\'s turn.'.format(player))
 
-        n_clue_cards = int(input('Please enter number of clue cards shown.\n'))
-        while type(n_clue_cards) != int or n_clue_cards > 2 or n_clue_cards < 0:
-            print("Uh... I'm gonna need a valid input")
-            time.sleep(1)
-            n_clue_cards = int(input('Please enter number of clue cards shown.\n'))
+        n_clue_cards = self.io.ask_number('Please enter number of clue cards shown.', 0, 2)
         
         # If we have a clue card, have person enter result
         for i in range(n_clue_cards):
-            self.clue_card(whose_turn = player, dice_roll = False)
+            with self.instrumentation.phase('clue_cards'):
+                self.clue_card(whose_turn = player, dice_roll = False)
         
-        make_suggestion = ClueGame.card_input(['Yes', 'No'],
+        make_suggestion = self.card_input(['Yes', 'No'],
                                               'Would {} like to make a suggestion?'.format(player),
                                               'That\'s not a valid choice')
 
         if make_suggestion == 'Yes':
                                
             # take inputs for the suggestion
-            sug_character = ClueGame.card_input(ClueGame.characters, 'Please enter the character that was suggested.', 'I don\'t know that person.')
-            sug_weapon = ClueGame.card_input(ClueGame.weapons, 'Please enter the weapon that was suggested.', 'Please choose a valid weapon.')
-            sug_location =  ClueGame.card_input(ClueGame.locations, 'Please enter the location that was suggested.', 'Please choose a valid location.')
+            sug_character = self.card_input(ClueGame.characters, 'Please enter the character that was suggested.', 'I don\'t know that person.')
+            sug_weapon = self.card_input(ClueGame.weapons, 'Please enter the weapon that was suggested.', 'Please choose a valid weapon.')
+            sug_location =  self.card_input(ClueGame.locations, 'Please enter the location that was suggested.', 'Please choose a valid location.')
            
             suggestions = [sug_character, sug_weapon, sug_location]
-            player_position = self.players.index(player)
-            
+
             # if we are the suggested character, update our current position to suggested room
+            self.observe_suggestion(sug_character, sug_location)
             if sug_character == self.my_char:
-                self.position = self.room_locations[sug_location]
-                print("I guess I'm moving to the {} then...".format(sug_location))
-            
-            # loop through other players positions
-            for pos in range(player_position+1, player_position+len(self.players)):
-                
-                current_player = self.players[pos % len(self.players)]
-                
+                self.io.say("I guess I'm moving to the {} then...".format(sug_location))
+
+            # loop through the players after the suggester
+            for current_player in self.answer_order(player):
+
                 # if it is our turn, and we have one of the suggested cards, show it
                 if current_player == self.my_char:
-                    time.sleep(1)
-                    if any(np.isin(self.my_cards, suggestions)):
-                        matching_cards = np.array(self.my_cards)[np.isin(self.my_cards, suggestions)]
-                        matching_card = np.random.choice(matching_cards, size = 1)[0] if len(matching_cards) > 1 else matching_cards[0]
-                        print('I have a card to show {}...'.format(current_player))
-                        time.sleep(5)
-                        print('My card is: {}. This message will self-destruct in 5 seconds.'.format(matching_card), end = '\r')
-                        time.sleep(5)
+                    self.io.pause(1)
+                    matching_card = self.choose_card_to_show(suggestions)
+                    if matching_card is not None:
+                        self.io.say('I have a card to show {}...'.format(player))
+                        self.io.pause(5)
+                        self.io.reveal('My card is: {}. This message will self-destruct in 5 seconds.'.format(matching_card))
                         break
-                    else: 
-                        print('I have no cards to show.')
+                    else:
+                        self.io.say('I have no cards to show.')
                 # if it is not our turn, tell the computer whether each character showed a card
                 else:
-                    status = ClueGame.card_input(['Yes', 'No'], 'Did {} show a card?'.format(current_player), 'That\'s not a valid choice')
+                    status = self.card_input(['Yes', 'No'], 'Did {} show a card?'.format(current_player), 'That\'s not a valid choice')
                     # if the player showed a card, let the computer know and figure out which of the cards the player could have possibly showed
                     if status == 'Yes':
-                        impossible = [suggestion for suggestion in suggestions if self.game_state[current_player][suggestion] == -1]
-                        possible = {suggestion for suggestion in suggestions if suggestion not in impossible}
-                        self.possible_cards[current_player][self.current_round] = possible
-                        self.update_possible_cards(current_player)
+                        self.observe_show(current_player, suggestions)
                         break
                     # if the player did not show a card, we know that the player must have none of them
                     else:
-                        self.game_state[current_player][sug_character] = -1
-                        self.game_state[current_player][sug_weapon] = -1
-                        self.game_state[current_player][sug_location] = -1    
-                        self.update_possible_cards(current_player)
-                        
+                        self.observe_no_show(current_player, suggestions)
+
             self.update_possible_guesses()
                           
-        making_an_accusation = ClueGame.card_input(['Yes', 'No'], 'Would {} like to make an accusation?'.format(player),
+        making_an_accusation = self.card_input(['Yes', 'No'], 'Would {} like to make an accusation?'.format(player),
                                                    'That\'s not a valid choice')
 
         if making_an_accusation == 'Yes':
 
             # take inputs for the accusation
-            acc_character = ClueGame.card_input(ClueGame.characters, 'Please enter the character specified in the accusation.',
+            acc_character = self.card_input(ClueGame.characters, 'Please enter the character specified in the accusation.',
                                                 'I don\'t know that person.')
-            acc_weapon = ClueGame.card_input(ClueGame.weapons, 'Please enter the weapon specified in the accusation.',
+            acc_weapon = self.card_input(ClueGame.weapons, 'Please enter the weapon specified in the accusation.',
                                              'Please choose a valid weapon.')
-            acc_location = ClueGame.card_input(ClueGame.locations, 'Please enter the location specified in the accusation.',
+            acc_location = self.card_input(ClueGame.locations, 'Please enter the location specified in the accusation.',
                                                'Please choose a valid location.')
 
             accusation = [acc_character, acc_weapon, acc_location]
 
             # check if accusation was correct
-            accusation_correct = ClueGame.card_input(['Yes', 'No'], 'Was {}\'s accusation correct?'.format(player),
+            accusation_correct = self.card_input(['Yes', 'No'], 'Was {}\'s accusation correct?'.format(player),
                                                      'That\'s not a valid choice')
             # if accusation is correct, the game is over
             if accusation_correct == 'Yes':
-                self.game_is_active = False
+                self.observe_correct_accusation(player, accusation)
             # otherwise remove the player
             else:
-                self.players.remove(player)
-                self.other_players.remove(player)
-
-                # and check if we can rule out a card from the envelope based on what we know
-                cards_in_envelope = [item for item in accusation if all([self.game_state[player][item] == -1 for player in self.game_state])]
-                cards_not_in_envelope = [item for item in accusation if item not in cards_in_envelope]
-                # if we know two of the cards are in the envelope, we know the third one is not so we can remove it from possible cards
-                if len(cards_not_in_envelope) == 1:
-                    card = cards_not_in_envelope[0]
-                    if card in self.possible_characters:
-                        self.possible_characters.discard(card)
-                    elif card in self.possible_weapons:
-                        self.possible_weapons.discard(card)
-                    elif card in self.possible_locations:
-                        self.possible_locations.discard(card)
-
-        # track the current turn and the current round
-        self.current_turn += 1  
-        
-        if self.current_turn % len(self.players) == 0:
-            self.current_round = int(self.current_turn / len(self.players))
+                self.observe_failed_accusation(player, accusation)
+
+        self.advance_turn()
 
     # function for starting the game
     def start_game(self):
         # ask for the player that is going first
-        player_going_first = ClueGame.card_input(self.players, 'Please enter which player is going first.', 'That\'s not a valid player')
-        # player order (dictated by the game board)
-        player_order = ['Miss Scarlett', 'Colonel Mustard', 'Dr Orchid', 'Rev Green', 'Mrs Peacock', 'Prof Plum']
+        player_going_first = self.card_input(self.players, 'Please enter which player is going first.', 'That\'s not a valid player')
         # list of players playing the game
-        active_players = [player for player in player_order if player in self.players]
+        active_players = [player for player in ClueGame.player_order if player in self.players]
         # get index of the player going first
         player_index = active_players.index(player_going_first)
         # take turns while the game is active
@@ -556,8 +791,8 @@ class ClueGame:
                 player_index += 1
 
             if len(self.players) == 1 and self.my_char in self.players:
-                print('All other characters eliminated. You win!')
+                self.io.say('All other characters eliminated. You win!')
                 break
 
             # list of players that are active
-            active_players = [player for player in player_order if player in self.players]
\ No newline at end of file
+            active_players = [player for player in ClueGame.player_order if player in self.players]
\ No newline at end of file
@@ -0,0 +1,182 @@
+import time
+import numpy as np
+from Knowledge import HAS_CARD, NOT_HAS_CARD
+from Deduction import mask_cards
+from EnvelopeSolver import EnvelopeSolver
+
+# z value of a 95% confidence interval
+CONFIDENCE_Z = 1.96
+
+class SamplingProblem:
+
+    # compact, picklable description of the deals consistent with a knowledge state
+    def __init__(self, knowledge, envelope_mask, hand_sizes, constraints, card_categories):
+        if any(hand_size is None for hand_size in hand_sizes):
+            raise ValueError('The hand size of every player is needed to sample deals')
+        self.n_players, self.n_cards = knowledge.shape
+        self.card_categories = np.asarray(card_categories)
+        held = knowledge == HAS_CARD
+        # cards whose holder is known keep their holder in every sample
+        self.fixed_owners = np.where(held.any(axis = 0), held.argmax(axis = 0), -1)
+        self.free_cards = np.flatnonzero(self.fixed_owners < 0)
+        # cards of each category that could be drawn for the envelope
+        self.envelope_candidates = envelope_mask[self.free_cards]
+        for category in np.unique(self.card_categories):
+            if not self.envelope_candidates[self.card_categories[self.free_cards] == category].any():
+                raise ValueError('No card of a category can be in the envelope')
+        # slots left in each player's hand once the known cards are dealt, as the owner of each slot
+        remaining = [hand_size - int(held[player_id].sum()) for player_id, hand_size in enumerate(hand_sizes)]
+        if min(remaining) < 0 or sum(remaining) != len(self.free_cards) - len(np.unique(self.card_categories)):
+            raise ValueError('The hand sizes do not match the number of unknown cards')
+        self.slot_owners = np.repeat(np.arange(self.n_players), remaining)
+        self.forbidden = knowledge == NOT_HAS_CARD
+        self.constraints = [(player_id, np.array(list(mask_cards(mask)))) for player_id, mask in constraints]
+
+class SampleResult:
+
+    # accumulated counts of accepted samples, with the owner of each card in each sample (the last owner is the envelope)
+    def __init__(self, owner_counts, n_accepted, n_proposed, deals = None):
+        self.owner_counts = owner_counts
+        self.n_accepted = n_accepted
+        self.n_proposed = n_proposed
+        self.deals = deals
+        n = max(n_accepted, 1)
+        self.probabilities = owner_counts / n
+        self.envelope_probabilities = self.probabilities[-1]
+        # Wilson score interval for each envelope probability
+        centre = (self.envelope_probabilities + CONFIDENCE_Z ** 2 / (2 * n)) / (1 + CONFIDENCE_Z ** 2 / n)
+        half_width = (CONFIDENCE_Z / (1 + CONFIDENCE_Z ** 2 / n)
+                      * np.sqrt(self.envelope_probabilities * (1 - self.envelope_probabilities) / n + CONFIDENCE_Z ** 2 / (4 * n ** 2)))
+        self.confidence_intervals = np.stack([np.clip(centre - half_width, 0, 1), np.clip(centre + half_width, 0, 1)], axis = 1)
+
+    # combine the results of several samplers
+    @staticmethod
+    def merge(results):
+        deals = [result.deals for result in results if result.deals is not None]
+        return SampleResult(sum(result.owner_counts for result in results), sum(result.n_accepted for result in results),
+                            sum(result.n_proposed for result in results), np.concatenate(deals) if deals else None)
+
+# draw a batch of uniformly random deals of the unknown cards, and keep the ones consistent with the problem
+def sample_batch(problem, rng, batch_size):
+    n_free = len(problem.free_cards)
+    keys = rng.random((batch_size, n_free))
+    # one envelope card per category, drawn uniformly from the candidates (with keys of their own: picking the largest of the
+    # shuffle's keys would leave the other cards of the category with smaller keys, which favours the first hand slots)
+    envelope_keys = rng.random((batch_size, n_free))
+    envelope_picks = []
+    for category in np.unique(problem.card_categories):
+        in_category = (problem.card_categories[problem.free_cards] == category) & problem.envelope_candidates
+        category_keys = np.where(in_category, envelope_keys, -1.0)
+        envelope_picks.append(category_keys.argmax(axis = 1))
+    envelope_picks = np.stack(envelope_picks, axis = 1)
+    rows = np.arange(batch_size)[:, None]
+    # the other cards are shuffled into the hand slots: envelope cards sort last so the first slots take a random order
+    keys[rows, envelope_picks] = 2.0
+    order = np.argsort(keys, axis = 1)
+    free_owners = np.empty((batch_size, n_free), dtype = np.int8)
+    free_owners[rows, order[:, :len(problem.slot_owners)]] = problem.slot_owners
+    free_owners[rows, envelope_picks] = problem.n_players
+    owners = np.tile(problem.fixed_owners.astype(np.int8), (batch_size, 1))
+    owners[:, problem.free_cards] = free_owners
+    # reject deals giving a player a card they are known not to have, or breaking a constraint
+    forbidden = np.vstack([problem.forbidden, np.zeros(problem.n_cards, dtype = bool)])
+    accepted = ~forbidden[owners, np.arange(problem.n_cards)].any(axis = 1)
+    for player_id, cards in problem.constraints:
+        accepted &= (owners[:, cards] == player_id).any(axis = 1)
+    return owners[accepted]
+
+# number of deals giving each card to each owner
+def count_owners(deals, n_owners):
+    return np.stack([(deals == owner).sum(axis = 0) for owner in range(n_owners)]).astype(float)
+
+# run the sampler until the sample or time budget is used up, it has proposed max_proposals deals, or it accepts fewer than
+# min_acceptance of the deals it proposes (which is checked after every batch)
+def run_sampler(problem, seed, n_samples = None, time_budget = None, batch_size = 4096, keep_deals = False, max_proposals = 10 ** 6,
+                min_acceptance = 0.05):
+    rng = np.random.default_rng(seed)
+    owner_counts = np.zeros((problem.n_players + 1, problem.n_cards))
+    n_accepted = n_proposed = 0
+    kept = []
+    start = time.perf_counter()
+    while n_proposed < max_proposals:
+        deals = sample_batch(problem, rng, batch_size)
+        if n_samples is not None:
+            deals = deals[:n_samples - n_accepted]
+        n_proposed += batch_size
+        n_accepted += len(deals)
+        owner_counts += count_owners(deals, problem.n_players + 1)
+        if keep_deals:
+            kept.append(deals)
+        if n_samples is not None and n_accepted >= n_samples:
+            break
+        if time_budget is not None and time.perf_counter() - start >= time_budget:
+            break
+        if n_accepted < min_acceptance * n_proposed:
+            break
+    return SampleResult(owner_counts, n_accepted, n_proposed, np.concatenate(kept) if keep_deals else None)
+
+class DealSampler:
+
+    # initialize with the card registry, the number of worker processes to spread sampling over, and the solver that draws
+    # deals exactly when too few are accepted (a solver of its own by default)
+    def __init__(self, card_registry, n_workers = 1, solver = None):
+        self.card_registry = card_registry
+        self.n_workers = n_workers
+        self.solver = solver if solver is not None else EnvelopeSolver(card_registry)
+        self.pool = None
+
+    # estimate who holds each card by sampling deals consistent with the knowledge state, within a sample and/or time budget;
+    # deals are drawn by rejection, which is cheap while most proposals are consistent, and once each worker has proposed
+    # max_proposals deals or accepts fewer than min_acceptance of them, the rest of the budget is drawn exactly from the
+    # solver's tables, so heavily constrained states take a bounded time (and a sample budget alone is deterministic)
+    def sample(self, knowledge, envelope_mask, hand_sizes, constraints, n_samples = None, time_budget = None, seed = None,
+               batch_size = 4096, keep_deals = False, max_proposals = 10 ** 6, min_acceptance = 0.05):
+        if n_samples is None and time_budget is None:
+            raise ValueError('A sample budget or a time budget is needed')
+        start = time.perf_counter()
+        problem = SamplingProblem(knowledge, envelope_mask, hand_sizes, constraints, self.card_registry.card_categories)
+        seeds = np.random.SeedSequence(seed).spawn(self.n_workers + 1)
+        if self.n_workers == 1:
+            result = run_sampler(problem, seeds[0], n_samples, time_budget, batch_size, keep_deals, max_proposals, min_acceptance)
+        else:
+            if self.pool is None:
+                # only imported when sampling in parallel, as it is slow to import
+                from concurrent.futures import ProcessPoolExecutor
+                self.pool = ProcessPoolExecutor(self.n_workers)
+            worker_samples = None if n_samples is None else -(-n_samples // self.n_workers)
+            futures = [self.pool.submit(run_sampler, problem, worker_seed, worker_samples, time_budget, batch_size, keep_deals,
+                                        max_proposals, min_acceptance)
+                       for worker_seed in seeds[:-1]]
+            result = SampleResult.merge([future.result() for future in futures])
+        n_left = None if n_samples is None else n_samples - result.n_accepted
+        if (n_left is None or n_left > 0) and (time_budget is None or time.perf_counter() - start < time_budget):
+            deadline = None if time_budget is None else start + time_budget
+            result = SampleResult.merge([result, self.draw_exactly(knowledge, envelope_mask, hand_sizes, constraints, n_left, deadline,
+                                                                   seeds[-1], batch_size, keep_deals)])
+        return result
+
+    # draw deals from the solver's tables in batches, until n_samples are drawn (if given) or the deadline passes (if given)
+    def draw_exactly(self, knowledge, envelope_mask, hand_sizes, constraints, n_samples, deadline, seed, batch_size, keep_deals):
+        rng = np.random.default_rng(seed)
+        n_owners = knowledge.shape[0] + 1
+        owner_counts = np.zeros((n_owners, knowledge.shape[1]))
+        n_drawn = 0
+        kept = []
+        while n_samples is None or n_drawn < n_samples:
+            size = batch_size if n_samples is None else min(batch_size, n_samples - n_drawn)
+            deals = self.solver.sample(knowledge, envelope_mask, hand_sizes, constraints, size, rng)
+            if deals is None:
+                break
+            n_drawn += len(deals)
+            owner_counts += count_owners(deals, n_owners)
+            if keep_deals:
+                kept.append(deals)
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+        return SampleResult(owner_counts, n_drawn, n_drawn, np.concatenate(kept) if kept else None)
+
+    # shut down the worker processes
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
@@ -0,0 +1,200 @@
+from collections import deque
+from Knowledge import HAS_CARD, UNKNOWN, NOT_HAS_CARD
+
+# iterate over the card ids set in a bitmask
+def mask_cards(mask):
+    while mask:
+        lowest_bit = mask & -mask
+        yield lowest_bit.bit_length() - 1
+        mask ^= lowest_bit
+
+# bitmask with the given card ids set
+def cards_mask(card_ids):
+    mask = 0
+    for card_id in card_ids:
+        mask |= 1 << int(card_id)
+    return mask
+
+class Constraint:
+
+    # a constraint that a player holds at least one of the cards in a bitmask (e.g. after showing one of them)
+    def __init__(self, player_id, mask, round):
+        self.player_id = player_id
+        self.mask = mask
+        self.round = round
+        self.active = True
+
+class ConstraintEngine:
+
+    # initialize with the knowledge matrix to deduce into, the size of each player's hand (None if unknown) and the card registry;
+    # when copying an engine, the active constraints (triples of player id, card bitmask and round) are passed too, and the
+    # matrix must already hold every deduction that can be made from them
+    def __init__(self, knowledge, hand_sizes, card_registry, constraints = None):
+        self.knowledge = knowledge
+        self.hand_sizes = list(hand_sizes)
+        self.card_registry = card_registry
+        self.n_players, self.n_cards = knowledge.shape
+        # active constraints for each player
+        self.constraints_by_player = [[] for player_id in range(self.n_players)]
+        # active constraints involving each (player, card), so that a new fact only re-examines the constraints it touches
+        self.constraints_by_cell = {}
+        # items still to be examined: ('constraint', constraint), ('player', player_id) or ('category', category index)
+        self.worklist = deque()
+        self.queued = set()
+        # number of constraint examinations and of knowledge matrix cells changed, for instrumentation
+        self.n_examinations = 0
+        self.n_updates = 0
+        if constraints is None:
+            for player_id in range(self.n_players):
+                self.enqueue(('player', player_id))
+        else:
+            for player_id, mask, round in constraints:
+                self.insert(Constraint(player_id, mask, round))
+
+    def enqueue(self, item):
+        key = (item[0], id(item[1])) if item[0] == 'constraint' else item
+        if key not in self.queued:
+            self.queued.add(key)
+            self.worklist.append(item)
+
+    # record that a player holds a card (and therefore that no other player does)
+    def set_has(self, player_id, card_id):
+        for other_id in range(self.n_players):
+            self.set_cell(other_id, card_id, HAS_CARD if other_id == player_id else NOT_HAS_CARD)
+
+    # record that a player does not hold a card
+    def set_not_has(self, player_id, card_id):
+        self.set_cell(player_id, card_id, NOT_HAS_CARD)
+
+    # update one cell of the knowledge matrix and queue everything that depends on it
+    def set_cell(self, player_id, card_id, value):
+        if self.knowledge[player_id, card_id] == value:
+            return
+        self.knowledge[player_id, card_id] = value
+        self.n_updates += 1
+        for constraint in self.constraints_by_cell.get((player_id, card_id), ()):
+            self.enqueue(('constraint', constraint))
+        self.enqueue(('player', player_id))
+        self.enqueue(('category', int(self.card_registry.card_categories[card_id])))
+
+    # add a constraint that a player holds at least one of the given cards
+    def add_constraint(self, player_id, card_ids, round):
+        constraint = Constraint(player_id, cards_mask(card_ids), round)
+        # a constraint implied by an existing (smaller) one tells us nothing new
+        for existing in self.player_constraints(player_id):
+            if existing.mask & constraint.mask == existing.mask:
+                return existing
+        self.insert(constraint)
+        # and existing (larger) constraints implied by the new one are redundant
+        for existing in self.player_constraints(player_id):
+            if existing is not constraint and existing.mask & constraint.mask == constraint.mask:
+                self.retire(existing)
+        self.enqueue(('constraint', constraint))
+        return constraint
+
+    # index a constraint by player and by (player, card)
+    def insert(self, constraint):
+        self.constraints_by_player[constraint.player_id].append(constraint)
+        for card_id in mask_cards(constraint.mask):
+            self.constraints_by_cell.setdefault((constraint.player_id, card_id), []).append(constraint)
+
+    # active constraints for a player
+    def player_constraints(self, player_id):
+        return list(self.constraints_by_player[player_id])
+
+    # all active constraints
+    @property
+    def constraints(self):
+        return [constraint for player_constraints in self.constraints_by_player for constraint in player_constraints]
+
+    # drop a constraint that is satisfied or subsumed
+    def retire(self, constraint):
+        constraint.active = False
+        self.constraints_by_player[constraint.player_id].remove(constraint)
+        for card_id in mask_cards(constraint.mask):
+            self.constraints_by_cell[(constraint.player_id, card_id)].remove(constraint)
+
+    # re-examine queued items until no more deductions can be made
+    def propagate(self):
+        while self.worklist:
+            item = self.worklist.popleft()
+            self.queued.discard((item[0], id(item[1])) if item[0] == 'constraint' else item)
+            if item[0] == 'constraint':
+                self.examine_constraint(item[1])
+            elif item[0] == 'player':
+                self.examine_player(item[1])
+            else:
+                self.examine_category(item[1])
+
+    # remove cards the player cannot hold from a constraint, and deduce the card if only one remains
+    def examine_constraint(self, constraint):
+        if not constraint.active:
+            return
+        self.n_examinations += 1
+        row = self.knowledge[constraint.player_id]
+        remaining = 0
+        for card_id in mask_cards(constraint.mask):
+            if row[card_id] == HAS_CARD:
+                # the player is known to hold one of the cards, so the constraint is satisfied
+                self.retire(constraint)
+                return
+            elif row[card_id] == UNKNOWN:
+                remaining |= 1 << card_id
+        if remaining == 0:
+            # contradictory input (e.g. a mistyped answer): nothing can be deduced from the constraint
+            self.retire(constraint)
+            return
+        if remaining != constraint.mask:
+            # cards that were ruled out no longer need to be tracked
+            for card_id in mask_cards(constraint.mask & ~remaining):
+                self.constraints_by_cell[(constraint.player_id, card_id)].remove(constraint)
+            constraint.mask = remaining
+            # the smaller constraint may make others for the same player redundant
+            for other in self.player_constraints(constraint.player_id):
+                if other is constraint:
+                    continue
+                if other.mask & remaining == remaining:
+                    self.retire(other)
+                elif other.mask & remaining == other.mask:
+                    self.retire(constraint)
+                    return
+        if remaining & (remaining - 1) == 0:
+            self.retire(constraint)
+            self.set_has(constraint.player_id, remaining.bit_length() - 1)
+
+    # apply the hand-size rules to a player
+    def examine_player(self, player_id):
+        hand_size = self.hand_sizes[player_id]
+        if hand_size is None:
+            return
+        self.n_examinations += 1
+        row = self.knowledge[player_id]
+        n_known = int((row == HAS_CARD).sum())
+        unknown = [int(card_id) for card_id in (row == UNKNOWN).nonzero()[0]]
+        # a player whose hand is fully known holds none of the other cards
+        if n_known >= hand_size:
+            for card_id in unknown:
+                self.set_not_has(player_id, card_id)
+        # a player with exactly enough candidate cards left holds all of them
+        elif n_known + len(unknown) == hand_size:
+            for card_id in unknown:
+                self.set_has(player_id, card_id)
+
+    # apply the rule that every card is either in one player's hand or in the envelope, and the envelope holds one card per category
+    def examine_category(self, category):
+        self.n_examinations += 1
+        category_slice = list(self.card_registry.category_slices.values())[category]
+        columns = self.knowledge[:, category_slice]
+        held = (columns == HAS_CARD).any(axis = 0)
+        in_envelope = (columns == NOT_HAS_CARD).all(axis = 0)
+        # if all but one card of the category are held, the last one is in the envelope
+        if (~held).sum() == 1 and not in_envelope.any():
+            card_id = category_slice.start + int((~held).nonzero()[0][0])
+            for player_id in range(self.n_players):
+                self.set_not_has(player_id, card_id)
+        # if the envelope card of the category is known, every other card is held by one of the players
+        elif in_envelope.sum() == 1:
+            for offset in (~held & ~in_envelope).nonzero()[0]:
+                candidates = (columns[:, offset] != NOT_HAS_CARD).nonzero()[0]
+                if len(candidates) == 1:
+                    self.set_has(int(candidates[0]), category_slice.start + int(offset))
@@ -0,0 +1,106 @@
+import numpy as np
+from Reachability import ReachabilityIndex
+
+# distance used for pairs of squares that are not connected
+UNREACHABLE = 10000
+
+class DistanceIndex:
+
+    # initialize with a (symmetric) adjacency matrix of the board, and optionally tables that were precomputed for it
+    def __init__(self, adj_mat, distances = None, next_hop = None):
+        self.adjacency = np.asarray(adj_mat) != 0
+        self.n_squares = self.adjacency.shape[0]
+        # moving to the same square is never a step, so self loops are ignored
+        self.adjacency[np.diag_indices(self.n_squares)] = False
+        # precomputed tables may be read-only memory maps, which are only copied once an edge is added
+        self.distances = DistanceIndex.all_pairs_distances(self.adjacency) if distances is None else distances
+        self.next_hop = DistanceIndex.all_pairs_next_hop(self.adjacency, self.distances) if next_hop is None else next_hop
+        # number of edges added since loading, so that anything cached from the tables can tell when they changed
+        self.version = 0
+        # number of path queries answered, for instrumentation
+        self.n_queries = 0
+        # bitsets of the squares reachable with each roll, built when first used and again after an edge is added
+        self._reachability = None
+        self._reachability_version = None
+
+    # breadth first search from every square at once, expanding the frontier one step at a time
+    @staticmethod
+    def all_pairs_distances(adjacency):
+        n_squares = adjacency.shape[0]
+        distances = np.full((n_squares, n_squares), UNREACHABLE, dtype = np.int16)
+        distances[np.diag_indices(n_squares)] = 0
+        visited = np.eye(n_squares, dtype = bool)
+        frontier = visited.copy()
+        step = 0
+        while frontier.any():
+            step += 1
+            # squares adjacent to the frontier that have not been visited yet
+            frontier = (frontier.astype(np.uint8) @ adjacency.astype(np.uint8) > 0) & ~visited
+            distances[frontier] = step
+            visited |= frontier
+        return distances
+
+    # table of the first square to move to on a shortest path from each square to every other square
+    @staticmethod
+    def all_pairs_next_hop(adjacency, distances):
+        n_squares = adjacency.shape[0]
+        next_hop = np.tile(np.arange(n_squares, dtype = np.int16), (n_squares, 1))
+        for square in range(n_squares):
+            neighbours = np.flatnonzero(adjacency[square])
+            if len(neighbours) == 0:
+                continue
+            # the neighbour closest to each target is one step along a shortest path
+            closest = np.argmin(distances[neighbours], axis = 0)
+            reachable = distances[square] < UNREACHABLE
+            reachable[square] = False
+            next_hop[square, reachable] = neighbours[closest[reachable]]
+        return next_hop
+
+    # squares reachable from every square with each roll, following the edges of the index (including any that were added)
+    @property
+    def reachability(self):
+        if self._reachability is None or self._reachability_version != self.version:
+            self._reachability = ReachabilityIndex(self.adjacency)
+            self._reachability_version = self.version
+        return self._reachability
+
+    # length of the shortest path between two squares
+    def path_length(self, source, target):
+        self.n_queries += 1
+        return int(self.distances[source, target])
+
+    # square reached by moving n_steps along the shortest path from source to target
+    def step_towards(self, source, target, n_steps):
+        self.n_queries += 1
+        if self.distances[source, target] >= UNREACHABLE:
+            raise ValueError('Square {} cannot be reached from square {}'.format(target, source))
+        square = source
+        for i in range(min(n_steps, self.distances[source, target])):
+            square = self.next_hop[square, target]
+        return int(square)
+
+    # full shortest path between two squares, including both ends
+    def shortest_path(self, source, target):
+        return [self.step_towards(source, target, step) for step in range(self.path_length(source, target) + 1)]
+
+    # add an edge to the board, updating only the pairs of squares that get closer through it
+    def add_edge(self, square_a, square_b):
+        if square_a == square_b or self.adjacency[square_a, square_b]:
+            return
+        self.adjacency[square_a, square_b] = self.adjacency[square_b, square_a] = True
+        self.version += 1
+        if not self.distances.flags.writeable:
+            self.distances = np.array(self.distances)
+            self.next_hop = np.array(self.next_hop)
+        for start, end in [(square_a, square_b), (square_b, square_a)]:
+            # distance from every square to every other square when the path crosses the new edge from start to end
+            through_edge = self.distances[:, start, None] + 1 + self.distances[None, end, :]
+            improved = through_edge < self.distances
+            if not improved.any():
+                continue
+            self.distances[improved] = through_edge[improved]
+            # paths that cross the new edge begin the same way as the path to its start
+            first_steps = self.next_hop[:, start].copy()
+            first_steps[start] = end
+            sources = np.nonzero(improved)[0]
+            self.next_hop[improved] = first_steps[sources]
@@ -0,0 +1,535 @@
+import numpy as np
+from math import factorial, prod
+from collections import OrderedDict
+from Knowledge import HAS_CARD, NOT_HAS_CARD
+from Deduction import mask_cards
+
+class UsageCodec:
+
+    # packs the number of cards given to each hand with a known size, and to the envelope in each category, into a single integer
+    # each field has a guard bit above it, so that subtracting two packed usages can detect a negative field
+    def __init__(self, capacities):
+        self.capacities = list(capacities)
+        self.shifts = []
+        shift = 0
+        for capacity in self.capacities:
+            self.shifts.append(shift)
+            shift += max(2 * capacity, 1).bit_length() + 1
+        self.guards = sum(1 << (shift + max(2 * capacity, 1).bit_length()) for shift, capacity in zip(self.shifts, self.capacities))
+        self.total = self.encode(self.capacities)
+
+    def encode(self, counts):
+        return sum(count << shift for count, shift in zip(counts, self.shifts))
+
+    def unit(self, field):
+        return 0 if field is None else 1 << self.shifts[field]
+
+    def field(self, usage, field):
+        return (usage >> self.shifts[field]) & ((1 << (max(2 * self.capacities[field], 1).bit_length())) - 1)
+
+    # check that a usage does not exceed any capacity
+    def fits(self, usage):
+        return all(self.field(usage, field) <= capacity for field, capacity in enumerate(self.capacities))
+
+    # usage left after taking one usage from another, or None if some field would become negative
+    def subtract(self, usage, taken):
+        difference = (usage | self.guards) - taken
+        if difference & self.guards != self.guards:
+            return None
+        return difference - self.guards
+
+    # usage that complements the given one up to the full capacities, or None if it already exceeds them
+    def remainder(self, usage):
+        return self.subtract(self.total, usage)
+
+class SolverResult:
+
+    # counts[owner, card] is the number of consistent deals giving the card to the owner (the last owner is the envelope)
+    def __init__(self, counts, total):
+        self.total = total
+        self.counts = counts
+        self.probabilities = np.array([[count / total for count in row] for row in counts], dtype = float)
+        self.envelope_probabilities = self.probabilities[-1]
+        # cards that are in the envelope in every consistent deal, compared exactly
+        self.envelope_certain = np.array([count == total for count in counts[-1]], dtype = bool)
+
+class Decomposition:
+
+    # a problem split into tables of cards that can be dealt independently, within the capacity left once the fixed cards are
+    # dealt (the target usage): the tables with their serial numbers, the convolutions of the totals of the first i tables for
+    # each i, the number of consistent deals and the owner of each fixed card (-1 for the cards in the tables)
+    def __init__(self, codec, target, tables, serials, prefixes, total, fixed_owners):
+        self.codec = codec
+        self.target = target
+        self.tables = tables
+        self.serials = serials
+        self.prefixes = prefixes
+        self.total = total
+        self.fixed_owners = fixed_owners
+
+class EnvelopeSolver:
+
+    # initialize with the card registry of the game; the tables of the groups and components of cards, and the convolutions of
+    # runs of them, are kept between solves (up to max_tables and max_convolutions of each, least recently used first out), so
+    # that after a new fact only the tables it touched are rebuilt
+    def __init__(self, card_registry, max_tables = 4096, max_convolutions = 4096):
+        self.card_registry = card_registry
+        self.max_tables = max_tables
+        self.max_convolutions = max_convolutions
+        # tables by signature, as (serial number, table); serial numbers are given in the order the tables were built
+        self.tables = OrderedDict()
+        # usage codecs by capacities, and convolutions of the totals of runs of tables by the target usage and the serial
+        # numbers of the tables (which also tell which codec they were built with)
+        self.codecs = {}
+        self.convolutions = OrderedDict()
+        # number of tables built and convolutions computed (i.e. cache misses), for instrumentation
+        self.n_tables_built = 0
+        self.n_convolutions = 0
+
+    # count the deals consistent with the knowledge matrix, the envelope mask, the hand sizes (None if unknown) and the
+    # constraints (pairs of player id and card bitmask); returns None if no deal is consistent
+    def solve(self, knowledge, envelope_mask, hand_sizes, constraints):
+        n_players, n_cards = knowledge.shape
+        decomposition = self.decompose(knowledge, envelope_mask, hand_sizes, constraints)
+        if decomposition is None:
+            return None
+        codec, target, tables, serials, prefixes = (decomposition.codec, decomposition.target, decomposition.tables,
+                                                    decomposition.serials, decomposition.prefixes)
+        counts = [[0] * n_cards for owner in range(n_players + 1)]
+        # prefix and suffix convolutions give each table the number of ways to complete its usage
+        for i in reversed(range(len(tables))):
+            suffix = self.convolution(codec, target, tables, serials, i + 1, len(tables))
+            tables[i].add_counts(counts, contexts(prefixes[i], suffix, tables[i].totals, target, codec))
+
+        # fixed cards belong to their owner in every deal
+        for card_id in np.flatnonzero(decomposition.fixed_owners >= 0):
+            counts[decomposition.fixed_owners[card_id]][card_id] = decomposition.total
+        return SolverResult(counts, decomposition.total)
+
+    # draw deals uniformly at random from the ones consistent with a problem (as for solve), as an array of the owner of each
+    # card in each deal (the last owner is the envelope); returns None if no deal is consistent
+    def sample(self, knowledge, envelope_mask, hand_sizes, constraints, n_samples, rng):
+        decomposition = self.decompose(knowledge, envelope_mask, hand_sizes, constraints)
+        if decomposition is None:
+            return None
+        codec, tables, prefixes = decomposition.codec, decomposition.tables, decomposition.prefixes
+        deals = np.tile(decomposition.fixed_owners.astype(np.int8), (n_samples, 1))
+        # from the last table back, each table takes a usage in proportion to the number of ways it can be completed by the
+        # tables before it; deals are handled in groups with the same usage left, and the table deals its cards for each usage
+        remaining = {decomposition.target: np.arange(n_samples)}
+        for i in reversed(range(len(tables))):
+            next_remaining = {}
+            by_usage = {}
+            for left, rows in remaining.items():
+                options = []
+                for usage, ways in tables[i].totals.items():
+                    rest = codec.subtract(left, usage)
+                    if rest is not None and prefixes[i].get(rest, 0):
+                        options.append((usage, rest, ways * prefixes[i][rest]))
+                choices = draw_indices(proportions([weight for usage, rest, weight in options]), len(rows), rng)
+                for option, (usage, rest, weight) in enumerate(options):
+                    chosen = rows[choices == option]
+                    if len(chosen):
+                        by_usage.setdefault(usage, []).append(chosen)
+                        next_remaining.setdefault(rest, []).append(chosen)
+            for usage, parts in by_usage.items():
+                rows = np.concatenate(parts)
+                deals[rows[:, None], tables[i].cards] = tables[i].draw(usage, len(rows), rng)
+            remaining = {left: np.concatenate(parts) for left, parts in next_remaining.items()}
+        return deals
+
+    # split a problem into tables of independent cards (see solve and sample), or None if no deal is consistent
+    def decompose(self, knowledge, envelope_mask, hand_sizes, constraints):
+        n_players, n_cards = knowledge.shape
+        envelope = n_players
+        # owners allowed to hold each card: the player known to hold it, or else the players that are not known to lack it
+        # and the envelope if it is still possible
+        held = (knowledge == HAS_CARD).any(axis = 0)
+        allowed = np.vstack([np.where(held, knowledge == HAS_CARD, knowledge != NOT_HAS_CARD), envelope_mask & ~held])
+        if not allowed.any(axis = 0).all():
+            return None
+
+        # hands of known size are tracked in the usage, and hands of unknown size are unconstrained; the codec only depends on
+        # the hand sizes, so tables built for one solve of a game can be reused by the next
+        tracked = [player_id for player_id in range(n_players) if hand_sizes[player_id] is not None]
+        fields = {player_id: field for field, player_id in enumerate(tracked)}
+        codec = self.codec(tuple(hand_sizes[player_id] for player_id in tracked) + (1,) * len(self.card_registry.categories))
+        field_of = lambda owner, card_id: (len(tracked) + self.card_registry.card_categories[card_id] if owner == envelope
+                                           else fields.get(owner))
+
+        # cards with a single possible owner are fixed, and use up that owner's capacity; the rest of the cards must use
+        # exactly the capacity that is left
+        fixed = allowed.sum(axis = 0) == 1
+        fixed_usage = 0
+        for card_id in np.flatnonzero(fixed):
+            fixed_usage += codec.unit(field_of(int(np.flatnonzero(allowed[:, card_id])[0]), card_id))
+        target = codec.remainder(fixed_usage)
+        if target is None:
+            return None
+        constraints = [(player_id, mask) for player_id, mask in constraints
+                       if not any(fixed[card_id] and allowed[player_id, card_id] for card_id in mask_cards(mask))]
+        if any(all(fixed[card_id] for card_id in mask_cards(mask)) for player_id, mask in constraints):
+            return None
+        for player_id in tracked:
+            if codec.field(target, fields[player_id]) == 0:
+                allowed[player_id, ~fixed] = False
+
+        # cards linked by constraints form components that are counted card by card; the other cards are interchangeable
+        # within groups sharing a category and a set of possible owners, and are counted with multinomials
+        parts = self.components(constraints, ~fixed)
+        grouped = set(card_id for component, component_constraints in parts for card_id in component)
+        groups = {}
+        for card_id in np.flatnonzero(~fixed):
+            if card_id not in grouped:
+                key = (self.card_registry.card_categories[card_id], tuple(np.flatnonzero(allowed[:, card_id])))
+                groups.setdefault(key, []).append(int(card_id))
+        codec_key = (tuple(tracked), tuple(codec.capacities))
+        tables = [self.table((codec_key, 'group', tuple(cards), owners), lambda: GroupTable(cards, owners, codec, field_of))
+                  for (category, owners), cards in groups.items()]
+        tables += [self.table((codec_key, 'component', tuple(cards), tuple((player_id, tuple(constraint_cards))
+                                                                           for player_id, constraint_cards in component_constraints),
+                               allowed[:, cards].tobytes()),
+                              lambda: ComponentTable(cards, component_constraints, allowed, codec, field_of))
+                   for cards, component_constraints in parts]
+        # tables that have been kept from earlier solves come first, so that their prefix convolutions can be reused too
+        tables.sort(key = lambda serial_table: serial_table[0])
+        serials = tuple(serial for serial, table in tables)
+        tables = [table for serial, table in tables]
+
+        # prefix convolutions of the tables' totals
+        prefixes = [self.convolution(codec, target, tables, serials, 0, i) for i in range(len(tables) + 1)]
+        total = prefixes[-1].get(target, 0)
+        if total == 0:
+            return None
+        fixed_owners = np.where(fixed, allowed.argmax(axis = 0), -1)
+        return Decomposition(codec, target, tables, serials, prefixes, total, fixed_owners)
+
+    # codec for the given capacities (kept, as tables built with it can be reused)
+    def codec(self, capacities):
+        if capacities not in self.codecs:
+            self.codecs[capacities] = UsageCodec(capacities)
+        return self.codecs[capacities]
+
+    # the table with a signature, with its serial number, built if it is not kept from an earlier solve
+    def table(self, signature, build):
+        serial_table = self.tables.get(signature)
+        if serial_table is None:
+            serial_table = self.tables[signature] = (self.n_tables_built, build())
+            self.n_tables_built += 1
+            if len(self.tables) > self.max_tables:
+                self.tables.popitem(last = False)
+        else:
+            self.tables.move_to_end(signature)
+        return serial_table
+
+    # convolution of the totals of tables[start:end] within the target usage, computed from the one for tables[start:end - 1]
+    # (or tables[start + 1:end] for suffixes) if it is not kept from an earlier solve
+    def convolution(self, codec, target, tables, serials, start, end):
+        if start == end:
+            return {0: 1}
+        key = (target, serials[start:end])
+        result = self.convolutions.get(key)
+        if result is None:
+            if start == 0:
+                result = convolve(self.convolution(codec, target, tables, serials, start, end - 1), tables[end - 1].totals, codec, target)
+            else:
+                result = convolve(tables[start].totals, self.convolution(codec, target, tables, serials, start + 1, end), codec, target)
+            self.convolutions[key] = result
+            self.n_convolutions += 1
+            if len(self.convolutions) > self.max_convolutions:
+                self.convolutions.popitem(last = False)
+        else:
+            self.convolutions.move_to_end(key)
+        return result
+
+    # group the constraints (and the unfixed cards they mention) into independent components
+    @staticmethod
+    def components(constraints, unfixed):
+        parent = {}
+        def find(card_id):
+            while parent[card_id] != card_id:
+                parent[card_id] = parent[parent[card_id]]
+                card_id = parent[card_id]
+            return card_id
+        for player_id, mask in constraints:
+            cards = [card_id for card_id in mask_cards(mask) if unfixed[card_id]]
+            for card_id in cards:
+                parent.setdefault(card_id, card_id)
+            for card_id in cards[1:]:
+                parent[find(card_id)] = find(cards[0])
+        parts = {}
+        for card_id in parent:
+            parts.setdefault(find(card_id), ([], []))[0].append(card_id)
+        for player_id, mask in constraints:
+            cards = [card_id for card_id in mask_cards(mask) if unfixed[card_id]]
+            parts[find(cards[0])][1].append((player_id, cards))
+        return [(sorted(cards), sorted(component_constraints)) for cards, component_constraints in parts.values()]
+
+# convolution of two usage tables, dropping usages that exceed the target usage (the guard bits of the codec are checked
+# inline, as this is the innermost loop of the solver); large tables are convolved with numpy, as every count is a number
+# of ways of dealing some of the cards, which fits in 64 bits unless there are very many cards and owners
+def convolve(left, right, codec, target):
+    if len(left) * len(right) >= 256 and (target | codec.guards) < 2 ** 62 and max(left.values()) * max(right.values()) * min(len(left), len(right)) < 2 ** 62:
+        return convolve_arrays(left, right, codec, target)
+    result = {}
+    guards = codec.guards
+    guarded_target = target | guards
+    for left_usage, left_count in left.items():
+        for right_usage, right_count in right.items():
+            usage = left_usage + right_usage
+            if (guarded_target - usage) & guards != guards:
+                continue
+            result[usage] = result.get(usage, 0) + left_count * right_count
+    return result
+
+# number of ways the tables before and after a given one can together use exactly the remaining capacity (looking up the
+# larger of the two tables for each usage of the smaller)
+def complete(prefix, suffix, remainder, codec):
+    if len(suffix) < len(prefix):
+        prefix, suffix = suffix, prefix
+    ways = 0
+    guards = codec.guards
+    guarded_remainder = remainder | guards
+    for usage, count in prefix.items():
+        rest = guarded_remainder - usage
+        if rest & guards == guards:
+            ways += count * suffix.get(rest - guards, 0)
+    return ways
+
+# number of ways the tables before and after a given one can complete each of its usages to the target usage; for many
+# usages, every usage of the smaller of the two tables is looked up in the larger at once with numpy (within 64 bits, as
+# for convolve)
+def contexts(prefix, suffix, usages, target, codec):
+    if len(suffix) < len(prefix):
+        prefix, suffix = suffix, prefix
+    if (len(usages) * len(prefix) < 256 or (target | codec.guards) >= 2 ** 62
+            or max(prefix.values()) * max(suffix.values()) * len(prefix) >= 2 ** 62):
+        context = {}
+        for usage in usages:
+            remainder = codec.subtract(target, usage)
+            context[usage] = 0 if remainder is None else complete(prefix, suffix, remainder, codec)
+        return context
+    guards = codec.guards
+    usage_array = np.fromiter(usages, dtype = np.int64, count = len(usages))
+    prefix_usages, prefix_counts = table_arrays(prefix)
+    suffix_usages, suffix_counts = table_arrays(suffix)
+    order = np.argsort(suffix_usages)
+    suffix_usages, suffix_counts = suffix_usages[order], suffix_counts[order]
+    # the usage left for the larger table, for each usage of the table and of the smaller table (guards cleared if it fits)
+    rests = ((target | guards) - usage_array[:, None]) - prefix_usages[None, :]
+    fits = rests & guards == guards
+    rests -= guards
+    found = np.minimum(np.searchsorted(suffix_usages, rests), len(suffix_usages) - 1)
+    matched = fits & (suffix_usages[found] == rests)
+    ways = (np.where(matched, suffix_counts[found], 0) * prefix_counts[None, :]).sum(axis = 1)
+    return dict(zip(usages, ways.tolist()))
+
+# convolve, with every pair of usages at once
+def convolve_arrays(left, right, codec, target):
+    left_usages, left_counts = table_arrays(left)
+    right_usages, right_counts = table_arrays(right)
+    usages = left_usages[:, None] + right_usages[None, :]
+    fits = ((target | codec.guards) - usages) & codec.guards == codec.guards
+    usages, counts = usages[fits], (left_counts[:, None] * right_counts[None, :])[fits]
+    order = np.argsort(usages, kind = 'stable')
+    usages, counts = usages[order], counts[order]
+    starts = np.flatnonzero(np.concatenate([[True], usages[1:] != usages[:-1]])) if len(usages) else np.zeros(0, dtype = int)
+    return dict(zip(usages[starts].tolist(), np.add.reduceat(counts, starts).tolist() if len(usages) else []))
+
+# the usages and counts of a usage table, as arrays
+def table_arrays(table):
+    return np.fromiter(table.keys(), dtype = np.int64, count = len(table)), np.fromiter(table.values(), dtype = np.int64, count = len(table))
+
+# probabilities in proportion to a list of (possibly very large) integer weights
+def proportions(weights):
+    total = sum(weights)
+    return np.array([weight / total for weight in weights])
+
+# draw n indices with the given probabilities (inverting their cumulative sum, which is much cheaper than Generator.choice for
+# the many small draws of sampling)
+def draw_indices(probabilities, n, rng):
+    return np.minimum(np.searchsorted(np.cumsum(probabilities), rng.random(n), side = 'right'), len(probabilities) - 1)
+
+class GroupTable:
+
+    # interchangeable cards (same category and possible owners); owners whose hand size is unknown are pooled
+    def __init__(self, cards, owners, codec, field_of):
+        self.cards = cards
+        self.owners = owners
+        n_cards = len(cards)
+        tracked = [owner for owner in owners if field_of(owner, cards[0]) is not None]
+        pooled = [owner for owner in owners if field_of(owner, cards[0]) is None]
+        units = [codec.unit(field_of(owner, cards[0])) for owner in tracked]
+        capacities = [codec.capacities[field_of(owner, cards[0])] for owner in tracked]
+        # every way of splitting the cards between the tracked owners, with the rest going to the pooled owners
+        self.splits = []
+        self.totals = {}
+        for split in splits(n_cards, capacities):
+            pooled_cards = n_cards - sum(split)
+            if pooled_cards > 0 and not pooled:
+                continue
+            ways = factorial(n_cards) // prod([factorial(count) for count in split]) // factorial(pooled_cards)
+            ways *= len(pooled) ** pooled_cards
+            usage = sum(count * unit for count, unit in zip(split, units))
+            self.splits.append((usage, ways, split, pooled_cards))
+            self.totals[usage] = self.totals.get(usage, 0) + ways
+        self.tracked = tracked
+        self.pooled = pooled
+
+    # add the number of deals giving each card to each owner, given the number of ways to complete each usage
+    def add_counts(self, counts, context):
+        n_cards = len(self.cards)
+        # by symmetry each card goes to an owner in the same proportion of deals, so the count is the same for every card
+        card_counts = dict.fromkeys(self.tracked + self.pooled, 0)
+        for usage, ways, split, pooled_cards in self.splits:
+            weight = ways * context[usage]
+            if weight == 0:
+                continue
+            for owner, count in zip(self.tracked, split):
+                card_counts[owner] += weight * count // n_cards
+            for owner in self.pooled:
+                card_counts[owner] += weight * pooled_cards // (n_cards * len(self.pooled))
+        for owner, count in card_counts.items():
+            for card_id in self.cards:
+                counts[owner][card_id] += count
+
+    # draw the owners of the cards in n deals that give them the given usage, uniformly from the ways of doing so
+    def draw(self, usage, n, rng):
+        n_cards = len(self.cards)
+        options = [(ways, split, pooled_cards) for split_usage, ways, split, pooled_cards in self.splits if split_usage == usage]
+        choices = draw_indices(proportions([ways for ways, split, pooled_cards in options]), n, rng)
+        owners = np.empty((n, n_cards), dtype = np.int8)
+        for option, (ways, split, pooled_cards) in enumerate(options):
+            rows = np.flatnonzero(choices == option)
+            # the split's owners in a random order over the cards, with a random pooled owner for each pooled card
+            slots = np.concatenate([np.repeat(self.tracked, split), np.full(pooled_cards, -1)]).astype(np.int8)
+            drawn = slots[np.argsort(rng.random((len(rows), n_cards)), axis = 1)]
+            if pooled_cards:
+                drawn[drawn == -1] = rng.choice(self.pooled, size = len(rows) * pooled_cards)
+            owners[rows] = drawn
+        return owners
+
+# every split of n_cards into bins of the given capacities (with any cards left over), built up one bin at a time
+def splits(n_cards, capacities):
+    partial = [([], n_cards)]
+    for capacity in capacities:
+        partial = [(split + [count], left - count) for split, left in partial for count in range(min(left, capacity) + 1)]
+    return [split for split, left in partial]
+
+# order of the cards of a component that places the cards of the constraint with the fewest cards left to place next, so
+# that each constraint is closed soon after its first card is placed
+def closing_order(cards, constraints):
+    order = []
+    placed = set()
+    open_constraints = [set(constraint_cards) for player_id, constraint_cards in constraints]
+    while open_constraints:
+        closest = min(open_constraints, key = lambda constraint_cards: len(constraint_cards - placed))
+        open_constraints.remove(closest)
+        order += sorted(closest - placed)
+        placed |= closest
+    return order + [card_id for card_id in cards if card_id not in placed]
+
+class ComponentTable:
+
+    # cards linked by constraints, counted card by card while tracking which constraints are satisfied; the cards are taken
+    # in an order that closes constraints early, as the open constraints multiply the number of states
+    def __init__(self, cards, constraints, allowed, codec, field_of):
+        self.cards = cards = closing_order(cards, constraints)
+        position = {card_id: i for i, card_id in enumerate(cards)}
+        # bits of the constraints each (card, owner) assignment satisfies, and the constraints that end at each card
+        satisfies = {}
+        self.ending = [0] * len(cards)
+        for bit, (player_id, constraint_cards) in enumerate(constraints):
+            for card_id in constraint_cards:
+                satisfies[(card_id, player_id)] = satisfies.get((card_id, player_id), 0) | (1 << bit)
+            self.ending[max(position[card_id] for card_id in constraint_cards)] |= 1 << bit
+        self.moves = [[(owner, codec.unit(field_of(owner, card_id)), satisfies.get((card_id, owner), 0))
+                       for owner in np.flatnonzero(allowed[:, card_id])] for card_id in cards]
+        self.codec = codec
+        # forward pass over (usage, satisfied constraints) states, keeping the moves out of each state of each layer (as
+        # pairs of owner and next state) for the backward passes of later solves
+        self.layers = [{(0, 0): 1}]
+        self.edges = []
+        guards = codec.guards
+        guarded_total = codec.total | guards
+        for i in range(len(cards)):
+            layer = {}
+            edges = []
+            ending = self.ending[i]
+            for (usage, satisfied), count in self.layers[-1].items():
+                state_edges = []
+                for owner, unit, bits in self.moves[i]:
+                    # (transition, inlined as this runs for every move out of every state)
+                    next_usage, next_satisfied = usage + unit, satisfied | bits
+                    if (guarded_total - next_usage) & guards != guards or next_satisfied & ending != ending:
+                        continue
+                    next_state = (next_usage, next_satisfied & ~ending)
+                    layer[next_state] = layer.get(next_state, 0) + count
+                    state_edges.append((owner, next_state))
+                edges.append(state_edges)
+            self.layers.append(layer)
+            self.edges.append(edges)
+        self.totals = {usage: count for (usage, bits), count in self.layers[-1].items()}
+        # the index of each state of each layer, and the ways into them, for drawing deals (built on first use)
+        self.state_index = None
+        self.predecessors = None
+
+    # draw the owners of the cards in n deals that give them the given usage, uniformly from the ways of doing so: from the
+    # last card back, each card's owner is drawn in proportion to the number of ways of reaching the state before it
+    def draw(self, usage, n, rng):
+        if self.predecessors is None:
+            self.build_predecessors()
+        owners = np.empty((n, len(self.cards)), dtype = np.int8)
+        states = np.full(n, self.state_index[-1][(usage, 0)])
+        for i in reversed(range(len(self.cards))):
+            bounds, previous_states, move_owners = self.predecessors[i]
+            # the ways into each state take consecutive slices of [state, state + 1)
+            chosen = np.searchsorted(bounds, states + rng.random(n), side = 'right')
+            owners[:, i] = move_owners[chosen]
+            states = previous_states[chosen]
+        return owners
+
+    # for each card, every way into each state of the next layer, as arrays sorted by that state: the upper bound of the
+    # way's slice of [state, state + 1) (in proportion to the number of ways of reaching the state it comes from), the
+    # index of that state, and the card's owner
+    def build_predecessors(self):
+        self.state_index = [{state: index for index, state in enumerate(layer)} for layer in self.layers]
+        self.predecessors = []
+        for i in range(len(self.cards)):
+            next_index = self.state_index[i + 1]
+            into, previous_states, move_owners, counts = [], [], [], []
+            for index, (count, state_edges) in enumerate(zip(self.layers[i].values(), self.edges[i])):
+                for owner, next_state in state_edges:
+                    into.append(next_index[next_state])
+                    previous_states.append(index)
+                    move_owners.append(owner)
+                    counts.append(count)
+            order = np.argsort(into, kind = 'stable')
+            into = np.array(into)[order]
+            starts = np.flatnonzero(np.concatenate([[True], into[1:] != into[:-1]]))
+            lengths = np.diff(np.append(starts, len(into)))
+            # each state's ways, as a proportion of all the ways into it, accumulated within the state
+            weights = np.array(counts, dtype = float)[order]
+            weights /= np.repeat(np.add.reduceat(weights, starts), lengths)
+            cumulative = np.cumsum(weights)
+            cumulative -= np.repeat(cumulative[starts] - weights[starts], lengths)
+            cumulative[starts + lengths - 1] = 1.0
+            self.predecessors.append((into + cumulative, np.array(previous_states)[order], np.array(move_owners, dtype = np.int8)[order]))
+
+    # backward pass, weighting each final usage by the number of ways to complete it
+    def add_counts(self, counts, context):
+        backward = {(usage, 0): context[usage] for usage in self.totals}
+        for i in reversed(range(len(self.cards))):
+            previous = {}
+            card_counts = {}
+            for (state, count), state_edges in zip(self.layers[i].items(), self.edges[i]):
+                ways = 0
+                for owner, next_state in state_edges:
+                    next_ways = backward[next_state]
+                    if next_ways:
+                        card_counts[owner] = card_counts.get(owner, 0) + count * next_ways
+                        ways += next_ways
+                previous[state] = ways
+            for owner, count in card_counts.items():
+                counts[owner][self.cards[i]] += count
+            backward = previous
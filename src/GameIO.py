@@ -0,0 +1,208 @@
+import json
+import time
+from abc import ABC, abstractmethod
+
+class GameIO(ABC):
+
+    # the questions and messages of a game; frontends answer questions and present messages, and decide on any pacing
+
+    # ask for one of a list of choices
+    @abstractmethod
+    def choose(self, choices, message, error_message = None):
+        pass
+
+    # ask for any number of a list of choices
+    @abstractmethod
+    def choose_many(self, choices, message):
+        pass
+
+    # ask for a whole number between low and high (inclusive)
+    @abstractmethod
+    def ask_number(self, message, low, high):
+        pass
+
+    # show a message
+    @abstractmethod
+    def say(self, message):
+        pass
+
+    # show a message that only the player it is meant for should see (e.g. the card we show)
+    def reveal(self, message):
+        self.say(message)
+
+    # wait before the next message, so that a human can keep up; only the terminal frontend waits
+    def pause(self, seconds):
+        pass
+
+class TerminalIO(GameIO):
+
+    # prompts with PyInquirer and input(), with pauses between messages; PyInquirer is only imported when first needed
+    def __init__(self, reveal_seconds = 5):
+        self.reveal_seconds = reveal_seconds
+
+    def choose(self, choices, message, error_message = None):
+        from PyInquirer import prompt
+        choices = list(choices)
+        answer = prompt({
+            'type': 'list',
+            'name': 'selection',
+            'message': message,
+            'choices': [{'name': choice} for choice in choices],
+            'validate': lambda answer: error_message if answer not in choices else True
+        })
+        return answer['selection']
+
+    def choose_many(self, choices, message):
+        from PyInquirer import prompt
+        answer = prompt([{
+            'type': 'checkbox',
+            'name': 'selection',
+            'message': message,
+            'choices': [{'name': choice} for choice in choices],
+        }])
+        return answer['selection']
+
+    def ask_number(self, message, low, high):
+        while True:
+            try:
+                number = int(input(message + '\n'))
+            except ValueError:
+                number = None
+            if number is not None and low <= number <= high:
+                return number
+            print("Uh... I'm gonna need a valid input")
+            time.sleep(1)
+
+    def say(self, message):
+        print(message)
+
+    # the message is overwritten after a few seconds
+    def reveal(self, message):
+        print(message, end = '\r')
+        time.sleep(self.reveal_seconds)
+
+    def pause(self, seconds):
+        time.sleep(seconds)
+
+class ScriptedIO(GameIO):
+
+    # answers questions from JSON lines (one JSON value per answer), and writes every question and message to an output stream
+    # as JSON lines; an answer that is not one of the choices raises a ValueError
+    def __init__(self, answers, output = None):
+        self.answers = iter(answers)
+        self.output = output
+
+    def next_answer(self, question):
+        self.write(question)
+        try:
+            line = next(self.answers)
+        except StopIteration:
+            raise EOFError('No answer left for: {}'.format(question['message']))
+        return json.loads(line) if isinstance(line, str) else line
+
+    def write(self, record):
+        if self.output is not None:
+            self.output.write(json.dumps(record) + '\n')
+            self.output.flush()
+
+    def choose(self, choices, message, error_message = None):
+        choices = sorted(choices) if isinstance(choices, (set, frozenset)) else list(choices)
+        answer = self.next_answer({'type': 'choose', 'message': message, 'choices': choices})
+        if answer not in choices:
+            raise ValueError(error_message or '{} is not one of the choices'.format(answer))
+        return answer
+
+    def choose_many(self, choices, message):
+        choices = sorted(choices) if isinstance(choices, (set, frozenset)) else list(choices)
+        answer = self.next_answer({'type': 'choose_many', 'message': message, 'choices': choices})
+        if not isinstance(answer, list) or any(choice not in choices for choice in answer):
+            raise ValueError('{} is not a list of the choices'.format(answer))
+        return answer
+
+    def ask_number(self, message, low, high):
+        answer = self.next_answer({'type': 'number', 'message': message, 'low': low, 'high': high})
+        if not isinstance(answer, int) or not low <= answer <= high:
+            raise ValueError('{} is not a number from {} to {}'.format(answer, low, high))
+        return answer
+
+    def say(self, message):
+        self.write({'type': 'say', 'message': message})
+
+    def reveal(self, message):
+        self.write({'type': 'reveal', 'message': message})
+
+class AsyncIO(GameIO):
+
+    # runs the blocking turn logic of a game in a thread, and hands its questions and messages to coroutines on an event
+    # loop: the loop side awaits next_event() and answers questions with answer(); the loop is the one running when the
+    # frontend is made unless one is given, so it is made in a coroutine or given a loop; asyncio is only imported when this
+    # frontend is used
+    def __init__(self, loop = None):
+        import asyncio
+        import queue
+        self.loop = loop if loop is not None else asyncio.get_running_loop()
+        self.events = asyncio.Queue()
+        self.answers = queue.Queue()
+
+    # run a blocking function of the game (e.g. game.start_game) in a thread, returning a future for its result
+    def run(self, function, *args):
+        return self.loop.run_in_executor(None, function, *args)
+
+    # the next question or message of the game
+    async def next_event(self):
+        return await self.events.get()
+
+    # run a blocking function of the game in a thread, yielding its questions and messages until it returns
+    async def events_of(self, function, *args):
+        import asyncio
+        future = self.run(function, *args)
+        while True:
+            getter = asyncio.ensure_future(self.events.get())
+            await asyncio.wait([getter, future], return_when = asyncio.FIRST_COMPLETED)
+            if getter.done():
+                yield getter.result()
+                continue
+            getter.cancel()
+            while not self.events.empty():
+                yield self.events.get_nowait()
+            future.result()
+            return
+
+    # answer the last question
+    def answer(self, value):
+        self.answers.put(value)
+
+    # called from the game's thread: put an event on the loop's queue, and wait for an answer if it is a question
+    def send(self, event, wait_for_answer):
+        self.loop.call_soon_threadsafe(self.events.put_nowait, event)
+        if wait_for_answer:
+            return self.answers.get()
+
+    def choose(self, choices, message, error_message = None):
+        choices = sorted(choices) if isinstance(choices, (set, frozenset)) else list(choices)
+        while True:
+            answer = self.send({'type': 'choose', 'message': message, 'choices': choices}, True)
+            if answer in choices:
+                return answer
+            self.say(error_message or 'That is not one of the choices')
+
+    def choose_many(self, choices, message):
+        choices = sorted(choices) if isinstance(choices, (set, frozenset)) else list(choices)
+        while True:
+            answer = self.send({'type': 'choose_many', 'message': message, 'choices': choices}, True)
+            if isinstance(answer, list) and all(choice in choices for choice in answer):
+                return answer
+            self.say('Please choose from the list')
+
+    def ask_number(self, message, low, high):
+        while True:
+            answer = self.send({'type': 'number', 'message': message, 'low': low, 'high': high}, True)
+            if isinstance(answer, int) and low <= answer <= high:
+                return answer
+            self.say('Please enter a number from {} to {}'.format(low, high))
+
+    def say(self, message):
+        self.send({'type': 'say', 'message': message}, False)
+
+    def reveal(self, message):
+        self.send({'type': 'reveal', 'message': message}, False)
@@ -0,0 +1,310 @@
+import os
+import struct
+import numpy as np
+
+# event types
+START, MOVE, NO_SHOW, SHOW, CARD_SHOWN, RULE_OUT, SUGGESTION, PASSAGES, CLUE_CARD, ACCUSATION, END_TURN, SNAPSHOT, RNG = range(13)
+EVENT_NAMES = ['start', 'move', 'no_show', 'show', 'card_shown', 'rule_out', 'suggestion', 'passages', 'clue_card', 'accusation',
+               'end_turn', 'snapshot', 'rng']
+
+# every record is a header (event type and payload length) followed by the payload
+HEADER = struct.Struct('<BH')
+# the fixed fields at the start of each event's payload; any values after them are card ids (players are stored as the id of
+# their character card), one byte each
+FIELDS = {
+    START: struct.Struct('<BB'),        # our character, number of players; then the players, their hand sizes and our cards
+    MOVE: struct.Struct('<H'),          # square
+    NO_SHOW: struct.Struct('<B'),       # player; then the cards
+    SHOW: struct.Struct('<B'),          # player; then the cards
+    CARD_SHOWN: struct.Struct('<BB'),   # player, card
+    RULE_OUT: struct.Struct('<BB'),     # player, card
+    SUGGESTION: struct.Struct('<BB'),   # character, room
+    PASSAGES: struct.Struct('<B'),      # room connected to the secret passages
+    CLUE_CARD: struct.Struct('<BB'),    # type of clue card (index in sorted order), player whose turn it is
+    ACCUSATION: struct.Struct('<BB'),   # player, whether it was correct; then the cards
+    END_TURN: struct.Struct('<'),
+}
+# number of fixed fields of an event (formats are a byte order followed by one character per field)
+def n_fixed_fields(fields):
+    return len(fields.format) - 1
+
+# hand size stored for a player whose hand size is not known
+UNKNOWN_HAND_SIZE = 255
+
+# fixed fields of a snapshot: turn, round, position, whether the game is active, number of active players, of our cards, of
+# added edges and of constraints, and the mask of cards that could be in the envelope; then the active players, our cards,
+# the knowledge matrix, the edges, the constraints and the state of the random number generator (see pack_rng)
+SNAPSHOT_FIELDS = struct.Struct('<HHHBBBBHI')
+EDGE = struct.Struct('<HH')
+CONSTRAINT = struct.Struct('<BIH')
+# state of a PCG64 generator (the default): state, increment, whether a 32 bit value is buffered, and the buffered value
+PCG64_STATE = struct.Struct('<16s16sBI')
+
+class GameLog:
+
+    # appends the events of a game to a binary file opened for appending, with a snapshot of the game's state every
+    # snapshot_every turns so that replays only need the events after the last one; the state of the game's random number
+    # generator is logged after any event it was drawn from before, so that a replayed game carries on with the same draws
+    enabled = True
+
+    def __init__(self, output, snapshot_every = 10):
+        self.output = output
+        self.snapshot_every = snapshot_every
+        self.turns_since_snapshot = 0
+        # state of the random number generator when it was last logged
+        self.rng_state = None
+
+    def write(self, event, payload):
+        self.output.write(HEADER.pack(event, len(payload)) + payload)
+
+    # append an event from its values: the fixed fields, then any card ids
+    def record(self, event, values):
+        fields = FIELDS[event]
+        n_fields = n_fixed_fields(fields)
+        self.write(event, fields.pack(*values[:n_fields]) + bytes(values[n_fields:]))
+
+    # log the state of a random number generator if it has been drawn from since it was last logged
+    def record_rng(self, rng):
+        state = rng.bit_generator.state
+        if state != self.rng_state:
+            self.write(RNG, pack_rng(rng))
+            self.rng_state = state
+
+    # finish a turn, taking a snapshot if one is due; the file is flushed at the end of every turn
+    def end_turn(self, game):
+        self.record_rng(game.rng)
+        self.record(END_TURN, [])
+        self.turns_since_snapshot += 1
+        if self.snapshot_every and self.turns_since_snapshot >= self.snapshot_every:
+            self.snapshot(game)
+        self.output.flush()
+
+    def snapshot(self, game):
+        self.write(SNAPSHOT, pack_snapshot(game))
+        self.turns_since_snapshot = 0
+        self.rng_state = game.rng.bit_generator.state
+
+    def close(self):
+        self.output.close()
+
+class NullGameLog:
+
+    # log that records nothing, used when a game is not logged
+    enabled = False
+
+    def record(self, event, values):
+        pass
+
+    def record_rng(self, rng):
+        pass
+
+    def end_turn(self, game):
+        pass
+
+    def snapshot(self, game):
+        pass
+
+# shared instance used when a game is not logged
+NULL_LOG = NullGameLog()
+
+# the events of a log as (event type, payload), and the length of the complete records (a record cut short by a crash is
+# dropped)
+def read_events(data):
+    events = []
+    offset = 0
+    while offset + HEADER.size <= len(data):
+        event, length = HEADER.unpack_from(data, offset)
+        if offset + HEADER.size + length > len(data):
+            break
+        events.append((event, bytes(data[offset + HEADER.size:offset + HEADER.size + length])))
+        offset += HEADER.size + length
+    return events, offset
+
+# the values of an event: its fixed fields, then any card ids
+def decode(event, payload):
+    fields = FIELDS[event]
+    return list(fields.unpack_from(payload)) + list(payload[fields.size:])
+
+# the state of a game that is not fixed by its start, packed into bytes
+def pack_snapshot(game):
+    registry = type(game).registry
+    game.deduction.propagate()
+    constraints = game.deduction.constraints
+    edges = sorted(game.board.edges)
+    envelope = sum(1 << int(card_id) for card_id in np.flatnonzero(game.envelope))
+    payload = [SNAPSHOT_FIELDS.pack(game.current_turn, game.current_round, game.position, game.game_is_active, len(game.players),
+                                    len(game.my_cards), len(edges), len(constraints), envelope),
+               bytes(registry.id(player) for player in game.players),
+               bytes(registry.id(card) for card in game.my_cards),
+               game.knowledge.astype(np.int8).tobytes()]
+    payload += [EDGE.pack(*edge) for edge in edges]
+    payload += [CONSTRAINT.pack(constraint.player_id, constraint.mask, constraint.round) for constraint in constraints]
+    payload.append(pack_rng(game.rng))
+    return b''.join(payload)
+
+# the state of a random number generator packed into bytes: a flag, and the state if the generator is a PCG64 (other
+# generators are not logged)
+def pack_rng(rng):
+    state = rng.bit_generator.state
+    if state['bit_generator'] == 'PCG64':
+        return b'\x01' + PCG64_STATE.pack(state['state']['state'].to_bytes(16, 'little'), state['state']['inc'].to_bytes(16, 'little'),
+                                          state['has_uint32'], state['uinteger'])
+    return b'\x00'
+
+# a random number generator in a packed state, or None if the state was not logged
+def unpack_rng(payload, offset = 0):
+    if not payload[offset]:
+        return None
+    state, inc, has_uint32, uinteger = PCG64_STATE.unpack_from(payload, offset + 1)
+    rng = np.random.Generator(np.random.PCG64())
+    rng.bit_generator.state = {'bit_generator': 'PCG64', 'state': {'state': int.from_bytes(state, 'little'), 'inc': int.from_bytes(inc, 'little')},
+                               'has_uint32': has_uint32, 'uinteger': uinteger}
+    return rng
+
+# restore the state of a game from a snapshot; the game must have been created from the same start
+def restore_snapshot(game, payload):
+    registry = type(game).registry
+    (game.current_turn, game.current_round, position, game_is_active, n_players, n_my_cards, n_edges, n_constraints,
+     envelope) = SNAPSHOT_FIELDS.unpack_from(payload)
+    offset = SNAPSHOT_FIELDS.size
+    active = {registry.cards[card_id] for card_id in payload[offset:offset + n_players]}
+    offset += n_players
+    game.players = [player for player in game.player_registry.players if player in active]
+    game.other_players = [player for player in game.players if player != game.my_char]
+    game.my_cards = [registry.cards[card_id] for card_id in payload[offset:offset + n_my_cards]]
+    offset += n_my_cards
+    n_cells = game.knowledge.size
+    game.knowledge[...] = np.frombuffer(payload, dtype = np.int8, count = n_cells, offset = offset).reshape(game.knowledge.shape)
+    offset += n_cells
+    edges = [EDGE.unpack_from(payload, offset + i * EDGE.size) for i in range(n_edges)]
+    offset += n_edges * EDGE.size
+    game.board = game.board.with_edges(edges)
+    for i in range(n_constraints):
+        player_id, mask, round = CONSTRAINT.unpack_from(payload, offset + i * CONSTRAINT.size)
+        game.deduction.add_constraint(player_id, [card_id for card_id in range(registry.n_cards) if mask >> card_id & 1], round)
+    offset += n_constraints * CONSTRAINT.size
+    game.deduction.propagate()
+    game.envelope[:] = [bool(envelope >> card_id & 1) for card_id in range(registry.n_cards)]
+    game.position = position
+    game.game_is_active = bool(game_is_active)
+    game.solution_key = None
+    rng = unpack_rng(payload, offset)
+    if rng is not None:
+        game.rng = rng
+
+# apply one event to a game, through the same methods that recorded it
+def apply_event(game, event, values):
+    cards = type(game).registry.cards
+    if event == MOVE:
+        game.position = values[0]
+    elif event == NO_SHOW:
+        game.observe_no_show(cards[values[0]], [cards[card_id] for card_id in values[1:]])
+    elif event == SHOW:
+        game.observe_show(cards[values[0]], [cards[card_id] for card_id in values[1:]])
+    elif event == CARD_SHOWN:
+        game.observe_card_shown(cards[values[0]], cards[values[1]])
+    elif event == RULE_OUT:
+        game.rule_out_card(cards[values[0]], cards[values[1]])
+    elif event == SUGGESTION:
+        game.observe_suggestion(cards[values[0]], cards[values[1]])
+    elif event == PASSAGES:
+        game.add_secret_passages(cards[values[0]])
+    elif event == ACCUSATION:
+        if values[1]:
+            game.observe_correct_accusation(cards[values[0]], [cards[card_id] for card_id in values[2:]])
+        else:
+            game.observe_failed_accusation(cards[values[0]], [cards[card_id] for card_id in values[2:]])
+    elif event == END_TURN:
+        game.advance_turn()
+
+# rebuild a game from a log (a path or the bytes of one): from its start and the last snapshot, then the events after it; with
+# use_snapshots off every event is applied, so that archived games can be re-run with changed deduction logic; any other
+# arguments are passed to ClueGame (the random number generator is replaced by the last one logged)
+def replay(source, use_snapshots = True, **game_arguments):
+    from ClueDo import ClueGame
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        data = source
+    else:
+        with open(source, 'rb') as log_file:
+            data = log_file.read()
+    events, length = read_events(data)
+    if not events or events[0][0] != START:
+        raise ValueError('The log does not start with the start of a game')
+    cards = ClueGame.registry.cards
+    my_char, n_players, *values = decode(START, events[0][1])
+    players = [cards[card_id] for card_id in values[:n_players]]
+    hand_sizes = {player: hand_size for player, hand_size in zip(players, values[n_players:2 * n_players]) if hand_size != UNKNOWN_HAND_SIZE}
+    my_cards = [cards[card_id] for card_id in values[2 * n_players:]]
+    game = ClueGame(players, cards[my_char], my_cards, hand_sizes, **game_arguments)
+    first = 1
+    if use_snapshots:
+        snapshots = [i for i, (event, payload) in enumerate(events) if event == SNAPSHOT]
+        if snapshots:
+            restore_snapshot(game, events[snapshots[-1]][1])
+            first = snapshots[-1] + 1
+    for event, payload in events[first:]:
+        if event == RNG:
+            rng = unpack_rng(payload)
+            if rng is not None:
+                game.rng = rng
+        elif event != SNAPSHOT:
+            apply_event(game, event, decode(event, payload))
+    # the mask of cards that could be in the envelope only ever narrows, so updating it once at the end is enough
+    game.update_possible_guesses()
+    return game
+
+# rebuild a game from its log file and carry on logging to the end of it (after dropping any record cut short by a crash)
+def resume(path, snapshot_every = 10, **game_arguments):
+    with open(path, 'rb') as log_file:
+        data = log_file.read()
+    events, length = read_events(data)
+    game = replay(data[:length], **game_arguments)
+    if length < len(data):
+        os.truncate(path, length)
+    game.log = GameLog(open(path, 'ab'), snapshot_every)
+    return game
+
+# the events of a log, with cards and players by name
+def describe(data):
+    from ClueDo import ClueGame
+    cards = ClueGame.registry.cards
+    clue_card_types = sorted(ClueGame.possible_clue_cards)
+    records = []
+    for event, payload in read_events(data)[0]:
+        record = {'event': EVENT_NAMES[event]}
+        if event == SNAPSHOT:
+            record['turn'], record['round'], record['position'] = SNAPSHOT_FIELDS.unpack_from(payload)[:3]
+        elif event == MOVE:
+            record['square'] = decode(event, payload)[0]
+        elif event == CLUE_CARD:
+            clue_card_type, player = decode(event, payload)
+            record['type'], record['player'] = clue_card_types[clue_card_type], cards[player]
+        elif event == START:
+            my_char, n_players, *values = decode(event, payload)
+            record['my_char'] = cards[my_char]
+            record['players'] = [cards[card_id] for card_id in values[:n_players]]
+            record['my_cards'] = [cards[card_id] for card_id in values[2 * n_players:]]
+        elif event == ACCUSATION:
+            player, correct, *values = decode(event, payload)
+            record['player'], record['correct'], record['cards'] = cards[player], bool(correct), [cards[card_id] for card_id in values]
+        elif event in (NO_SHOW, SHOW, CARD_SHOWN, RULE_OUT):
+            player, *values = decode(event, payload)
+            record['player'], record['cards'] = cards[player], [cards[card_id] for card_id in values]
+        elif event not in (END_TURN, RNG):
+            record['cards'] = [cards[card_id] for card_id in decode(event, payload)]
+        records.append(record)
+    return records
+
+if __name__ == '__main__':
+
+    import argparse
+    import json
+    import sys
+
+    parser = argparse.ArgumentParser(description = 'Print the events of a game log as JSON lines.')
+    parser.add_argument('log', help = 'game log file')
+    args = parser.parse_args()
+
+    with open(args.log, 'rb') as log_file:
+        for record in describe(log_file.read()):
+            sys.stdout.write(json.dumps(record) + '\n')
@@ -0,0 +1,203 @@
+import argparse
+import asyncio
+import json
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from ClueDo import ClueGame
+from GameIO import ScriptedIO
+
+# decisions that can take a while (they solve or sample); in the worker pool they run on the session's game rebuilt from its
+# setup and a snapshot of its state (see ClueGame.snapshot), and a snapshot of the state they leave is sent back with the result
+
+# our move for a dice roll, and the suggestion to make if the move ends in a room
+def plan_turn(game, dice_roll):
+    game.position, heading = game.move_on_board(dice_roll)
+    room = game.current_room()
+    suggestion = list(game.choose_suggestion(room)) if room is not None else None
+    return {'position': game.position, 'room': room, 'heading': heading, 'suggestion': suggestion}, game
+
+# the accusation to make, if we know the envelope
+def decide_accusation(game):
+    game.update_possible_guesses()
+    accusation = game.get_accusation()
+    return {'accusation': list(accusation) if accusation is not None else None}, game
+
+# the probability that each card is in the envelope
+def decide_probabilities(game):
+    return {'probabilities': game.envelope_probabilities()}, game
+
+DECISIONS = {'our_turn': plan_turn, 'accusation': decide_accusation, 'probabilities': decide_probabilities}
+
+# run a decision in a worker on a game rebuilt from its setup (the players, our character, our cards and the hand sizes it was
+# started with) and a snapshot of its state, returning the result and a snapshot of the state the decision leaves
+def decide_from_snapshot(name, setup, state, *args):
+    players, my_char, my_cards, hand_sizes = setup
+    game = ClueGame(list(players), my_char, list(my_cards), hand_sizes, state.rng(), io = ScriptedIO([])).fork(state)
+    result, game = DECISIONS[name](game, *args)
+    return result, game.snapshot()
+
+class Session:
+
+    # one table: the bot's game and the setup it was started with, the suggestion it is waiting to hear the answer to, and a
+    # lock so that the requests of a table are handled one at a time (in the order they arrive)
+    def __init__(self, game, setup):
+        self.game = game
+        self.setup = setup
+        self.suggestion = None
+        self.lock = asyncio.Lock()
+
+class GameServer:
+
+    # hosts many tables in one process; decisions run in a pool of worker processes (or in the event loop if n_workers is 0)
+    def __init__(self, n_workers = None):
+        self.sessions = {}
+        n_workers = os.cpu_count() if n_workers is None else n_workers
+        self.pool = ProcessPoolExecutor(n_workers) if n_workers > 0 else None
+
+    # run a decision on a session's game, in the pool if there is one (only the session's setup and a snapshot of its game
+    # are sent to the worker, and the game is moved on to the snapshot sent back)
+    async def decide(self, session, name, *args):
+        if self.pool is None:
+            result, session.game = DECISIONS[name](session.game, *args)
+            return result
+        result, state = await asyncio.get_running_loop().run_in_executor(self.pool, decide_from_snapshot, name, session.setup,
+                                                                        session.game.snapshot(), *args)
+        session.game = session.game.fork(state)
+        return result
+
+    # handle one request, returning the response
+    async def handle(self, request):
+        if not isinstance(request, dict):
+            raise ValueError('A request must be a JSON object')
+        op = request.get('op')
+        if op == 'new':
+            return self.new_session(request)
+        session = self.sessions.get(request.get('session'))
+        if session is None:
+            raise KeyError('No session {}'.format(request.get('session')))
+        async with session.lock:
+            game = session.game
+            # our turn: "Please Enter Dice Roll." (clue cards are not handled by the server)
+            if op == 'our_turn':
+                result = await self.decide(session, 'our_turn', int(request['dice_roll']))
+                session.suggestion = result['suggestion']
+                return result
+            # "If a player showed a card, please enter which one" (player and card are null if nobody showed)
+            elif op == 'suggestion_result':
+                if session.suggestion is None:
+                    raise ValueError('No suggestion is waiting for an answer')
+                player = request.get('player')
+                answer_order = game.answer_order(game.my_char)
+                for asked in (answer_order[:answer_order.index(player)] if player is not None else answer_order):
+                    game.observe_no_show(asked, session.suggestion)
+                if player is not None:
+                    game.observe_card_shown(player, request['card'])
+                session.suggestion = None
+                return await self.decide(session, 'accusation')
+            # another player's suggestion: "Did X show a card?" for each player asked, in order (we are never listed)
+            elif op == 'other_suggestion':
+                cards = request['cards']
+                game.observe_suggestion(cards[0], cards[2])
+                for answer in request.get('answers', []):
+                    if answer['showed']:
+                        game.observe_show(answer['player'], cards)
+                    else:
+                        game.observe_no_show(answer['player'], cards)
+                game.update_possible_guesses()
+                return {'position': game.position}
+            # the card we show for a suggestion, if we have one
+            elif op == 'show_card':
+                return {'card': game.choose_card_to_show(request['cards'])}
+            # "Was X's accusation correct?"
+            elif op == 'accusation':
+                if request['correct']:
+                    game.observe_correct_accusation(request['player'], request['cards'])
+                else:
+                    game.observe_failed_accusation(request['player'], request['cards'])
+                    game.update_possible_guesses()
+                return {'game_is_active': game.game_is_active}
+            elif op == 'end_turn':
+                game.advance_turn()
+                return {'turn': game.current_turn, 'round': game.current_round}
+            elif op in ('accuse', 'probabilities'):
+                return await self.decide(session, 'accusation' if op == 'accuse' else 'probabilities')
+            elif op == 'close':
+                del self.sessions[request['session']]
+                return {}
+            raise ValueError('Unknown op {}'.format(op))
+
+    # start a table: the players, our character, our cards, and optionally the hand size of each player (by name) and a seed
+    # for the bot's choices
+    def new_session(self, request):
+        session_id = request['session']
+        if session_id in self.sessions:
+            raise ValueError('Session {} already exists'.format(session_id))
+        setup = (tuple(request['players']), request['my_char'], tuple(request['my_cards']), request.get('hand_sizes'))
+        game = ClueGame(list(setup[0]), setup[1], list(setup[2]), setup[3], np.random.default_rng(request.get('seed')), io = ScriptedIO([]))
+        self.sessions[session_id] = Session(game, setup)
+        return {'position': game.position}
+
+    # answer a request line, echoing its id and session so that clients can match responses to requests
+    async def respond(self, line, writer):
+        request = {}
+        try:
+            request = json.loads(line)
+            response = await self.handle(request)
+            response['ok'] = True
+        # (any error, including one raised by the bot or by a broken worker pool, is answered rather than losing the request)
+        except Exception as error:
+            response = {'ok': False, 'error': '{}: {}'.format(type(error).__name__, error)}
+        for key in ('id', 'session'):
+            if isinstance(request, dict) and key in request:
+                response[key] = request[key]
+        writer.write((json.dumps(response) + '\n').encode())
+        await writer.drain()
+
+    # read request lines from a connection; each is handled in its own task, so that a slow decision for one table does not
+    # hold up the others
+    async def serve_connection(self, reader, writer):
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                task = asyncio.create_task(self.respond(line, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.wait(tasks)
+        finally:
+            writer.close()
+
+    # listen on a unix socket if a path is given, otherwise on a local TCP port
+    async def serve(self, path = None, host = '127.0.0.1', port = 8765):
+        if path is not None:
+            server = await asyncio.start_unix_server(self.serve_connection, path)
+        else:
+            server = await asyncio.start_server(self.serve_connection, host, port)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description = 'Serve ClueDo bots for many tables over a JSON lines socket.')
+    parser.add_argument('--unix', default = None, help = 'path of a unix socket to listen on (instead of TCP)')
+    parser.add_argument('--host', default = '127.0.0.1', help = 'TCP host to listen on')
+    parser.add_argument('--port', type = int, default = 8765, help = 'TCP port to listen on')
+    parser.add_argument('--workers', type = int, default = None, help = 'worker processes for decisions (0 decides in the event loop)')
+    args = parser.parse_args()
+
+    game_server = GameServer(args.workers)
+    try:
+        asyncio.run(game_server.serve(args.unix, args.host, args.port))
+    finally:
+        game_server.close()
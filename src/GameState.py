@@ -0,0 +1,42 @@
+import numpy as np
+
+# seed of the generators that snapshot states are copied into (seeding from a fixed sequence avoids drawing entropy from the
+# operating system, which is most of the cost of a fork); made on first use, so that numpy.random is not imported until needed
+placeholder_seed = None
+
+class GameState:
+
+    # an immutable copy of everything in a game that changes as it is played, which any number of forks of the game can start
+    # from: arrays are read-only and lists are tuples, and the board overlay and the last solver result (which never change)
+    # are shared rather than copied
+    def __init__(self, game):
+        game.deduction.propagate()
+        self.knowledge = read_only(game.knowledge)
+        self.envelope = read_only(game.envelope)
+        # active constraints as (player id, card bitmask, round)
+        self.constraints = tuple((constraint.player_id, constraint.mask, constraint.round) for constraint in game.deduction.constraints)
+        self.players = tuple(game.players)
+        self.my_cards = tuple(game.my_cards)
+        self.position = game.position
+        self.board = game.board
+        self.current_turn = game.current_turn
+        self.current_round = game.current_round
+        self.game_is_active = game.game_is_active
+        self.solution_key = game.solution_key
+        self.solution = game.solution
+        self.rng_state = game.rng.bit_generator.state
+
+    # a new random number generator in the state the game's generator was in
+    def rng(self):
+        global placeholder_seed
+        if placeholder_seed is None:
+            placeholder_seed = np.random.SeedSequence(0)
+        bit_generator = getattr(np.random, self.rng_state['bit_generator'])(placeholder_seed)
+        bit_generator.state = self.rng_state
+        return np.random.Generator(bit_generator)
+
+# read-only copy of an array
+def read_only(array):
+    array = np.array(array)
+    array.flags.writeable = False
+    return array
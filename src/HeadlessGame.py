@@ -0,0 +1,116 @@
+import numpy as np
+from ClueDo import ClueGame
+from Instrumentation import Instrumentation
+
+class Dealer:
+
+    # initialize with a random number generator used for shuffling
+    def __init__(self, rng = None):
+        self.rng = rng if rng is not None else np.random.default_rng()
+
+    # draw one card of each category for the envelope, and deal the rest in turn to the players (in order of play)
+    def deal(self, players):
+        envelope = tuple(str(self.rng.choice(sorted(category))) for category in (ClueGame.characters, ClueGame.weapons, ClueGame.locations))
+        cards = [card for card in sorted(ClueGame.all_cards) if card not in envelope]
+        cards = [cards[i] for i in self.rng.permutation(len(cards))]
+        hands = {player: cards[i::len(players)] for i, player in enumerate(players)}
+        return envelope, hands
+
+class GameResult:
+
+    # outcome of a headless game: the winner (None if nobody accused correctly), the number of turns taken, and every
+    # accusation made as (player, accusation, correct, turn)
+    def __init__(self, winner, n_turns, accusations, envelope):
+        self.winner = winner
+        self.n_turns = n_turns
+        self.accusations = accusations
+        self.envelope = envelope
+
+class HeadlessGame:
+
+    # initialize with the characters playing (each controlled by a bot), a seed (or SeedSequence) from which the deal, the dice and every bot's
+    # choices are drawn, the strategy settings of each player's bot (ClueGame attributes to override), a limit on the
+    # number of turns, and whether to record each bot's instrumentation in turn_records
+    def __init__(self, players, seed = None, strategies = None, max_turns = 500, instrument = False):
+        assert all([player in ClueGame.characters for player in players])
+        self.players = [player for player in ClueGame.player_order if player in players]
+        seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        seeds = seed_sequence.spawn(len(self.players) + 1)
+        self.rng = np.random.default_rng(seeds[0])
+        self.max_turns = max_turns
+        self.envelope, self.hands = Dealer(self.rng).deal(self.players)
+        # hand sizes are public, so every bot is told all of them
+        hand_sizes = {player: len(hand) for player, hand in self.hands.items()}
+        self.bots = {}
+        self.turn_records = []
+        for player, bot_seed in zip(self.players, seeds[1:]):
+            instrumentation = Instrumentation(callback = self.turn_records.append) if instrument else None
+            self.bots[player] = ClueGame(list(self.players), player, list(self.hands[player]), hand_sizes, np.random.default_rng(bot_seed),
+                                         instrumentation)
+            for name, value in (strategies or {}).get(player, {}).items():
+                setattr(self.bots[player], name, value)
+        # players that have not made a wrong accusation
+        self.active_players = list(self.players)
+        self.accusations = []
+        self.winner = None
+        self.n_turns = 0
+
+    # sum of two six-sided dice
+    def roll_dice(self):
+        return int(self.rng.integers(1, 7, size = 2).sum())
+
+    # ask the players after the suggester in turn to show a card, telling every bot what it would see
+    def resolve_suggestion(self, suggester, suggestion):
+        for bot in self.bots.values():
+            bot.observe_suggestion(suggestion[0], suggestion[2])
+        position = self.players.index(suggester)
+        # players who have been eliminated still show their cards
+        for pos in range(position + 1, position + len(self.players)):
+            responder = self.players[pos % len(self.players)]
+            card = self.bots[responder].choose_card_to_show(suggestion)
+            for player, bot in self.bots.items():
+                if player == responder:
+                    continue
+                if card is None:
+                    bot.observe_no_show(responder, suggestion)
+                elif player == suggester:
+                    bot.observe_card_shown(responder, card)
+                else:
+                    bot.observe_show(responder, suggestion)
+            if card is not None:
+                return responder, card
+        return None, None
+
+    # take one turn for a player: move, suggest in the room reached, and accuse if the bot knows the envelope
+    def take_turn(self, player):
+        bot = self.bots[player]
+        bot.position, heading = bot.move_on_board(self.roll_dice())
+        room = bot.current_room()
+        if room is not None:
+            self.resolve_suggestion(player, bot.choose_suggestion(room))
+        bot.update_possible_guesses()
+        accusation = bot.get_accusation()
+        if accusation is not None:
+            correct = accusation == self.envelope
+            self.accusations.append((player, accusation, correct, self.n_turns + 1))
+            if correct:
+                self.winner = player
+            else:
+                self.active_players.remove(player)
+                for other, other_bot in self.bots.items():
+                    if other != player:
+                        other_bot.observe_failed_accusation(player, accusation)
+        for other_bot in self.bots.values():
+            other_bot.advance_turn()
+
+    # play turns in order until a player accuses correctly, every player is out, or the turn limit is reached
+    def play(self):
+        player_index = 0
+        while self.winner is None and self.active_players and self.n_turns < self.max_turns:
+            player = self.players[player_index % len(self.players)]
+            player_index += 1
+            if player not in self.active_players:
+                continue
+            self.take_turn(player)
+            self.n_turns += 1
+        return GameResult(self.winner, self.n_turns, self.accusations, self.envelope)
@@ -0,0 +1,94 @@
+import contextlib
+import json
+import time
+
+class Instrumentation:
+
+    # records the wall time of each decision phase and the change in each counter over a turn, and passes a record per turn to
+    # a JSON lines file and/or a callback; phase times are exclusive (a phase is paused while a phase nested inside it runs),
+    # so the phases of a turn add up to the time spent in any of them
+    enabled = True
+
+    def __init__(self, output = None, callback = None, clock = time.perf_counter):
+        self.output = output
+        self.callback = callback
+        self.clock = clock
+        self.phases = {}
+        self.baseline = {}
+        self.turn_start = clock()
+        # innermost phase being timed
+        self.active = None
+
+    # context manager adding the time spent inside it (but not inside phases nested in it) to a phase of the current turn
+    def phase(self, name):
+        return PhaseTimer(self, name)
+
+    # start counting from the current totals of the counters (e.g. at the start of a game)
+    def reset(self, counters):
+        self.phases = {}
+        self.baseline = dict(counters)
+        self.turn_start = self.clock()
+
+    # finish a turn: emit a record of its phase times and of how much each counter grew, with any extra fields
+    def end_turn(self, counters, **fields):
+        now = self.clock()
+        record = dict(fields)
+        record['wall_s'] = now - self.turn_start
+        record['phases'] = self.phases
+        record['counters'] = {name: total - self.baseline.get(name, 0) for name, total in counters.items()}
+        if self.output is not None:
+            self.output.write(json.dumps(record) + '\n')
+        if self.callback is not None:
+            self.callback(record)
+        self.phases = {}
+        self.baseline = dict(counters)
+        self.turn_start = now
+        return record
+
+class PhaseTimer:
+
+    def __init__(self, instrumentation, name):
+        self.instrumentation = instrumentation
+        self.name = name
+
+    def __enter__(self):
+        now = self.instrumentation.clock()
+        # pause the enclosing phase
+        self.parent = self.instrumentation.active
+        if self.parent is not None:
+            self.parent.add(now)
+        self.instrumentation.active = self
+        self.start = now
+        return self
+
+    def __exit__(self, *exc_info):
+        now = self.instrumentation.clock()
+        self.add(now)
+        # resume the enclosing phase
+        self.instrumentation.active = self.parent
+        if self.parent is not None:
+            self.parent.start = now
+        return False
+
+    # add the time since the phase was started or resumed to it
+    def add(self, now):
+        phases = self.instrumentation.phases
+        phases[self.name] = phases.get(self.name, 0.0) + now - self.start
+
+class NullInstrumentation:
+
+    # instrumentation that records nothing: phases share one reusable do-nothing context manager
+    enabled = False
+    null_phase = contextlib.nullcontext()
+
+    def phase(self, name):
+        return NullInstrumentation.null_phase
+
+    def reset(self, counters):
+        pass
+
+    def end_turn(self, counters, **fields):
+        return None
+
+# shared instance used when instrumentation is off
+NULL_INSTRUMENTATION = NullInstrumentation()
@@ -0,0 +1,94 @@
+import numpy as np
+from collections.abc import Mapping, MutableMapping
+
+# values stored in a knowledge matrix
+HAS_CARD = 1
+UNKNOWN = 0
+NOT_HAS_CARD = -1
+
+class CardRegistry:
+
+    # initialize with the cards of each category; cards are numbered by category, then alphabetically
+    def __init__(self, characters, weapons, locations):
+        self.categories = {'characters': sorted(characters), 'weapons': sorted(weapons), 'locations': sorted(locations)}
+        self.cards = [card for category in self.categories.values() for card in category]
+        self.card_ids = {card: card_id for card_id, card in enumerate(self.cards)}
+        self.n_cards = len(self.cards)
+        # slice of card ids covered by each category
+        self.category_slices = {}
+        start = 0
+        for category, cards in self.categories.items():
+            self.category_slices[category] = slice(start, start + len(cards))
+            start += len(cards)
+        # index of the category of each card
+        self.card_categories = np.concatenate([np.full(len(cards), i) for i, cards in enumerate(self.categories.values())])
+
+    # integer id of a card
+    def id(self, card):
+        return self.card_ids[card]
+
+    # array of integer ids for a collection of cards
+    def ids(self, cards):
+        return np.array([self.card_ids[card] for card in cards], dtype = np.intp)
+
+    # names of the cards selected by a boolean mask (or list of ids)
+    def names(self, card_ids):
+        card_ids = np.flatnonzero(card_ids) if np.asarray(card_ids).dtype == bool else card_ids
+        return {self.cards[card_id] for card_id in card_ids}
+
+    # boolean mask over all cards for a collection of cards
+    def mask(self, cards):
+        mask = np.zeros(self.n_cards, dtype = bool)
+        mask[self.ids(cards)] = True
+        return mask
+
+class PlayerRegistry:
+
+    # initialize with the players in the game; ids do not change if players are later eliminated
+    def __init__(self, players):
+        self.players = list(players)
+        self.player_ids = {player: player_id for player_id, player in enumerate(self.players)}
+        self.n_players = len(self.players)
+
+    # integer id of a player
+    def id(self, player):
+        return self.player_ids[player]
+
+# string-keyed view of one row of a knowledge matrix
+class KnowledgeRow(MutableMapping):
+
+    def __init__(self, row, card_registry):
+        self.row = row
+        self.card_registry = card_registry
+
+    def __getitem__(self, card):
+        return int(self.row[self.card_registry.id(card)])
+
+    def __setitem__(self, card, value):
+        self.row[self.card_registry.id(card)] = value
+
+    def __delitem__(self, card):
+        raise TypeError('Cards cannot be removed from the game state')
+
+    def __iter__(self):
+        return iter(self.card_registry.cards)
+
+    def __len__(self):
+        return self.card_registry.n_cards
+
+# string-keyed view of a knowledge matrix, behaving like the nested game_state dictionaries
+class KnowledgeView(Mapping):
+
+    def __init__(self, knowledge, player_registry, card_registry):
+        self.knowledge = knowledge
+        self.player_registry = player_registry
+        self.card_registry = card_registry
+
+    def __getitem__(self, player):
+        return KnowledgeRow(self.knowledge[self.player_registry.id(player)], self.card_registry)
+
+    def __iter__(self):
+        return iter(self.player_registry.players)
+
+    def __len__(self):
+        return self.player_registry.n_players
@@ -0,0 +1,213 @@
+import numpy as np
+from collections import OrderedDict
+from Reachability import MAX_ROLL
+from DistanceIndex import UNREACHABLE
+
+# probability of each total of two six-sided dice
+ROLL_PROBABILITIES = {roll: (6 - abs(roll - 7)) / 36 for roll in range(2, MAX_ROLL + 1)}
+
+# number of turns that the probability of entering each room is tabulated for
+MAX_TURNS = 10
+
+# best landing value of a move with each roll (rows 0 to MAX_ROLL) from every square: the minimum (or maximum, with
+# np.maximum) of the values of the squares within the roll, or of the room at the other end of a secret passage (which can be
+# taken whatever the roll)
+def best_landings(reachability, landing, passages, ufunc = np.minimum):
+    best = reachability.within_steps(landing, MAX_ROLL, ufunc)
+    for square_a, square_b in passages:
+        best[:, square_a] = ufunc(best[:, square_a], landing[square_b])
+        best[:, square_b] = ufunc(best[:, square_b], landing[square_a])
+    return best
+
+# squares from which none of the target squares can be reached (secret passages only join rooms, which are on the board anyway)
+def cut_off(index, targets):
+    return (np.asarray(index.distances)[:, targets] >= UNREACHABLE).all(axis = 1)
+
+# expected number of turns from every square until entering each of the rooms at room_squares (one column per room), found by
+# value iteration over all the rooms at once on a distance index, and the probability of having entered each room within 1 to
+# max_turns turns (moving to make it as likely as possible)
+def room_turn_tables(index, room_squares, passages, max_turns = MAX_TURNS, tolerance = 1e-6, max_iterations = 100):
+    reachability = index.reachability
+    in_room = np.zeros((index.n_squares, len(room_squares)), dtype = bool)
+    in_room[room_squares, np.arange(len(room_squares))] = True
+    # squares that can never reach a room never converge, so they are set to infinity rather than iterated
+    unreachable = np.stack([cut_off(index, [square]) for square in room_squares], axis = 1)
+    turns = np.where(unreachable, np.inf, 0.0)
+    for iteration in range(max_iterations):
+        best = best_landings(reachability, turns, passages)
+        new_turns = sum(probability * (1 + best[roll]) for roll, probability in ROLL_PROBABILITIES.items())
+        new_turns[in_room] = 0.0
+        converged = np.allclose(new_turns, turns, atol = tolerance, rtol = 0)
+        turns = new_turns
+        if converged:
+            break
+    entered = in_room.astype(float)
+    entry_probabilities = np.empty((max_turns,) + in_room.shape)
+    for turn in range(max_turns):
+        best = best_landings(reachability, entered, passages, np.maximum)
+        entered = sum(probability * best[roll] for roll, probability in ROLL_PROBABILITIES.items())
+        entered[in_room] = 1.0
+        entry_probabilities[turn] = entered
+    return turns, entry_probabilities
+
+class MovementPlanner:
+
+    # initialize with the board (for its distance index, or those of its overlays) and the square of each room; room_weight
+    # is the extra cost, in turns, of ending in the least likely target room rather than the most likely one, and costs are
+    # rounded to cost_resolution so that similar room weightings share table entries; up to max_decisions move decisions are
+    # cached for each board overlay
+    def __init__(self, board, room_locations, room_weight = 0.5, cost_resolution = 0.1, tolerance = 1e-6, max_iterations = 100,
+                 max_decisions = 65536):
+        self.board = board
+        self.room_locations = room_locations
+        self.room_weight = room_weight
+        self.cost_resolution = cost_resolution
+        self.tolerance = tolerance
+        self.max_iterations = max_iterations
+        self.max_decisions = max_decisions
+        # rooms in the order of cost levels (sorted by name, as in the card registry), and the place value of each room's
+        # level in a decision key (levels run from -1 for rooms that are not targets up to room_weight / cost_resolution)
+        self.rooms = sorted(room_locations)
+        self.room_columns = {room: column for column, room in enumerate(self.rooms)}
+        n_levels = int(round(room_weight / cost_resolution)) + 2
+        self.level_values = n_levels ** np.arange(len(self.rooms), dtype = np.int64)
+        # tables for each distance index (the board's, or that of a board overlay with extra edges)
+        self.index_tables = {}
+        # number of value iterations run (i.e. misses of the values cache), for instrumentation
+        self.n_solves = 0
+
+    # cost of ending the move in each target room: 0 for the most likely room, up to room_weight for the least likely
+    def room_costs(self, rooms, probabilities = None):
+        if probabilities is None:
+            return tuple((room, 0.0) for room in sorted(rooms))
+        top_probability = max(probabilities[room] for room in rooms)
+        if top_probability == 0:
+            return self.room_costs(rooms)
+        return tuple((room, round(self.room_weight * (1 - probabilities[room] / top_probability) / self.cost_resolution) * self.cost_resolution)
+                     for room in sorted(rooms))
+
+    # cost level of each room (in the order of self.rooms) from a mask of the target rooms and optionally the probability that
+    # each room is in the envelope: -1 for rooms that are not targets, otherwise the room's cost in units of cost_resolution
+    # (the same costs as room_costs gives)
+    def room_levels(self, targets, probabilities = None):
+        levels = np.full(len(self.rooms), -1, dtype = np.int64)
+        top_probability = probabilities[targets].max() if probabilities is not None and targets.any() else 0
+        if top_probability == 0:
+            levels[targets] = 0
+        else:
+            levels[targets] = np.round(self.room_weight * (1 - probabilities[targets] / top_probability) / self.cost_resolution)
+        return levels
+
+    # room costs (as given by room_costs) for the cost level of each room
+    def level_costs(self, levels):
+        return tuple((room, int(level) * self.cost_resolution) for room, level in zip(self.rooms, levels) if level >= 0)
+
+    # tables for a board overlay (the board itself by default), cleared if an edge has been added to its distance index since
+    # they were filled: an LRU cache of move decisions, the expected turns from every square for each set of room costs, the
+    # squares that can be moved to from every square with each roll (through the board's secret passages too) and the tables
+    # of turns to each room
+    def tables(self, overlay = None):
+        index = self.board.index if overlay is None else overlay.index
+        tables = self.index_tables.get(index)
+        if tables is None or tables['version'] != index.version:
+            passages = np.zeros((index.n_squares, index.n_squares), dtype = bool)
+            for square_a, square_b in self.board.passage_squares:
+                passages[square_a, square_b] = passages[square_b, square_a] = True
+            tables = {'version': index.version, 'decisions': OrderedDict(), 'values': {}, 'room_turns': None,
+                      'reachable': {roll: index.reachability.matrix(roll) | passages for roll in ROLL_PROBABILITIES}}
+            self.index_tables[index] = tables
+        return tables
+
+    # expected turns from every square to each room (in the order of self.rooms) and the probabilities of entering each room
+    # within 1 to MAX_TURNS turns: the board's compiled tables, or computed for an overlay once edges have been added to it
+    def room_tables(self, overlay = None):
+        index = self.board.index if overlay is None else overlay.index
+        tables = self.tables(overlay)
+        if tables['room_turns'] is None:
+            if index is self.board.index and index.version == 0:
+                tables['room_turns'] = (self.board.tables['room_turns'], self.board.tables['entry_probabilities'])
+            else:
+                room_squares = [self.room_locations[room] for room in self.rooms]
+                tables['room_turns'] = room_turn_tables(index, room_squares, self.board.passage_squares,
+                                                        tolerance = self.tolerance, max_iterations = self.max_iterations)
+        return tables['room_turns']
+
+    # expected number of turns from a square until entering each room
+    def room_turns(self, square, overlay = None):
+        turns = self.room_tables(overlay)[0][square]
+        return {room: float(turns[column]) for room, column in self.room_columns.items()}
+
+    # probability of entering each room from a square within a number of turns (up to MAX_TURNS)
+    def entry_probabilities(self, square, n_turns, overlay = None):
+        probabilities = self.room_tables(overlay)[1][n_turns - 1, square]
+        return {room: float(probabilities[column]) for room, column in self.room_columns.items()}
+
+    # expected number of turns from every square until ending a move in a target room (plus the room's cost), found by
+    # value iteration over the expectimax recursion: a chance node for the roll, then a choice of destination (a single target
+    # room is looked up in the room tables instead)
+    def expected_turns(self, room_costs, overlay = None):
+        tables = self.tables(overlay)
+        values = tables['values']
+        if room_costs in values:
+            return values[room_costs]
+        n_squares = self.board.index.n_squares
+        terminal = np.full(n_squares, np.inf)
+        for room, cost in room_costs:
+            terminal[self.room_locations[room]] = cost
+        is_target = ~np.isinf(terminal)
+        if len(room_costs) == 1:
+            turns = self.room_tables(overlay)[0][:, self.room_columns[room_costs[0][0]]]
+            values[room_costs] = (turns, np.where(is_target, terminal, turns))
+            return values[room_costs]
+        self.n_solves += 1
+        index = self.board.index if overlay is None else overlay.index
+        passages = self.board.passage_squares
+        turns = np.where(cut_off(index, np.flatnonzero(is_target)), np.inf, 0.0)
+        for iteration in range(self.max_iterations):
+            # value of ending a move on each square: the room cost if it is a target room, else the turns still needed
+            landing = np.where(is_target, terminal, turns)
+            best = best_landings(index.reachability, landing, passages)
+            new_turns = sum(probability * (1 + best[roll]) for roll, probability in ROLL_PROBABILITIES.items())
+            new_turns[is_target] = 0.0
+            converged = np.allclose(new_turns, turns, atol = self.tolerance, rtol = 0)
+            turns = new_turns
+            if converged:
+                break
+        values[room_costs] = (turns, np.where(is_target, terminal, turns))
+        return values[room_costs]
+
+    # the move decision for a roll from a square, given the cost level of each room (see room_levels): the destinations that
+    # minimise the expected turns to a target room, and the target room each of them heads for; decisions are cached by an
+    # integer key packing the square, the roll and the levels
+    def decide(self, square, dice_roll, levels, overlay = None):
+        tables = self.tables(overlay)
+        decisions = tables['decisions']
+        key = (int(np.dot(levels + 1, self.level_values)) * 13 + dice_roll) * self.board.index.n_squares + square
+        decision = decisions.get(key)
+        if decision is not None:
+            decisions.move_to_end(key)
+            return decision
+        room_costs = self.level_costs(levels)
+        turns, landing = self.expected_turns(room_costs, overlay)
+        reachable = tables['reachable'][dice_roll][square]
+        values = np.where(reachable, landing, np.inf)
+        # (squares cut off from every target room are infinitely far, so only reachable squares can be chosen)
+        moves = np.flatnonzero(reachable & np.isclose(values, values.min(), atol = self.tolerance, rtol = 0))
+        decision = (moves, [self.heading(move, room_costs, overlay) for move in moves])
+        decisions[key] = decision
+        if len(decisions) > self.max_decisions:
+            decisions.popitem(last = False)
+        return decision
+
+    # the destinations that minimise the expected turns to a target room for a roll
+    def best_moves(self, square, dice_roll, room_costs, overlay = None):
+        levels = np.full(len(self.rooms), -1, dtype = np.int64)
+        for room, cost in room_costs:
+            levels[self.rooms.index(room)] = round(cost / self.cost_resolution)
+        return self.decide(square, dice_roll, levels, overlay)[0]
+
+    # the target room that a square is heading for, by expected turns to the room plus its cost (the room itself if the square
+    # is a room)
+    def heading(self, square, room_costs, overlay = None):
+        turns = self.room_tables(overlay)[0][square]
+        return min((turns[self.room_columns[room]] + cost, room) for room, cost in room_costs)[1]
@@ -1,52 +1,87 @@
-import ClueDo
-from PyInquirer import prompt
+import argparse
+import sys
+import Cards
+from GameIO import TerminalIO, ScriptedIO
 
 if __name__ == '__main__':
 
+    parser = argparse.ArgumentParser(description = 'Play ClueDo against people: the setup is taken from the arguments (or asked for if they are '
+                                                   'not given), and the game is played in the terminal or from a script of answers.')
+    parser.add_argument('--players', nargs = '+', choices = sorted(Cards.characters), help = 'characters playing')
+    parser.add_argument('--seat', choices = sorted(Cards.characters), help = 'character played by the computer')
+    parser.add_argument('--cards', nargs = '+', choices = sorted(Cards.all_cards), help = 'cards dealt to the computer')
+    parser.add_argument('--hand-sizes', nargs = '+', type = int, default = None, help = 'number of cards dealt to each player, in the order of --players')
+    parser.add_argument('--seed', type = int, default = None, help = 'seed of the computer\'s random choices')
+    parser.add_argument('--script', default = None,
+                        help = 'file of answers as JSON lines (- for standard input); questions and messages are written to standard output as JSON lines')
+    parser.add_argument('--log', default = None, help = 'file to append the events of the game to')
+    parser.add_argument('--policy-table', default = None, help = 'file of precomputed decisions for common states (built by PolicyTable.py)')
+    args = parser.parse_args()
+
+    if args.players is not None and len(args.players) < 3:
+        parser.error('at least 3 players are needed')
+    if args.seat is not None and args.players is not None and args.seat not in args.players:
+        parser.error('the computer\'s character must be one of the players')
+    if args.hand_sizes is not None and (args.players is None or len(args.hand_sizes) != len(args.players)):
+        parser.error('give one hand size for each of the players')
+    if args.cards is not None and len(set(args.cards)) != len(args.cards):
+        parser.error('the computer\'s cards must all be different')
+
+    # number of cards dealt to a character: its hand size if the hand sizes are given, otherwise 3
+    def n_cards_dealt(character):
+        return args.hand_sizes[args.players.index(character)] if args.hand_sizes is not None else 3
+
+    # the number of cards given can be checked now unless it depends on a character still to be chosen
+    if args.cards is not None and (args.seat is not None or args.hand_sizes is None) and len(args.cards) != n_cards_dealt(args.seat):
+        parser.error('the computer must be dealt {} cards'.format(n_cards_dealt(args.seat)))
+
+    if args.script is None:
+        io = TerminalIO()
+    else:
+        io = ScriptedIO(sys.stdin if args.script == '-' else open(args.script), output = sys.stdout)
+
     # input the players participating in the game
-    players = prompt([{
-        'type': 'checkbox',
-        'name': 'players',
-        'message': 'Which characters are playing?',
-        'choices': [{'name': char} for char in ClueDo.ClueGame.characters],
-    }])
-
-    # ensure that 3 or more players are selected
-    while len(players['players']) < 3:
-        players = prompt([{
-            'type': 'checkbox',
-            'name': 'players',
-            'message': 'Please choose between 3 and 6 characters',
-            'choices': [{'name': char} for char in ClueDo.ClueGame.characters],
-        }])
+    players = args.players
+    if players is None:
+        players = io.choose_many(Cards.characters, 'Which characters are playing?')
+
+        # ensure that 3 or more players are selected
+        while len(players) < 3:
+            players = io.choose_many(Cards.characters, 'Please choose between 3 and 6 characters')
 
     # input which character is to be controlled by the computer
-    my_char = prompt([{
-        'type': 'list',
-        'name': 'my_char',
-        'message': 'Which character will I be playing?',
-        'choices': [{'name': char} for char in players['players']]
-    }])
+    my_char = args.seat if args.seat is not None else io.choose(players, 'Which character will I be playing?')
+    if args.cards is not None and len(args.cards) != n_cards_dealt(my_char):
+        parser.error('the computer must be dealt {} cards'.format(n_cards_dealt(my_char)))
 
     # input the cards to be used by the computer
-    my_cards = prompt([{
-        'type': 'checkbox',
-        'name': 'my_cards',
-        'message': 'What are my cards?',
-        'choices': [{'name': char} for char in ClueDo.ClueGame.all_cards]
-    }])
-
-    # ensure that exactly 3 cards are inputted
-    while len(my_cards['my_cards']) != 3:
-        my_cards = prompt([{
-            'type': 'checkbox',
-            'name': 'my_cards',
-            'message': 'Please select exactly 3 cards',
-            'choices': [{'name': char} for char in ClueDo.ClueGame.all_cards]
-        }])
+    my_cards = args.cards
+    if my_cards is None:
+        my_cards = io.choose_many(Cards.all_cards, 'What are my cards?')
+
+        # ensure that exactly the number of cards dealt is inputted
+        while len(my_cards) != n_cards_dealt(my_char):
+            my_cards = io.choose_many(Cards.all_cards, 'Please select exactly {} cards'.format(n_cards_dealt(my_char)))
+
+    # the game (and numpy and the board tables with it) is only loaded once the setup is known, so the first question appears
+    # straight away
+    import numpy as np
+    from ClueDo import ClueGame
+    from GameLog import GameLog
+    from PolicyTable import open_table
+
+    hand_sizes = dict(zip(players, args.hand_sizes)) if args.hand_sizes is not None else None
+    rng = np.random.default_rng(args.seed) if args.seed is not None else None
+    log = GameLog(open(args.log, 'ab')) if args.log is not None else None
 
     # initialise instance of the class
-    game_instance = ClueDo.ClueGame(players['players'], my_char['my_char'], my_cards['my_cards'])
+    game_instance = ClueGame(list(players), my_char, list(my_cards), hand_sizes, rng, io = io, log = log)
+    if args.policy_table is not None:
+        game_instance.policy_table = open_table(args.policy_table, ClueGame.registry.n_cards)
 
     # begin the game
-    game_instance.start_game()
\ No newline at end of file
+    try:
+        game_instance.start_game()
+    except EOFError as error:
+        # a script of answers ran out before the end of the game
+        sys.exit(str(error))
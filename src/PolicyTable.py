@@ -0,0 +1,159 @@
+import os
+import argparse
+import numpy as np
+from Knowledge import HAS_CARD
+from SolutionCache import CanonicalState
+
+# file format: a header, then the entries sorted by digest, column by column: the two words of each digest, the number of
+# times the state was seen while building the table, and the decisions; a decision is the set of equally good choices, as a
+# bitmask over the cards or players in canonical order, so that ties can be broken in the order of the original state
+MAGIC = b'CLUEPLCY'
+VERSION = 1
+HEADER = np.dtype([('magic', 'S8'), ('version', '<u4'), ('n_entries', '<u4'), ('n_cards', '<u4')])
+COLUMNS = (('high', '<u8'), ('low', '<u8'), ('count', '<u4'), ('best_cards', '<u4'), ('best_players', 'u1'))
+
+class PolicyDecisions:
+
+    # the decisions for a state, in the order of the state's cards and players: for each category the cards that are equally
+    # most likely to be in the envelope (the best suggestion, and the best card to choose for a choice card reveal), and the
+    # players we know the fewest cards of (the best players to choose for a choice player reveal)
+    def __init__(self, best_cards, best_players):
+        self.best_cards = best_cards
+        self.best_players = best_players
+
+# the decisions for a state from a game's online rules: the possible cards with the highest preference in each category (every
+# card of a category if none of them is possible, as get_top_suggestions does), and the players holding the fewest known cards
+def decide(game):
+    preferences = np.where(game.possible_card_mask(), game.card_preferences(), -np.inf)
+    best_cards = np.zeros(len(preferences), dtype = bool)
+    for category_slice in game.registry.category_slices.values():
+        best_cards[category_slice] = preferences[category_slice] == preferences[category_slice].max()
+    player_scores = (game.knowledge == HAS_CARD).sum(axis = 1)
+    return PolicyDecisions(best_cards, player_scores == player_scores.min())
+
+# bitmask of the set entries of a boolean array, taken in the given order
+def to_bits(mask, order):
+    return sum(1 << position for position, value in enumerate(np.asarray(mask)[order]) if value)
+
+# boolean array from a bitmask of entries in the given order
+def from_bits(bits, order):
+    mask = np.zeros(len(order), dtype = bool)
+    mask[order] = [bits >> position & 1 for position in range(len(order))]
+    return mask
+
+class PolicyTable:
+
+    # a read-only table of the decisions for common states, memory mapped from a file written by write_table; lookups are a
+    # binary search over the digests of canonical states (see SolutionCache.CanonicalState), so a state equivalent to one in
+    # the table up to relabelling of players and cards is answered without solving it
+    def __init__(self, path, n_cards):
+        self.path = path
+        self.header = np.memmap(path, dtype = HEADER, mode = 'r', shape = (1,))
+        if self.header['magic'][0] != MAGIC or self.header['version'][0] != VERSION or self.header['n_cards'][0] != n_cards:
+            raise ValueError('{} is not a policy table for {} cards'.format(path, n_cards))
+        self.n_entries = int(self.header['n_entries'][0])
+        offset = HEADER.itemsize
+        for name, dtype in COLUMNS:
+            # (an empty file region cannot be mapped)
+            column = np.memmap(path, dtype = dtype, mode = 'r', offset = offset, shape = (self.n_entries,)) if self.n_entries else np.zeros(0, dtype = dtype)
+            setattr(self, name, column)
+            offset += self.n_entries * np.dtype(dtype).itemsize
+        # lookups answered from the table and missed, for instrumentation
+        self.n_hits = 0
+        self.n_misses = 0
+
+    # the decisions for a solver problem (see ClueGame.solver_inputs), or None if the table does not hold its state
+    def lookup(self, knowledge, envelope_mask, hand_sizes, constraints, card_categories):
+        state = CanonicalState(knowledge, envelope_mask, hand_sizes, constraints, card_categories)
+        high, low = (int(word) for word in np.frombuffer(state.digest, dtype = '<u8'))
+        start = int(np.searchsorted(self.high, high, side = 'left'))
+        end = int(np.searchsorted(self.high, high, side = 'right'))
+        for entry in range(start, end):
+            if int(self.low[entry]) == low:
+                self.n_hits += 1
+                return PolicyDecisions(from_bits(int(self.best_cards[entry]), state.card_order),
+                                       from_bits(int(self.best_players[entry]), state.player_order))
+        self.n_misses += 1
+        return None
+
+    def close(self):
+        del self.header, self.high, self.low, self.count, self.best_cards, self.best_players
+
+class StateCounter:
+
+    # counts of the canonical states seen in games, with the decisions for each one (made when it is first seen)
+    def __init__(self):
+        self.counts = {}
+        self.decisions = {}
+
+    # count a bot's current state
+    def add(self, bot):
+        hand_sizes, constraints = bot.solver_inputs()
+        state = CanonicalState(bot.knowledge, bot.envelope, hand_sizes, constraints, bot.registry.card_categories)
+        if state.digest not in self.counts:
+            decisions = decide(bot)
+            self.counts[state.digest] = 0
+            self.decisions[state.digest] = (to_bits(decisions.best_cards, state.card_order), to_bits(decisions.best_players, state.player_order))
+        self.counts[state.digest] += 1
+
+# write the n_entries most common states seen at least min_count times to a table file
+def write_table(path, counter, n_cards, n_entries = None, min_count = 1):
+    digests = sorted((digest for digest, count in counter.counts.items() if count >= min_count), key = lambda digest: -counter.counts[digest])
+    digests = sorted(digests[:n_entries], key = lambda digest: tuple(np.frombuffer(digest, dtype = '<u8')))
+    header = np.zeros(1, dtype = HEADER)
+    header[0] = (MAGIC, VERSION, len(digests), n_cards)
+    words = np.array([np.frombuffer(digest, dtype = '<u8') for digest in digests], dtype = '<u8').reshape(-1, 2)
+    columns = {'high': words[:, 0], 'low': words[:, 1], 'count': [counter.counts[digest] for digest in digests],
+               'best_cards': [counter.decisions[digest][0] for digest in digests], 'best_players': [counter.decisions[digest][1] for digest in digests]}
+    with open(path, 'wb') as file:
+        file.write(header.tobytes())
+        for name, dtype in COLUMNS:
+            file.write(np.array(columns[name], dtype = dtype).tobytes())
+    return len(digests)
+
+# tables that have already been opened in this process, by path
+opened_tables = {}
+
+# open a policy table by path (once per process)
+def open_table(path, n_cards):
+    path = os.path.abspath(path)
+    if path not in opened_tables:
+        opened_tables[path] = PolicyTable(path, n_cards)
+    return opened_tables[path]
+
+if __name__ == '__main__':
+
+    # the game is only needed to build a table
+    from ClueDo import ClueGame
+    from HeadlessGame import HeadlessGame
+    from Tournament import STRATEGIES
+
+    class CountingGame(HeadlessGame):
+
+        # a headless game counting the state of each bot at the start of its turns, which is the state its decisions are made in
+        def __init__(self, counter, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.counter = counter
+
+        def take_turn(self, player):
+            self.counter.add(self.bots[player])
+            super().take_turn(player)
+
+    parser = argparse.ArgumentParser(description = 'Build a table of the decisions for the states seen most often in self-play.')
+    parser.add_argument('output', help = 'file to write the table to')
+    parser.add_argument('--games', type = int, default = 100, help = 'number of games to play')
+    parser.add_argument('--strategies', nargs = '+', default = ['information', 'greedy', 'nearest_room'], choices = sorted(STRATEGIES),
+                        help = 'strategy of each seat, in order of play (one seat per strategy)')
+    parser.add_argument('--seed', type = int, default = None, help = 'seed of the games')
+    parser.add_argument('--max-turns', type = int, default = 500, help = 'turn limit of each game')
+    parser.add_argument('--entries', type = int, default = 65536, help = 'most states to keep')
+    parser.add_argument('--min-count', type = int, default = 2, help = 'fewest times a state must be seen to be kept')
+    args = parser.parse_args()
+
+    players = ClueGame.player_order[:len(args.strategies)]
+    strategies = {player: STRATEGIES[strategy] for player, strategy in zip(players, args.strategies)}
+    counter = StateCounter()
+    for seed in np.random.SeedSequence(args.seed).spawn(args.games):
+        CountingGame(counter, players, seed, strategies, args.max_turns).play()
+    n_entries = write_table(args.output, counter, ClueGame.registry.n_cards, args.entries, args.min_count)
+    print('{} states seen, {} written to {}'.format(len(counter.counts), n_entries, args.output))
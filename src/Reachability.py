@@ -0,0 +1,62 @@
+import numpy as np
+
+# largest total of two six-sided dice
+MAX_ROLL = 12
+
+# number of bits set in each byte
+POPCOUNT = np.array([bin(byte).count('1') for byte in range(256)], dtype = np.uint8)
+
+class ReachabilityIndex:
+
+    # initialize with a (symmetric) adjacency matrix of the board; the squares within each number of steps of every square, up
+    # to max_roll, are kept as bitsets packed into bytes (bit t of row s, counting from the high bit of the first byte, is set if
+    # square t can be reached from square s)
+    def __init__(self, adj_mat, max_roll = MAX_ROLL):
+        adjacency = np.asarray(adj_mat) != 0
+        self.n_squares = adjacency.shape[0]
+        self.max_roll = max_roll
+        # each square followed by its neighbours, as flattened lists with the offset at which each square's list starts
+        rows, self.neighbours = np.nonzero(adjacency | np.eye(self.n_squares, dtype = bool))
+        self.offsets = np.searchsorted(rows, np.arange(self.n_squares))
+        self.bits = self.within_steps(np.packbits(np.eye(self.n_squares, dtype = bool), axis = 1), max_roll, np.bitwise_or)
+
+    # expand every square's frontier one step at a time: the squares within k steps of a square are those within k - 1 steps of
+    # the square or of any of its neighbours, so each step reduces the rows of the neighbours with a ufunc (OR of the packed
+    # bitsets for the reachable squares themselves, or e.g. the minimum of a value over them)
+    def within_steps(self, values, max_steps, ufunc):
+        within = np.empty((max_steps + 1,) + values.shape, dtype = values.dtype)
+        within[0] = values
+        for step in range(1, max_steps + 1):
+            within[step] = ufunc.reduceat(within[step - 1][self.neighbours], self.offsets, axis = 0)
+        return within
+
+    # packed rows of the squares reachable with each roll from each square (squares and rolls may be arrays, broadcast together)
+    def rows(self, squares, rolls):
+        return self.bits[np.minimum(rolls, self.max_roll), squares]
+
+    # squares reachable from a square with a roll
+    def reachable(self, square, roll):
+        return np.flatnonzero(self.masks(square, roll))
+
+    # boolean masks over the board of the squares reachable with each roll from each square
+    def masks(self, squares, rolls):
+        return np.unpackbits(self.rows(squares, rolls), axis = -1, count = self.n_squares).astype(bool)
+
+    # squares reachable from any of the squares with a roll
+    def union(self, squares, roll):
+        rows = self.rows(np.asarray(squares), roll)
+        return np.unpackbits(np.bitwise_or.reduce(rows, axis = 0), count = self.n_squares).astype(bool)
+
+    # number of squares reachable with each roll from each square
+    def counts(self, squares, rolls):
+        return POPCOUNT[self.rows(squares, rolls)].sum(axis = -1, dtype = np.int64)
+
+    # whether each target can be reached from the matching source with the matching roll
+    def contains(self, sources, targets, rolls):
+        targets = np.asarray(targets)
+        row_bytes = self.bits[np.minimum(rolls, self.max_roll), sources, targets >> 3]
+        return (row_bytes >> (7 - (targets & 7)).astype(np.uint8)) & 1 == 1
+
+    # the squares reachable from every square with a roll, as a (square, square) boolean matrix
+    def matrix(self, roll):
+        return self.masks(np.arange(self.n_squares), roll)
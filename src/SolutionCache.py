@@ -0,0 +1,204 @@
+import os
+import fcntl
+import hashlib
+import numpy as np
+from Deduction import mask_cards
+
+# file format: a header, then n_sets sets of `ways` entries each; an entry holds the digest of a canonical state, the value of
+# the cache's clock when it was last used (0 if the entry is empty) and the solver's probabilities in canonical order
+MAGIC = b'CLUESOLV'
+VERSION = 1
+HEADER = np.dtype([('magic', 'S8'), ('version', '<u4'), ('n_sets', '<u4'), ('ways', '<u4'), ('n_cards', '<u4'), ('clock', '<u8')])
+# most owners of cards: six players and the envelope
+MAX_OWNERS = 7
+# hand size recorded for players whose hand size is unknown
+UNKNOWN_HAND_SIZE = 255
+# rounds of colour refinement used to tell players and cards apart
+REFINEMENT_ROUNDS = 3
+
+def entry_dtype(n_cards):
+    return np.dtype([('digest', '<u8', 2), ('stamp', '<u8'), ('n_owners', 'u1'), ('certain', '<u4'),
+                     ('probabilities', '<f8', (MAX_OWNERS, n_cards))])
+
+class CachedSolution:
+
+    # the probabilities of a solver result (see SolverResult) read back from the cache; the exact counts are not kept
+    def __init__(self, probabilities, envelope_certain):
+        self.probabilities = probabilities
+        self.envelope_probabilities = probabilities[-1]
+        self.envelope_certain = envelope_certain
+
+class CanonicalState:
+
+    # a solver problem relabelled so that states differing only in the order of the players, or of the cards within each
+    # category, look the same: players and cards are sorted by colours refined from what is known about them (ties keep their
+    # order, so equal digests always mean equivalent states, though some equivalent states may get different digests)
+    def __init__(self, knowledge, envelope_mask, hand_sizes, constraints, card_categories):
+        knowledge = np.asarray(knowledge)
+        n_players, n_cards = knowledge.shape
+        hand_sizes = [UNKNOWN_HAND_SIZE if hand_size is None else hand_size for hand_size in hand_sizes]
+        constraints = [(player_id, tuple(mask_cards(mask))) for player_id, mask in constraints]
+        # (small arrays are quicker to refine as lists than with numpy)
+        rows = knowledge.tolist()
+        columns = list(zip(*rows))
+        player_colours = ranks(hand_sizes)
+        card_colours = ranks([(int(category), bool(envelope_mask[card_id])) for card_id, category in enumerate(card_categories)])
+        for refinement in range(REFINEMENT_ROUNDS):
+            # a card is told apart by the colours of the players holding or lacking it, and of the constraints it is in
+            card_constraints = [[] for card_id in range(n_cards)]
+            for player_id, cards in constraints:
+                for card_id in cards:
+                    card_constraints[card_id].append((player_colours[player_id], len(cards)))
+            card_colours = ranks([(card_colours[card_id], tuple(sorted(zip(player_colours, columns[card_id]))), tuple(sorted(card_constraints[card_id])))
+                                  for card_id in range(n_cards)])
+            # a player by the colours of the cards they hold or lack, and of the cards in their constraints
+            player_constraints = [[] for player_id in range(n_players)]
+            for player_id, cards in constraints:
+                player_constraints[player_id].append(tuple(sorted(card_colours[card_id] for card_id in cards)))
+            player_colours = ranks([(player_colours[player_id], tuple(sorted(zip(card_colours, rows[player_id]))), tuple(sorted(player_constraints[player_id])))
+                                    for player_id in range(n_players)])
+        # players in canonical order, and cards in canonical order within each category (categories keep their places)
+        self.player_order = np.array(sorted(range(n_players), key = lambda player_id: (player_colours[player_id], player_id)))
+        self.card_order = np.array(sorted(range(n_cards), key = lambda card_id: (int(card_categories[card_id]), card_colours[card_id], card_id)))
+        player_position = np.argsort(self.player_order)
+        card_position = np.argsort(self.card_order)
+        canonical_constraints = sorted((int(player_position[player_id]), sum(1 << int(card_position[card_id]) for card_id in cards))
+                                       for player_id, cards in constraints)
+        digest = hashlib.blake2b(digest_size = 16)
+        digest.update(np.array([n_players, n_cards] + [hand_sizes[player_id] for player_id in self.player_order], dtype = np.uint8).tobytes())
+        digest.update(knowledge[self.player_order][:, self.card_order].astype(np.int8).tobytes())
+        digest.update(np.asarray(envelope_mask, dtype = bool)[self.card_order].tobytes())
+        digest.update(repr(canonical_constraints).encode())
+        self.digest = digest.digest()
+        self.n_players = n_players
+
+    # probabilities of a solver result in canonical order (owners are the players and then the envelope)
+    def to_canonical(self, probabilities):
+        owner_order = np.append(self.player_order, self.n_players)
+        return np.asarray(probabilities)[owner_order][:, self.card_order]
+
+    # probabilities in canonical order put back in the order of the original state
+    def from_canonical(self, probabilities):
+        owner_position = np.append(np.argsort(self.player_order), self.n_players)
+        return probabilities[owner_position][:, np.argsort(self.card_order)]
+
+# rank of each value among the distinct values (so that colours stay small integers from one refinement round to the next)
+def ranks(values):
+    distinct = {value: rank for rank, value in enumerate(sorted(set(values)))}
+    return [distinct[value] for value in values]
+
+class SolutionCache:
+
+    # a set-associative cache of solver results by canonical state, kept in a memory mapped file that any number of processes
+    # can share (every access holds an exclusive lock on the file); it holds at most n_sets * ways results, and a full set
+    # replaces its least recently used entry
+    def __init__(self, path, n_cards, n_sets = 1024, ways = 4):
+        self.path = path
+        self.file = open(path, 'a+b')
+        with self.locked():
+            if os.path.getsize(path) == 0:
+                header = np.zeros(1, dtype = HEADER)
+                header[0] = (MAGIC, VERSION, n_sets, ways, n_cards, 0)
+                self.file.write(header.tobytes())
+                self.file.truncate(HEADER.itemsize + n_sets * ways * entry_dtype(n_cards).itemsize)
+                self.file.flush()
+        # the file's own geometry is used if it already existed
+        self.header = np.memmap(path, dtype = HEADER, mode = 'r+', shape = (1,))
+        if self.header['magic'][0] != MAGIC or self.header['version'][0] != VERSION or self.header['n_cards'][0] != n_cards:
+            raise ValueError('{} is not a solution cache for {} cards'.format(path, n_cards))
+        self.n_sets = int(self.header['n_sets'][0])
+        self.ways = int(self.header['ways'][0])
+        self.entries = np.memmap(path, dtype = entry_dtype(n_cards), mode = 'r+', offset = HEADER.itemsize, shape = (self.n_sets, self.ways))
+        # lookups answered from the cache and missed, for instrumentation
+        self.n_hits = 0
+        self.n_misses = 0
+
+    # context manager holding an exclusive lock on the file
+    def locked(self):
+        return FileLock(self.file)
+
+    # the set a digest falls in, and the way within the set holding it (None if it is not in the cache)
+    def find(self, digest):
+        words = np.frombuffer(digest, dtype = '<u8')
+        entries = self.entries[int(words[0]) % self.n_sets]
+        matches = np.flatnonzero((entries['stamp'] != 0) & (entries['digest'] == words).all(axis = 1))
+        return entries, int(matches[0]) if len(matches) else None
+
+    # the cached result for a canonical state: a CachedSolution, None if the state has no consistent deal, or MISSING
+    def get(self, state):
+        with self.locked():
+            entries, way = self.find(state.digest)
+            if way is None:
+                self.n_misses += 1
+                return MISSING
+            entries['stamp'][way] = self.tick()
+            n_owners = int(entries['n_owners'][way])
+            probabilities = np.array(entries['probabilities'][way, :n_owners])
+            certain = int(entries['certain'][way])
+        self.n_hits += 1
+        if n_owners == 0:
+            return None
+        probabilities = state.from_canonical(probabilities)
+        certain_cards = np.array([certain >> card_id & 1 for card_id in range(probabilities.shape[1])], dtype = bool)
+        return CachedSolution(probabilities, certain_cards[np.argsort(state.card_order)])
+
+    # store the result of solving a canonical state (None if it has no consistent deal)
+    def put(self, state, result):
+        with self.locked():
+            entries, way = self.find(state.digest)
+            if way is None:
+                way = int(np.argmin(entries['stamp']))
+            entries['digest'][way] = np.frombuffer(state.digest, dtype = '<u8')
+            entries['stamp'][way] = self.tick()
+            if result is None:
+                entries['n_owners'][way] = 0
+            else:
+                probabilities = state.to_canonical(result.probabilities)
+                entries['n_owners'][way] = len(probabilities)
+                entries['probabilities'][way, :len(probabilities)] = probabilities
+                entries['certain'][way] = sum(1 << position for position, certain in enumerate(np.asarray(result.envelope_certain)[state.card_order]) if certain)
+
+    # advance the clock shared by every process using the file (called with the lock held)
+    def tick(self):
+        self.header['clock'] += 1
+        return self.header['clock'][0]
+
+    # solve a problem with a solver, answering from the cache when an equivalent state has been solved before
+    def solve(self, solver, knowledge, envelope_mask, hand_sizes, constraints):
+        state = CanonicalState(knowledge, envelope_mask, hand_sizes, constraints, solver.card_registry.card_categories)
+        result = self.get(state)
+        if result is MISSING:
+            result = solver.solve(knowledge, envelope_mask, hand_sizes, constraints)
+            self.put(state, result)
+        return result
+
+    def close(self):
+        self.entries.flush()
+        del self.entries, self.header
+        self.file.close()
+
+# marker for a state that is not in the cache (None is a valid result)
+MISSING = object()
+
+class FileLock:
+
+    def __init__(self, file):
+        self.file = file
+
+    def __enter__(self):
+        fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc_info):
+        fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+        return False
+
+# caches that have already been opened in this process, by path
+opened_caches = {}
+
+# open a solution cache by path (once per process)
+def open_cache(path, n_cards, n_sets = 1024, ways = 4):
+    path = os.path.abspath(path)
+    if path not in opened_caches:
+        opened_caches[path] = SolutionCache(path, n_cards, n_sets, ways)
+    return opened_caches[path]
@@ -0,0 +1,72 @@
+import itertools
+import numpy as np
+
+# x log x, taken as 0 at 0
+def xlogx(values):
+    values = np.asarray(values, dtype = float)
+    return np.where(values > 0, values * np.log2(np.where(values > 0, values, 1)), 0.0)
+
+class SuggestionOptimizer:
+
+    # initialize with the card registry of the game
+    def __init__(self, card_registry):
+        self.card_registry = card_registry
+        self.category_ids = [np.arange(category_slice.start, category_slice.stop) for category_slice in card_registry.category_slices.values()]
+
+    # every (character, weapon, room) triple, optionally restricted to some rooms
+    def candidate_triples(self, rooms = None):
+        characters, weapons, locations = self.category_ids
+        if rooms is not None:
+            locations = self.card_registry.ids(rooms)
+        return np.array(list(itertools.product(characters, weapons, locations)), dtype = np.intp)
+
+    # expected reduction in the entropy (in bits) of the envelope, for each suggestion triple, estimated over sampled deals
+    # deals holds the owner of each card in each sample (owner n_players being the envelope), and answer_order the
+    # player ids that are asked in turn after the suggester
+    def information_gains(self, deals, n_players, answer_order, triples):
+        n_samples, n_cards = deals.shape
+        # position of each owner in the answer order (owners who are never asked are placed after everyone)
+        never = len(answer_order)
+        ranks = np.full(n_players + 1, never)
+        ranks[list(answer_order)] = np.arange(len(answer_order))
+        card_ranks = ranks[deals]
+
+        # the envelope of each sample, as a single code
+        envelope_cards = [np.argmax(deals[:, ids] == n_players, axis = 1) for ids in self.category_ids]
+        sizes = [len(ids) for ids in self.category_ids]
+        envelope_codes = (envelope_cards[0] * sizes[1] + envelope_cards[1]) * sizes[2] + envelope_cards[2]
+        n_envelopes = int(np.prod(sizes))
+
+        # rank of the holder of each suggested card, for every triple and sample: (triples, samples, 3)
+        triple_ranks = card_ranks[:, triples].transpose(1, 0, 2)
+        first = triple_ranks.min(axis = 2)
+        showing = (triple_ranks == first[:, :, None]) & (first[:, :, None] < never)
+        n_showing = showing.sum(axis = 2)
+        # outcomes: which card is shown by whom (each card the answering player holds is shown equally often), or no card
+        n_outcomes = 3 * never + 1
+        outcomes = np.where(showing, first[:, :, None] * 3 + np.arange(3), 0)
+        weights = np.where(showing, 1.0 / np.maximum(n_showing, 1)[:, :, None], 0.0)
+        no_card = n_showing == 0
+        outcomes = np.concatenate([outcomes, np.where(no_card, n_outcomes - 1, 0)[:, :, None]], axis = 2)
+        weights = np.concatenate([weights, no_card[:, :, None].astype(float)], axis = 2)
+
+        # joint counts of (outcome, envelope) for every triple, in one bincount
+        n_triples = len(triples)
+        cells = (np.arange(n_triples)[:, None, None] * n_outcomes + outcomes) * n_envelopes + envelope_codes[None, :, None]
+        joint = np.bincount(cells.ravel(), weights = weights.ravel(), minlength = n_triples * n_outcomes * n_envelopes)
+        joint = joint.reshape(n_triples, n_outcomes, n_envelopes)
+        outcome_counts = joint.sum(axis = 2)
+        # expected posterior entropy: sum over outcomes of P(outcome) H(envelope | outcome)
+        posterior_entropy = (xlogx(outcome_counts).sum(axis = 1) - xlogx(joint).sum(axis = (1, 2))) / n_samples
+        prior_counts = np.bincount(envelope_codes, minlength = n_envelopes)
+        prior_entropy = (xlogx(n_samples) - xlogx(prior_counts).sum()) / n_samples
+        return prior_entropy - posterior_entropy
+
+    # the triple with the largest expected information gain, ties broken by the given card preferences
+    def best_suggestion(self, deals, n_players, answer_order, rooms = None, preferences = None):
+        triples = self.candidate_triples(rooms)
+        gains = self.information_gains(deals, n_players, answer_order, triples)
+        if preferences is not None:
+            gains = gains + 1e-9 * preferences[triples].sum(axis = 1)
+        best = triples[np.argmax(gains)]
+        return tuple(self.card_registry.cards[card_id] for card_id in best)
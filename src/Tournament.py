@@ -0,0 +1,164 @@
+import argparse
+import json
+import sys
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from ClueDo import ClueGame
+from HeadlessGame import HeadlessGame
+from SolutionCache import open_cache
+from PolicyTable import open_table
+
+# strategy settings (ClueGame attributes to override) by name; the time budget is dropped so that sampling stops at a
+# fixed number of deals and games can be replayed from their seed, and the cost of each suggestion is bounded instead by a
+# fixed number of random deals proposed (after which the rest of the deals are drawn from the solver's tables)
+STRATEGIES = {
+    'information': {'suggestion_time_budget': None, 'suggestion_max_proposals': 16384},
+    'greedy': {'suggestion_samples': 0},
+    'nearest_room': {'suggestion_time_budget': None, 'suggestion_max_proposals': 16384, 'weight_rooms_by_probability': False},
+}
+
+# play one game with the given strategy for each seat (in order of play), and summarise it; solved states are shared through
+# the cache file at solution_cache, if given, and decisions are looked up in the policy table file at policy_table, if given
+# (both are handed to this game's bots only, so other games in the same process are not affected)
+def play_game(game_index, seed, players, seat_strategies, max_turns, solution_cache = None, policy_table = None):
+    shared = {}
+    if solution_cache is not None:
+        shared['solution_cache'] = open_cache(solution_cache, ClueGame.registry.n_cards)
+    if policy_table is not None:
+        shared['policy_table'] = open_table(policy_table, ClueGame.registry.n_cards)
+    players = [player for player in ClueGame.player_order if player in players]
+    strategies = {player: {**STRATEGIES[strategy], **shared} for player, strategy in zip(players, seat_strategies)}
+    game = HeadlessGame(players, seed, strategies, max_turns, instrument = True)
+    result = game.play()
+    # time each bot spent deciding (phase times are exclusive, so nested phases such as solves are not counted twice)
+    compute = dict.fromkeys(players, 0.0)
+    for record in game.turn_records:
+        compute[record['player']] += sum(record['phases'].values())
+    seats = []
+    for seat, (player, strategy) in enumerate(zip(players, seat_strategies)):
+        accusations = [(correct, turn) for accuser, accusation, correct, turn in result.accusations if accuser == player]
+        seats.append({'seat': seat, 'player': player, 'strategy': strategy, 'won': result.winner == player,
+                      'wrong_accusation': any(not correct for correct, turn in accusations),
+                      'accusation_turn': accusations[0][1] if accusations else None, 'compute_s': compute[player]})
+    return {'game': game_index, 'winner': result.winner, 'n_turns': result.n_turns, 'envelope': list(result.envelope), 'seats': seats}
+
+class TournamentStats:
+
+    # running totals of games, wins, wrong accusations, turns to accusation and decision time for each (seat, strategy)
+    def __init__(self):
+        self.totals = {}
+        self.n_games = 0
+        self.n_unfinished = 0
+
+    def add(self, record):
+        self.n_games += 1
+        self.n_unfinished += record['winner'] is None
+        for seat in record['seats']:
+            totals = self.totals.setdefault((seat['seat'], seat['strategy']), {'games': 0, 'wins': 0, 'wrong_accusations': 0,
+                                                                               'accusations': 0, 'accusation_turns': 0, 'compute_s': 0.0})
+            totals['games'] += 1
+            totals['wins'] += seat['won']
+            totals['wrong_accusations'] += seat['wrong_accusation']
+            totals['compute_s'] += seat['compute_s']
+            if seat['accusation_turn'] is not None:
+                totals['accusations'] += 1
+                totals['accusation_turns'] += seat['accusation_turn']
+
+    # win rate, mean turns to accusation, wrong accusation rate and decision time per game, by seat and strategy and by
+    # strategy over all seats
+    def summary(self):
+        by_strategy = {}
+        for (seat, strategy), totals in self.totals.items():
+            combined = by_strategy.setdefault(strategy, dict.fromkeys(totals, 0))
+            for key, value in totals.items():
+                combined[key] += value
+        rows = [{'seat': seat, 'strategy': strategy, **rates(totals)} for (seat, strategy), totals in sorted(self.totals.items())]
+        rows += [{'seat': None, 'strategy': strategy, **rates(totals)} for strategy, totals in sorted(by_strategy.items())]
+        return {'games': self.n_games, 'unfinished': self.n_unfinished, 'rows': rows}
+
+# rates from a set of running totals
+def rates(totals):
+    return {'games': totals['games'],
+            'win_rate': totals['wins'] / totals['games'],
+            'wrong_accusation_rate': totals['wrong_accusations'] / totals['games'],
+            'compute_s_per_game': totals['compute_s'] / totals['games'],
+            'turns_to_accusation': totals['accusation_turns'] / totals['accusations'] if totals['accusations'] else None}
+
+class Tournament:
+
+    # initialize with the characters playing, the strategy of each seat (in order of play), the number of worker processes and
+    # the turn limit of each game; if rotate is set, the strategies move round one seat each game so that every strategy
+    # plays from every seat, if a solution cache file is given, every worker answers repeated states from it, and if a policy
+    # table file is given, every bot looks its decisions up in it first
+    def __init__(self, players, seat_strategies, n_workers = 1, max_turns = 500, rotate = True, solution_cache = None, policy_table = None):
+        assert len(players) == len(seat_strategies)
+        assert all([strategy in STRATEGIES for strategy in seat_strategies])
+        self.players = players
+        self.seat_strategies = list(seat_strategies)
+        self.n_workers = n_workers
+        self.max_turns = max_turns
+        self.rotate = rotate
+        self.solution_cache = solution_cache
+        self.policy_table = policy_table
+
+    # strategies of each seat in a game
+    def game_strategies(self, game_index):
+        shift = game_index % len(self.seat_strategies) if self.rotate else 0
+        return self.seat_strategies[shift:] + self.seat_strategies[:shift]
+
+    # play the games, yielding the summary of each one as it finishes (in any order); game i is seeded with the i-th child of
+    # the seed, so any game can be replayed on its own
+    def games(self, n_games, seed = None):
+        seeds = np.random.SeedSequence(seed).spawn(n_games)
+        if self.n_workers == 1:
+            for game_index in range(n_games):
+                yield play_game(game_index, seeds[game_index], self.players, self.game_strategies(game_index), self.max_turns,
+                                self.solution_cache, self.policy_table)
+            return
+        # keep a bounded number of games in flight, so that results stream back without queueing every game up front
+        with ProcessPoolExecutor(self.n_workers) as pool:
+            pending = set()
+            next_game = 0
+            while next_game < n_games or pending:
+                while next_game < n_games and len(pending) < 4 * self.n_workers:
+                    pending.add(pool.submit(play_game, next_game, seeds[next_game], self.players,
+                                            self.game_strategies(next_game), self.max_turns, self.solution_cache,
+                                            self.policy_table))
+                    next_game += 1
+                done, pending = wait(pending, return_when = FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+
+    # play the games and aggregate the results, passing each game's summary to the callback as it arrives
+    def run(self, n_games, seed = None, callback = None):
+        stats = TournamentStats()
+        for record in self.games(n_games, seed):
+            stats.add(record)
+            if callback is not None:
+                callback(record)
+        return stats
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description = 'Play bots against each other and report how each strategy does.')
+    parser.add_argument('--games', type = int, default = 100, help = 'number of games to play')
+    parser.add_argument('--strategies', nargs = '+', default = ['information', 'greedy', 'nearest_room'], choices = sorted(STRATEGIES),
+                        help = 'strategy of each seat, in order of play (one seat per strategy)')
+    parser.add_argument('--workers', type = int, default = 1, help = 'number of worker processes')
+    parser.add_argument('--seed', type = int, default = None, help = 'seed of the tournament')
+    parser.add_argument('--max-turns', type = int, default = 500, help = 'turn limit of each game')
+    parser.add_argument('--results', default = None, help = 'file to write the summary of each game to, as JSON lines')
+    parser.add_argument('--solution-cache', default = None, help = 'file of solved states to share between games (created if missing)')
+    parser.add_argument('--policy-table', default = None, help = 'file of precomputed decisions for common states (built by PolicyTable.py)')
+    args = parser.parse_args()
+
+    players = ClueGame.player_order[:len(args.strategies)]
+    tournament = Tournament(players, args.strategies, args.workers, args.max_turns, solution_cache = args.solution_cache,
+                            policy_table = args.policy_table)
+    results_file = open(args.results, 'w') if args.results is not None else None
+    callback = (lambda record: results_file.write(json.dumps(record) + '\n')) if results_file is not None else None
+    stats = tournament.run(args.games, args.seed, callback)
+    if results_file is not None:
+        results_file.close()
+    json.dump(stats.summary(), sys.stdout, indent = 2)
+    print()
@@ -0,0 +1,61 @@
+import random
+import numpy as np
+import Cards
+from Knowledge import CardRegistry, HAS_CARD, NOT_HAS_CARD
+
+registry = CardRegistry(Cards.characters, Cards.weapons, Cards.locations)
+
+# a random deal: one envelope card per category, and the other cards dealt round robin to the players
+def deal(rnd, n_players):
+    envelope = [rnd.randrange(category_slice.start, category_slice.stop) for category_slice in registry.category_slices.values()]
+    rest = [card_id for card_id in range(registry.n_cards) if card_id not in envelope]
+    rnd.shuffle(rest)
+    return envelope, [rest[player_id::n_players] for player_id in range(n_players)]
+
+# constraints that random players showed one of three cards, one of which they hold (as pairs of player id and card bitmask)
+def shown_constraints(rnd, hands, n_constraints):
+    constraints = []
+    for i in range(n_constraints):
+        player_id = rnd.randrange(len(hands))
+        cards = {rnd.choice(hands[player_id])} | set(rnd.sample(range(registry.n_cards), 2))
+        constraints.append((player_id, sum(1 << card_id for card_id in cards)))
+    return constraints
+
+# a random problem from partial knowledge of a deal between one of player_counts players: whether a player holds a card is
+# known with probability p_known, there are up to max_constraints constraints, and each hand size is known with
+# probability p_hand_size; with probability p_masked one card is ruled out of the envelope, and with probability
+# p_contradiction one card is ruled out of every hand and the envelope (so that no deal is consistent)
+def random_problem(seed, player_counts = (3, 4, 5, 6), p_known = 0.6, max_constraints = 3, p_hand_size = 1.0, p_masked = 0.0,
+                   p_contradiction = 0.0):
+    rnd = random.Random(seed)
+    n_players = rnd.choice(player_counts)
+    envelope, hands = deal(rnd, n_players)
+    knowledge = np.zeros((n_players, registry.n_cards), dtype = np.int8)
+    for player_id, hand in enumerate(hands):
+        for card_id in range(registry.n_cards):
+            if rnd.random() < p_known:
+                knowledge[player_id, card_id] = HAS_CARD if card_id in hand else NOT_HAS_CARD
+    constraints = shown_constraints(rnd, hands, rnd.randint(0, max_constraints))
+    # (nothing is drawn for the options that are off, so that each setting gives the same problems for the same seeds)
+    hand_sizes = [len(hand) if p_hand_size == 1 or rnd.random() < p_hand_size else None for hand in hands]
+    envelope_mask = np.ones(registry.n_cards, dtype = bool)
+    if p_masked and rnd.random() < p_masked:
+        envelope_mask[rnd.randrange(registry.n_cards)] = False
+    if p_contradiction and rnd.random() < p_contradiction:
+        card_id = rnd.randrange(registry.n_cards)
+        knowledge[:, card_id] = NOT_HAS_CARD
+        envelope_mask[card_id] = False
+    return knowledge, envelope_mask, hand_sizes, constraints
+
+# a six player problem where most of the cards are known not to be in most hands, with several constraints, so that almost
+# no uniformly random deal is consistent with it
+def constrained_problem(seed):
+    rnd = random.Random(seed)
+    envelope, hands = deal(rnd, 6)
+    knowledge = np.zeros((6, registry.n_cards), dtype = np.int8)
+    for player_id, hand in enumerate(hands):
+        for card_id in range(registry.n_cards):
+            if card_id not in hand and rnd.random() < 0.5:
+                knowledge[player_id, card_id] = NOT_HAS_CARD
+    constraints = shown_constraints(rnd, hands, 5)
+    return knowledge, np.ones(registry.n_cards, dtype = bool), [len(hand) for hand in hands], constraints
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+from BatchSimulator import BatchSimulator
+from ClueDo import ClueGame
+from Knowledge import HAS_CARD
+
+PLAYERS = ['Miss Scarlett', 'Colonel Mustard', 'Dr Orchid', 'Rev Green']
+
+# names of the cards with the given ids
+def names(card_ids):
+    return [ClueGame.registry.cards[card_id] for card_id in card_ids]
+
+class MirroredBatch:
+
+    # a batch of games in lockstep, with a ClueGame bot for every seat of every game that is told what its seat sees, as
+    # HeadlessGame tells its bots (so the bots deduce with the ConstraintEngine)
+    def __init__(self, n_games, seed):
+        self.batch = BatchSimulator(PLAYERS, n_games, seed, max_constraints = 512)
+        self.players = self.batch.players
+        hand_sizes = dict(zip(self.players, self.batch.hand_sizes.tolist()))
+        self.bots = [[ClueGame(list(self.players), player, names(np.flatnonzero(self.batch.holds(self.batch.hands[game, seat]))),
+                               hand_sizes, np.random.default_rng(0))
+                      for seat, player in enumerate(self.players)] for game in range(n_games)]
+        answer = self.batch.answer
+        self.batch.answer = lambda games, seats, cards: self.answer(answer, games, seats, cards)
+
+    # answer the suggestions in the batch, then tell the bots of each game what was asked and shown
+    def answer(self, answer, games, seats, cards):
+        before = self.batch.knowledge[games, seats].copy()
+        answer(games, seats, cards)
+        n_players = len(self.players)
+        for row, (game, suggester) in enumerate(zip(games, seats)):
+            suggestion = names(cards[row])
+            bots = self.bots[game]
+            for bot in bots:
+                bot.observe_suggestion(suggestion[0], suggestion[2])
+            for offset in range(1, n_players):
+                responder = (suggester + offset) % n_players
+                held = self.batch.holds(self.batch.hands[game, responder])[cards[row]]
+                if not held.any():
+                    for seat, bot in enumerate(bots):
+                        if seat != responder:
+                            bot.observe_no_show(self.players[responder], suggestion)
+                    continue
+                # the card the suggester saw: one it has just learned, or else one it already knew
+                known = self.batch.knowledge[game, suggester, responder, cards[row]] == HAS_CARD
+                learned = known & (before[row, responder, cards[row]] != HAS_CARD)
+                shown = cards[row][np.argmax(learned if learned.any() else known)]
+                for seat, bot in enumerate(bots):
+                    if seat == suggester:
+                        bot.observe_card_shown(self.players[responder], ClueGame.registry.cards[shown])
+                    elif seat != responder:
+                        bot.observe_show(self.players[responder], suggestion)
+                break
+
+    # play one turn of every unfinished game, and let the bots of those games deduce what they can
+    def step(self):
+        games = np.flatnonzero(~self.batch.finished)
+        self.batch.step()
+        for game in games:
+            for bot in self.bots[game]:
+                bot.update_possible_guesses()
+        return games
+
+# the lockstep arrays deduce the same as the ConstraintEngine of a bot seeing the same games
+@pytest.mark.parametrize('seed', [0, 1])
+def test_batch_knowledge_matches_bots(seed):
+    mirror = MirroredBatch(6, seed)
+    batch = mirror.batch
+    for turn in range(60):
+        if batch.finished.all():
+            break
+        for game in mirror.step():
+            for seat, bot in enumerate(mirror.bots[game]):
+                assert (batch.knowledge[game, seat] == bot.knowledge).all()
+                assert (batch.envelope_possible[game, seat] == bot.envelope).all()
+    # seats accuse only once they know the envelope, so every accusation is right
+    assert not batch.wrong_accusations.any()
+    for game in np.flatnonzero(batch.winners >= 0):
+        assert names(batch.envelopes[game]) == list(mirror.bots[game][batch.winners[game]].get_accusation())
+
+# a batch is determined by its seed
+def test_batch_is_reproducible():
+    first, second = BatchSimulator(PLAYERS, 50, 7).run(), BatchSimulator(PLAYERS, 50, 7).run()
+    assert (first.winners == second.winners).all()
+    assert (first.n_turns == second.n_turns).all()
+    assert (first.accusation_turns == second.accusation_turns).all()
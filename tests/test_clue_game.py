@@ -0,0 +1,99 @@
+import io
+import json
+import numpy as np
+from BoardGraph import board
+from ClueDo import ClueGame
+from HeadlessGame import HeadlessGame
+from GameIO import ScriptedIO
+from Knowledge import HAS_CARD, UNKNOWN
+
+PLAYERS = ['Miss Scarlett', 'Colonel Mustard', 'Dr Orchid', 'Rev Green']
+MY_CARDS = ['Rope', 'Kitchen', 'Prof Plum', 'Hall', 'Dagger']
+
+# a game of Miss Scarlett's answering the given questions in turn, writing the questions to an output buffer
+def scripted_game(answers):
+    output = io.StringIO()
+    game = ClueGame(list(PLAYERS), 'Miss Scarlett', list(MY_CARDS), {player: 5 for player in PLAYERS}, np.random.default_rng(0),
+                    io = ScriptedIO([json.dumps(answer) for answer in answers], output))
+    game.suggestion_samples = 0
+    return game, output
+
+# the choices offered by each question asked
+def questions(output):
+    return [record for record in map(json.loads, output.getvalue().splitlines()) if record['type'] != 'say']
+
+# an eliminated player still shows cards, and can be named as the player who showed one
+def test_eliminated_player_can_show_a_card():
+    game, output = scripted_game([7, 0, 'Colonel Mustard', 'Revolver'])
+    game.observe_failed_accusation('Colonel Mustard', ['Rev Green', 'Candlestick', 'Lounge'])
+    assert game.other_players == ['Dr Orchid', 'Rev Green']
+    # move straight into the Lounge and suggest Mrs Peacock with the Revolver there
+    game.move_on_board = lambda dice_roll: (ClueGame.room_locations['Lounge'], 'Lounge')
+    game.get_top_suggestions = lambda: ('Mrs Peacock', 'Revolver', 'Lounge')
+    game.our_turn()
+    assert 'Colonel Mustard' in questions(output)[2]['choices']
+    # the player that showed the card holds it, and nobody was asked before them
+    assert game.game_state['Colonel Mustard']['Revolver'] == HAS_CARD
+    assert (game.knowledge[1:, ClueGame.registry.ids(['Mrs Peacock', 'Lounge'])] == UNKNOWN).all()
+
+def test_eliminated_player_can_show_a_revealed_card():
+    game, output = scripted_game(['Colonel Mustard'])
+    game.observe_failed_accusation('Colonel Mustard', ['Rev Green', 'Candlestick', 'Lounge'])
+    game.which_player_showed_card('Wrench')
+    assert 'Colonel Mustard' in questions(output)[0]['choices']
+    assert game.game_state['Colonel Mustard']['Wrench'] == HAS_CARD
+
+# drawing the secret passage card in a room without a passage connects that room to the passages
+def test_secret_passage_from_a_room_without_one():
+    game, output = scripted_game(['Secret passage'])
+    game.position = ClueGame.room_locations['Hall']
+    game.clue_card('Miss Scarlett', 7)
+    assert game.current_room() == 'Hall'
+    assert game.get_path_lengths()['Kitchen'] == 1
+    # only this game's board has the passage
+    assert board.overlay().path_length(game.position, ClueGame.room_locations['Kitchen']) > 1
+
+# Miss Scarlett's bot part way through a seeded game, choosing suggestions from a fixed number of samples
+def mid_game_bot():
+    game = HeadlessGame(PLAYERS, 4, {player: {'suggestion_time_budget': None, 'suggestion_samples': 500} for player in PLAYERS})
+    for turn in range(12):
+        game.take_turn(game.players[turn % len(game.players)])
+    return game.bots['Miss Scarlett']
+
+# moves for a few rolls, a suggestion in every room and a few draws, in order
+def decisions(game):
+    moves = [game.move_on_board(dice_roll) for dice_roll in [4, 7, 11]]
+    suggestions = [game.choose_suggestion(room) for room in sorted(ClueGame.locations)]
+    return moves, suggestions, game.rng.integers(2 ** 32, size = 4).tolist()
+
+# a fork of a snapshot decides exactly as the game it was taken from, and draws the same random numbers
+def test_fork_decides_as_the_original():
+    game = mid_game_bot()
+    fork = game.fork(game.snapshot())
+    other_fork = game.fork(game.snapshot())
+    expected = decisions(game)
+    assert decisions(fork) == expected
+    assert decisions(other_fork) == expected
+
+# a fork shares no knowledge arrays with its game or its snapshot, so either can be played on without changing the other
+def test_fork_does_not_alias_knowledge():
+    game = mid_game_bot()
+    state = game.snapshot()
+    fork = game.fork(state)
+    for array in (fork.knowledge, fork.envelope):
+        assert not any(np.shares_memory(array, other) for other in (game.knowledge, game.envelope, state.knowledge, state.envelope))
+    assert fork.deduction.knowledge is fork.knowledge and fork.game_state.knowledge is fork.knowledge
+    knowledge, envelope, constraints = game.knowledge.copy(), game.envelope.copy(), list(game.deduction.constraints)
+    player = next(player for player in fork.other_players if (fork.knowledge[fork.player_registry.id(player)] == UNKNOWN).any())
+    card = ClueGame.registry.cards[np.flatnonzero(fork.knowledge[fork.player_registry.id(player)] == UNKNOWN)[0]]
+    fork.observe_card_shown(player, card)
+    fork.observe_show(player, ['Mrs Peacock', 'Revolver', 'Lounge'])
+    fork.observe_failed_accusation(player, ['Mrs Peacock', 'Revolver', 'Lounge'])
+    fork.update_possible_guesses()
+    assert fork.game_state[player][card] == HAS_CARD
+    assert np.array_equal(game.knowledge, knowledge) and np.array_equal(game.envelope, envelope)
+    assert game.deduction.constraints == constraints and player in game.players
+    assert np.array_equal(state.knowledge, knowledge) and player in state.players
+    # and the other way round
+    game.observe_no_show(player, [card])
+    assert fork.game_state[player][card] == HAS_CARD
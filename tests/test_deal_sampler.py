@@ -0,0 +1,77 @@
+import time
+import numpy as np
+import pytest
+import Cards
+from DealSampler import DealSampler, SamplingProblem, run_sampler
+from Deduction import mask_cards
+from EnvelopeSolver import EnvelopeSolver
+from Knowledge import CardRegistry, HAS_CARD, NOT_HAS_CARD
+import problems
+from problems import constrained_problem
+
+registry = CardRegistry(Cards.characters, Cards.weapons, Cards.locations)
+
+# a random problem from partial knowledge of a deal between three to five players, with every hand size known
+def random_problem(seed):
+    return problems.random_problem(seed, (3, 4, 5), 0.5)
+
+@pytest.mark.parametrize('seed', range(10))
+def test_sampled_deals_are_consistent(seed):
+    knowledge, envelope_mask, hand_sizes, constraints = random_problem(seed)
+    result = DealSampler(registry).sample(knowledge, envelope_mask, hand_sizes, constraints, n_samples = 500, seed = seed, keep_deals = True)
+    n_players = len(hand_sizes)
+    assert len(result.deals) == result.n_accepted == 500
+    for deal in result.deals:
+        for category_slice in registry.category_slices.values():
+            assert (deal[category_slice] == n_players).sum() == 1
+        assert [int((deal == player_id).sum()) for player_id in range(n_players)] == hand_sizes
+        assert all(deal[card_id] == player_id for player_id, card_id in np.argwhere(knowledge == HAS_CARD))
+        assert all(deal[card_id] != player_id for player_id, card_id in np.argwhere(knowledge == NOT_HAS_CARD))
+        assert all((deal[list(mask_cards(mask))] == player_id).any() for player_id, mask in constraints)
+
+# the estimates are within a few standard errors of the exact probabilities
+@pytest.mark.parametrize('seed', range(5))
+def test_estimates_match_solver(seed):
+    problem = random_problem(seed)
+    exact = EnvelopeSolver(registry).solve(*problem)
+    n_samples = 20000
+    result = DealSampler(registry).sample(*problem, n_samples = n_samples, seed = seed)
+    standard_error = np.sqrt(exact.probabilities * (1 - exact.probabilities) / n_samples)
+    assert (np.abs(result.probabilities - exact.probabilities) <= 5 * standard_error + 1e-9).all()
+    low, high = result.confidence_intervals.T
+    assert (low <= result.envelope_probabilities).all() and (result.envelope_probabilities <= high).all()
+
+def test_same_seed_same_estimates():
+    problem = random_problem(0)
+    first = DealSampler(registry).sample(*problem, n_samples = 1000, seed = 3)
+    second = DealSampler(registry).sample(*problem, n_samples = 1000, seed = 3)
+    assert np.array_equal(first.owner_counts, second.owner_counts)
+
+def test_bad_problems_are_rejected():
+    knowledge, envelope_mask, hand_sizes, constraints = random_problem(0)
+    sampler = DealSampler(registry)
+    with pytest.raises(ValueError):
+        sampler.sample(knowledge, envelope_mask, hand_sizes, constraints)
+    with pytest.raises(ValueError):
+        sampler.sample(knowledge, envelope_mask, [None] + hand_sizes[1:], constraints, n_samples = 10)
+
+# rejection accepts next to nothing in a heavily constrained state, so the sample budget is filled from the solver's tables
+# in bounded time, with the same estimates
+@pytest.mark.parametrize('seed', [5, 9])
+def test_constrained_states_take_bounded_time(seed):
+    problem = constrained_problem(seed)
+    rejection = run_sampler(SamplingProblem(*problem, registry.card_categories), seed, max_proposals = 40960, min_acceptance = 0)
+    assert rejection.n_accepted < 0.001 * rejection.n_proposed
+    start = time.perf_counter()
+    result = DealSampler(registry).sample(*problem, n_samples = 4000, seed = seed, keep_deals = True)
+    assert time.perf_counter() - start < 5
+    assert result.n_accepted == len(result.deals) == 4000
+    exact = EnvelopeSolver(registry).solve(*problem)
+    standard_error = np.sqrt(exact.probabilities * (1 - exact.probabilities) / 4000)
+    assert (np.abs(result.probabilities - exact.probabilities) <= 5 * standard_error + 1e-9).all()
+    # a time budget alone also stops, with samples
+    start = time.perf_counter()
+    assert DealSampler(registry).sample(*problem, time_budget = 0.2, seed = seed).n_accepted > 0
+    assert time.perf_counter() - start < 5
+    second = DealSampler(registry).sample(*problem, n_samples = 4000, seed = seed)
+    assert np.array_equal(second.owner_counts, result.owner_counts)
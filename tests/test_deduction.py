@@ -0,0 +1,99 @@
+import random
+import numpy as np
+import pytest
+import Cards
+from Deduction import ConstraintEngine, cards_mask, mask_cards
+from Knowledge import CardRegistry, HAS_CARD, UNKNOWN, NOT_HAS_CARD
+from problems import deal
+
+registry = CardRegistry(Cards.characters, Cards.weapons, Cards.locations)
+
+def test_mask_round_trip():
+    card_ids = [0, 3, 20]
+    assert list(mask_cards(cards_mask(card_ids))) == card_ids
+
+# every deduction made from true observations of a deal agrees with the deal
+@pytest.mark.parametrize('seed', range(40))
+def test_deductions_are_sound(seed):
+    rnd = random.Random(seed)
+    n_players = rnd.choice([3, 4, 5, 6])
+    envelope, hands = deal(rnd, n_players)
+    knowledge = np.zeros((n_players, registry.n_cards), dtype = np.int8)
+    engine = ConstraintEngine(knowledge, [len(hand) for hand in hands], registry)
+    for card_id in hands[0]:
+        engine.set_has(0, card_id)
+    for card_id in range(registry.n_cards):
+        if card_id not in hands[0]:
+            engine.set_not_has(0, card_id)
+    for turn in range(40):
+        suggestion = [rnd.randrange(category_slice.start, category_slice.stop) for category_slice in registry.category_slices.values()]
+        for player_id in rnd.sample(range(1, n_players), n_players - 1):
+            held = [card_id for card_id in suggestion if card_id in hands[player_id]]
+            if held:
+                engine.add_constraint(player_id, suggestion, turn)
+                break
+            for card_id in suggestion:
+                engine.set_not_has(player_id, card_id)
+        engine.propagate()
+        for player_id, hand in enumerate(hands):
+            row = knowledge[player_id]
+            assert all(row[card_id] != NOT_HAS_CARD for card_id in hand)
+            assert all(row[card_id] != HAS_CARD for card_id in range(registry.n_cards) if card_id not in hand)
+        for constraint in engine.constraints:
+            assert any(card_id in hands[constraint.player_id] for card_id in mask_cards(constraint.mask))
+
+def test_single_card_left_is_held():
+    knowledge = np.zeros((3, registry.n_cards), dtype = np.int8)
+    engine = ConstraintEngine(knowledge, [None] * 3, registry)
+    engine.add_constraint(1, [0, 7, 14], 0)
+    engine.set_not_has(1, 0)
+    engine.set_not_has(1, 7)
+    engine.propagate()
+    assert knowledge[1, 14] == HAS_CARD
+    assert (knowledge[[0, 2], 14] == NOT_HAS_CARD).all()
+    assert engine.constraints == []
+
+def test_redundant_constraints_are_retired():
+    knowledge = np.zeros((3, registry.n_cards), dtype = np.int8)
+    engine = ConstraintEngine(knowledge, [None] * 3, registry)
+    larger = engine.add_constraint(1, [0, 7, 14], 0)
+    other = engine.add_constraint(1, [1, 8, 15], 1)
+    smaller = engine.add_constraint(1, [0, 7], 2)
+    # a constraint implied by an existing one is not added
+    assert engine.add_constraint(1, [0, 7, 16], 3) is smaller
+    assert not larger.active and smaller.active and other.active
+    assert engine.constraints_by_cell[(1, 14)] == []
+    assert {constraint.mask for constraint in engine.constraints} == {cards_mask([0, 7]), cards_mask([1, 8, 15])}
+
+def test_hand_size_rules():
+    knowledge = np.zeros((3, registry.n_cards), dtype = np.int8)
+    engine = ConstraintEngine(knowledge, [None, 2, None], registry)
+    engine.set_has(1, 0)
+    engine.set_has(1, 7)
+    engine.propagate()
+    assert (knowledge[1] == NOT_HAS_CARD).sum() == registry.n_cards - 2
+    knowledge = np.zeros((3, registry.n_cards), dtype = np.int8)
+    engine = ConstraintEngine(knowledge, [None, 2, None], registry)
+    for card_id in range(2, registry.n_cards):
+        engine.set_not_has(1, card_id)
+    engine.propagate()
+    assert knowledge[1, 0] == HAS_CARD and knowledge[1, 1] == HAS_CARD
+
+def test_category_rules():
+    characters = registry.category_slices['characters']
+    knowledge = np.zeros((2, registry.n_cards), dtype = np.int8)
+    engine = ConstraintEngine(knowledge, [None, None], registry)
+    # every character but the last is held, so the last one is in the envelope
+    for card_id in range(characters.start, characters.stop - 1):
+        engine.set_has(card_id % 2, card_id)
+    engine.propagate()
+    assert (knowledge[:, characters.stop - 1] == NOT_HAS_CARD).all()
+    # with the envelope card known, a card only one player could hold is held by them
+    knowledge = np.zeros((2, registry.n_cards), dtype = np.int8)
+    engine = ConstraintEngine(knowledge, [None, None], registry)
+    engine.set_not_has(0, characters.start)
+    engine.set_not_has(1, characters.start)
+    engine.set_not_has(0, characters.start + 1)
+    engine.propagate()
+    assert knowledge[1, characters.start + 1] == HAS_CARD
+    assert (knowledge[:, characters.start + 2:characters.stop] == UNKNOWN).all()
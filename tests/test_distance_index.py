@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+from DistanceIndex import DistanceIndex, UNREACHABLE
+from BoardGraph import board
+
+# random symmetric adjacency matrix, sparse enough to leave some squares unconnected
+def random_adjacency(rng, n_squares, density):
+    adjacency = np.triu(rng.random((n_squares, n_squares)) < density, 1)
+    return adjacency | adjacency.T
+
+# every next hop is a neighbour one step closer to the target, and paths end at the target
+def check_next_hop(index):
+    distances = index.distances
+    for source in range(index.n_squares):
+        for target in range(index.n_squares):
+            if source == target or distances[source, target] >= UNREACHABLE:
+                continue
+            step = index.next_hop[source, target]
+            assert index.adjacency[source, step]
+            assert distances[step, target] == distances[source, target] - 1
+
+@pytest.mark.parametrize('seed', range(10))
+def test_add_edge_matches_rebuild(seed):
+    rng = np.random.default_rng(seed)
+    adjacency = random_adjacency(rng, 40, 0.04)
+    index = DistanceIndex(adjacency)
+    for i in range(8):
+        square_a, square_b = (int(square) for square in rng.integers(40, size = 2))
+        index.add_edge(square_a, square_b)
+        if square_a != square_b:
+            adjacency[square_a, square_b] = adjacency[square_b, square_a] = True
+        rebuilt = DistanceIndex(adjacency)
+        assert np.array_equal(index.distances, rebuilt.distances)
+        check_next_hop(index)
+
+def test_secret_passages_on_the_board():
+    index = DistanceIndex(board.index.adjacency, np.array(board.index.distances), np.array(board.index.next_hop))
+    adjacency = np.array(board.index.adjacency)
+    for room_a, room_b in board.secret_passages:
+        square_a, square_b = board.room_locations[room_a], board.room_locations[room_b]
+        index.add_edge(square_a, square_b)
+        adjacency[square_a, square_b] = adjacency[square_b, square_a] = True
+    assert index.version == len(board.secret_passages)
+    assert np.array_equal(index.distances, DistanceIndex(adjacency).distances)
+    check_next_hop(index)
+
+def test_shortest_path_follows_edges():
+    rng = np.random.default_rng(0)
+    index = board.index
+    for source, target in rng.integers(index.n_squares, size = (50, 2)):
+        if index.distances[source, target] >= UNREACHABLE:
+            continue
+        path = index.shortest_path(int(source), int(target))
+        assert path[0] == source and path[-1] == target
+        assert len(path) == index.path_length(int(source), int(target)) + 1
+        assert all(index.adjacency[a, b] for a, b in zip(path, path[1:]))
@@ -0,0 +1,98 @@
+import itertools
+import math
+import numpy as np
+import pytest
+import Cards
+import problems
+from Benchmark import time_solves, check_budgets
+from Deduction import mask_cards
+from EnvelopeSolver import EnvelopeSolver
+from Knowledge import CardRegistry, HAS_CARD, NOT_HAS_CARD
+
+registry = CardRegistry(Cards.characters, Cards.weapons, Cards.locations)
+
+# counts of the deals consistent with a problem, by enumerating every owner of every card (the last owner is the envelope),
+# or None if there are none
+def brute_force(knowledge, envelope_mask, hand_sizes, constraints):
+    n_players, n_cards = knowledge.shape
+    owners = []
+    for card_id in range(n_cards):
+        holders = np.flatnonzero(knowledge[:, card_id] == HAS_CARD)
+        if len(holders):
+            owners.append(list(holders))
+        else:
+            owners.append(list(np.flatnonzero(knowledge[:, card_id] != NOT_HAS_CARD)) + ([n_players] if envelope_mask[card_id] else []))
+    counts = np.zeros((n_players + 1, n_cards), dtype = np.int64)
+    total = 0
+    for deal in itertools.product(*owners):
+        deal = np.array(deal)
+        if any((deal[category_slice] == n_players).sum() != 1 for category_slice in registry.category_slices.values()):
+            continue
+        if any(hand_size is not None and (deal == player_id).sum() != hand_size for player_id, hand_size in enumerate(hand_sizes)):
+            continue
+        if any(not (deal[list(mask_cards(mask))] == player_id).any() for player_id, mask in constraints):
+            continue
+        counts[deal, np.arange(n_cards)] += 1
+        total += 1
+    return (counts, total) if total else None
+
+# a random problem from partial knowledge of a deal, with three or four players, some hand sizes unknown and sometimes a card
+# ruled out of the envelope or a contradiction, small enough to enumerate (None if it is too big)
+def random_problem(seed):
+    knowledge, envelope_mask, hand_sizes, constraints = problems.random_problem(seed, (3, 4), 0.75, 4, p_hand_size = 0.7, p_masked = 0.3,
+                                                                                 p_contradiction = 0.1)
+    n_deals = math.prod(int((knowledge[:, card_id] != NOT_HAS_CARD).sum()) + 1 for card_id in range(registry.n_cards)
+                        if not (knowledge[:, card_id] == HAS_CARD).any())
+    if n_deals > 20000:
+        return None
+    return knowledge, envelope_mask, hand_sizes, constraints
+
+@pytest.mark.parametrize('seed', range(150))
+def test_solver_matches_brute_force(seed):
+    problem = random_problem(seed)
+    if problem is None:
+        pytest.skip('too many deals to enumerate')
+    expected = brute_force(*problem)
+    result = EnvelopeSolver(registry).solve(*problem)
+    if expected is None:
+        assert result is None
+        return
+    counts, total = expected
+    assert result.total == total
+    assert np.array_equal(np.array(result.counts, dtype = np.int64), counts)
+    assert np.array_equal(result.envelope_certain, counts[-1] == total)
+
+# tables and convolutions reused from earlier solves give the same counts as a fresh solver
+def test_cached_solves_match_fresh_solves():
+    solver = EnvelopeSolver(registry, max_tables = 64, max_convolutions = 64)
+    problems = [problem for problem in (random_problem(seed) for seed in range(60)) if problem is not None]
+    for problem in problems + problems[::-1]:
+        result, fresh = solver.solve(*problem), EnvelopeSolver(registry).solve(*problem)
+        assert (result is None) == (fresh is None)
+        if result is not None:
+            assert result.total == fresh.total and np.array_equal(np.array(result.counts), np.array(fresh.counts))
+
+# deals drawn from the solver's tables are consistent, and each card goes to each owner as often as the counts say
+@pytest.mark.parametrize('seed', range(0, 150, 10))
+def test_sampled_deals_match_counts(seed):
+    problem = random_problem(seed)
+    if problem is None or brute_force(*problem) is None:
+        pytest.skip('no problem to sample')
+    counts, total = brute_force(*problem)
+    n_samples = 5000
+    deals = EnvelopeSolver(registry).sample(*problem, n_samples, np.random.default_rng(seed))
+    knowledge, envelope_mask, hand_sizes, constraints = problem
+    n_players = len(hand_sizes)
+    for deal in deals:
+        assert all((deal[category_slice] == n_players).sum() == 1 for category_slice in registry.category_slices.values())
+        assert all(hand_size is None or (deal == player_id).sum() == hand_size for player_id, hand_size in enumerate(hand_sizes))
+        assert all(knowledge[owner, card_id] != NOT_HAS_CARD for card_id, owner in enumerate(deal) if owner < n_players)
+        assert all(envelope_mask[card_id] for card_id in np.flatnonzero(deal == n_players))
+        assert all((deal[list(mask_cards(mask))] == player_id).any() for player_id, mask in constraints)
+    probabilities = counts / total
+    frequencies = np.stack([(deals == owner).mean(axis = 0) for owner in range(n_players + 1)])
+    assert (np.abs(frequencies - probabilities) <= 5 * np.sqrt(probabilities * (1 - probabilities) / n_samples) + 1e-9).all()
+
+# the solves of greedy six-player games stay within the benchmark's budgets, from empty tables
+def test_solves_stay_within_budget():
+    assert check_budgets({'envelope_solves': time_solves(3)}) == []
@@ -0,0 +1,86 @@
+import asyncio
+import io
+import json
+import pytest
+from GameIO import GameIO, ScriptedIO, AsyncIO
+
+# questions and messages of a small game, and what it was answered
+def play(game_io, results):
+    game_io.say('hello')
+    results.append(game_io.choose(['a', 'b'], 'pick one'))
+    results.append(game_io.ask_number('how many', 1, 3))
+    results.append(game_io.choose_many({'y', 'x'}, 'pick some'))
+    game_io.reveal('secret')
+
+def test_frontends_implement_every_question():
+    with pytest.raises(TypeError):
+        GameIO()
+    class Silent(GameIO):
+        def choose(self, choices, message, error_message = None):
+            return choices[0]
+    with pytest.raises(TypeError):
+        Silent()
+
+def test_scripted_answers_and_output():
+    output = io.StringIO()
+    results = []
+    play(ScriptedIO(['"b"', '2', ['x', 'y']], output), results)
+    assert results == ['b', 2, ['x', 'y']]
+    records = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert [record['type'] for record in records] == ['say', 'choose', 'number', 'choose_many', 'reveal']
+    # sets of choices are offered in a fixed order
+    assert records[3]['choices'] == ['x', 'y']
+    assert records[2]['low'] == 1 and records[2]['high'] == 3
+
+@pytest.mark.parametrize('answers, error', [(['"c"'], ValueError), (['"a"', '4'], ValueError), (['"a"', '"2"'], ValueError),
+                                            (['"a"', '1', '"x"'], ValueError), (['"a"'], EOFError)])
+def test_scripted_bad_answers_raise(answers, error):
+    with pytest.raises(error):
+        play(ScriptedIO(answers), [])
+
+# play the small game on an AsyncIO, answering its questions in turn from the loop; returns the events and the results
+async def play_async(answers):
+    game_io = AsyncIO()
+    results = []
+    events = []
+    answers = iter(answers)
+    async for event in game_io.events_of(play, game_io, results):
+        events.append(event)
+        if event['type'] not in ('say', 'reveal'):
+            game_io.answer(next(answers))
+    return events, results
+
+def test_async_answers_and_events():
+    events, results = asyncio.run(play_async(['b', 2, ['y']]))
+    assert results == ['b', 2, ['y']]
+    assert [event['type'] for event in events] == ['say', 'choose', 'number', 'choose_many', 'reveal']
+    assert events[3]['choices'] == ['x', 'y']
+
+# bad answers are met with a message and the question again
+def test_async_bad_answers_ask_again():
+    events, results = asyncio.run(play_async(['c', 'a', 7, '2', 3, 'x', ['x']]))
+    assert results == ['a', 3, ['x']]
+    assert [event['type'] for event in events] == ['say', 'choose', 'say', 'choose', 'number', 'say', 'number', 'say', 'number',
+                                                   'choose_many', 'say', 'choose_many', 'reveal']
+    assert events[2]['message'] == 'That is not one of the choices'
+
+# an error in the game's thread is raised on the loop
+def test_async_errors_reach_the_loop():
+    async def run():
+        game_io = AsyncIO()
+        def fail():
+            game_io.say('about to fail')
+            raise RuntimeError('game failed')
+        return [event async for event in game_io.events_of(fail)]
+    with pytest.raises(RuntimeError, match = 'game failed'):
+        asyncio.run(run())
+
+# the frontend takes the running loop, so outside a coroutine it needs to be given one
+def test_async_needs_a_loop():
+    with pytest.raises(RuntimeError):
+        AsyncIO()
+    loop = asyncio.new_event_loop()
+    try:
+        assert AsyncIO(loop).loop is loop
+    finally:
+        loop.close()
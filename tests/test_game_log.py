@@ -0,0 +1,73 @@
+import io
+import numpy as np
+import pytest
+import HeadlessGame
+from ClueDo import ClueGame
+from GameLog import GameLog, replay, resume, read_events, describe
+
+PLAYERS = ['Miss Scarlett', 'Colonel Mustard', 'Dr Orchid', 'Rev Green']
+
+class LoggedGame(ClueGame):
+
+    # a bot logging its events to a buffer that the test can read back
+    def __init__(self, *args, **kwargs):
+        self.buffer = io.BytesIO()
+        super().__init__(*args, log = GameLog(self.buffer, snapshot_every = 3), **kwargs)
+
+class CheckedGame(HeadlessGame.HeadlessGame):
+
+    # a headless game checking, after every turn, that each bot's log replays to the bot's state
+    def take_turn(self, player):
+        super().take_turn(player)
+        for bot in self.bots.values():
+            bot.update_possible_guesses()
+            for use_snapshots in (True, False):
+                assert state(replay(bot.buffer.getvalue(), use_snapshots)) == state(bot)
+
+# everything about a game that changes as it is played
+def state(game):
+    game.deduction.propagate()
+    return (game.knowledge.tobytes(), game.envelope.tobytes(), game.position, list(game.players), list(game.my_cards), game.current_turn,
+            game.current_round, game.game_is_active, sorted((constraint.player_id, constraint.mask) for constraint in game.deduction.constraints),
+            game.board.edges, game.rng.bit_generator.state)
+
+@pytest.fixture
+def logged_bots(monkeypatch):
+    monkeypatch.setattr(HeadlessGame, 'ClueGame', LoggedGame)
+
+@pytest.mark.parametrize('seed', range(3))
+def test_replay_matches_live_game(logged_bots, seed):
+    game = CheckedGame(PLAYERS, seed, {player: {'suggestion_samples': 0} for player in PLAYERS}, max_turns = 60)
+    game.play()
+    assert game.n_turns > 0
+
+def test_resume_continues_the_same_game(logged_bots, tmp_path):
+    game = HeadlessGame.HeadlessGame(PLAYERS, 0, {player: {'suggestion_samples': 0} for player in PLAYERS}, max_turns = 20)
+    game.play()
+    bot = game.bots['Dr Orchid']
+    path = tmp_path / 'game.log'
+    # a record cut short by a crash is dropped
+    path.write_bytes(bot.buffer.getvalue() + b'\x02\x05')
+    resumed = resume(str(path))
+    assert path.stat().st_size == len(bot.buffer.getvalue())
+    assert state(resumed) == state(bot)
+    # the resumed game draws what the original would have, and logs on from where it left off
+    for game_copy in (bot, resumed):
+        game_copy.position, heading = game_copy.move_on_board(7)
+        game_copy.advance_turn()
+    resumed.log.close()
+    assert state(resumed) == state(bot)
+    assert state(replay(str(path))) == state(bot)
+
+def test_describe_names_every_event(logged_bots):
+    game = HeadlessGame.HeadlessGame(PLAYERS, 1, {player: {'suggestion_samples': 0} for player in PLAYERS}, max_turns = 12)
+    game.play()
+    data = game.bots['Miss Scarlett'].buffer.getvalue()
+    records = describe(data)
+    assert len(records) == len(read_events(data)[0])
+    assert records[0]['event'] == 'start' and records[0]['my_char'] == 'Miss Scarlett'
+    assert {'move', 'end_turn', 'snapshot', 'rng'} <= {record['event'] for record in records}
+
+def test_replay_needs_a_start():
+    with pytest.raises(ValueError):
+        replay(b'')
@@ -0,0 +1,118 @@
+import asyncio
+import json
+import numpy as np
+import pytest
+from GameServer import GameServer
+from Knowledge import HAS_CARD, NOT_HAS_CARD
+from ClueDo import ClueGame
+
+PLAYERS = ['Miss Scarlett', 'Colonel Mustard', 'Dr Orchid', 'Rev Green']
+NEW = {'op': 'new', 'session': 'table', 'players': PLAYERS, 'my_char': 'Miss Scarlett',
+       'my_cards': ['Rope', 'Kitchen', 'Prof Plum', 'Hall', 'Dagger'], 'hand_sizes': {player: 5 for player in PLAYERS}, 'seed': 3}
+
+class Writer:
+
+    # stands in for a connection's stream writer, keeping the responses written to it
+    def __init__(self):
+        self.responses = []
+
+    def write(self, data):
+        self.responses.append(json.loads(data))
+
+    async def drain(self):
+        pass
+
+# the parts of two games that change as they are played are the same
+def assert_same_state(game, other):
+    state, other_state = game.snapshot(), other.snapshot()
+    assert np.array_equal(state.knowledge, other_state.knowledge)
+    assert np.array_equal(state.envelope, other_state.envelope)
+    assert state.constraints == other_state.constraints
+    assert (state.players, state.position, state.current_turn) == (other_state.players, other_state.position, other_state.current_turn)
+    assert state.rng_state == other_state.rng_state
+
+# send the same requests to a server deciding in the event loop and to one deciding in a worker process, checking that they
+# answer alike and leave the same game behind
+async def play_both(servers, request):
+    responses = [await server.handle(dict(request)) for server in servers]
+    assert responses[0] == responses[1]
+    if request['op'] != 'close':
+        assert_same_state(*(server.sessions[request['session']].game for server in servers))
+    return responses[0]
+
+def test_pool_round_trip_matches_event_loop():
+    async def run():
+        servers = [GameServer(n_workers = 0), GameServer(n_workers = 1)]
+        try:
+            await play_both(servers, NEW)
+            # move until a move ends in a room and makes a suggestion
+            for dice_roll in [7, 8, 6, 9, 5, 10, 4, 11, 3, 12]:
+                result = await play_both(servers, {'op': 'our_turn', 'session': 'table', 'dice_roll': dice_roll})
+                if result['suggestion'] is not None:
+                    break
+                await play_both(servers, {'op': 'end_turn', 'session': 'table'})
+            suggestion = result['suggestion']
+            assert suggestion is not None and suggestion[2] == result['room']
+            # the second player asked shows a card we do not hold, so the first player asked holds none of them
+            game = servers[0].sessions['table'].game
+            first, second = game.answer_order(game.my_char)[:2]
+            card = next(card for card in suggestion if card not in NEW['my_cards'])
+            await play_both(servers, {'op': 'suggestion_result', 'session': 'table', 'player': second, 'card': card})
+            for server in servers:
+                game = server.sessions['table'].game
+                assert game.game_state[second][card] == HAS_CARD
+                assert all(game.game_state[first][suggested] == NOT_HAS_CARD for suggested in suggestion)
+            await play_both(servers, {'op': 'probabilities', 'session': 'table'})
+            await play_both(servers, {'op': 'close', 'session': 'table'})
+            assert all('table' not in server.sessions for server in servers)
+        finally:
+            for server in servers:
+                server.close()
+    asyncio.run(run())
+
+# when nobody shows a card, every player asked holds none of the suggested cards
+def test_nobody_showing_rules_out_every_player():
+    async def run():
+        server = GameServer(n_workers = 0)
+        await server.handle(dict(NEW))
+        session = server.sessions['table']
+        suggestion = ['Mrs Peacock', 'Revolver', 'Lounge']
+        session.suggestion = suggestion
+        await server.handle({'op': 'suggestion_result', 'session': 'table', 'player': None, 'card': None})
+        for player in PLAYERS[1:]:
+            assert all(session.game.game_state[player][card] == NOT_HAS_CARD for card in suggestion)
+        assert session.suggestion is None
+    asyncio.run(run())
+
+@pytest.mark.parametrize('line, error', [
+    ('not json', 'JSONDecodeError'),
+    ('[1, 2]', 'ValueError: A request must be a JSON object'),
+    ('{"op": "our_turn", "session": "missing", "dice_roll": 7, "id": 4}', 'KeyError'),
+    ('{"op": "suggestion_result", "session": "table", "player": null, "id": 5}', 'ValueError: No suggestion is waiting for an answer'),
+    ('{"op": "dance", "session": "table", "id": 6}', 'ValueError: Unknown op dance'),
+    (json.dumps(dict(NEW, id = 7)), 'ValueError: Session table already exists'),
+])
+def test_errors_are_answered(line, error):
+    async def run():
+        server = GameServer(n_workers = 0)
+        await server.handle(dict(NEW))
+        writer = Writer()
+        await server.respond(line, writer)
+        return writer.responses
+    [response] = asyncio.run(run())
+    assert response['ok'] is False and response['error'].startswith(error)
+    # the request's id and session are echoed, when it has them
+    request = json.loads(line) if line.startswith('{') else {}
+    assert response.get('id') == request.get('id') and response.get('session') == request.get('session')
+
+# a closed session no longer answers
+def test_closed_session_is_gone():
+    async def run():
+        server = GameServer(n_workers = 0)
+        writer = Writer()
+        for request in [NEW, {'op': 'close', 'session': 'table'}, {'op': 'end_turn', 'session': 'table'}]:
+            await server.respond(json.dumps(request), writer)
+        return writer.responses
+    new, close, end_turn = asyncio.run(run())
+    assert new['ok'] and new['position'] == ClueGame.char_starting_positions['Miss Scarlett']
+    assert close['ok'] and not end_turn['ok'] and end_turn['error'].startswith('KeyError')
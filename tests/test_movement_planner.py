@@ -0,0 +1,117 @@
+import numpy as np
+from BoardGraph import board
+from DistanceIndex import UNREACHABLE
+from MovementPlanner import MovementPlanner, room_turn_tables, MAX_TURNS
+
+ROOMS = sorted(board.room_locations)
+ROOM_SQUARES = [board.room_locations[room] for room in ROOMS]
+
+# probability of each total of two six-sided dice, counted over the 36 throws
+def roll_probabilities():
+    totals = np.add.outer(np.arange(1, 7), np.arange(1, 7)).ravel()
+    return {int(roll): float((totals == roll).mean()) for roll in np.unique(totals)}
+
+# expected turns from every square to each room, and the probability of having entered each room within 1 to max_turns
+# turns, by value iteration with the squares within each roll read from the distance table (and the room at the far end of
+# a secret passage reachable whatever the roll)
+def reference_room_tables(index, room_squares, passages, max_turns = MAX_TURNS):
+    distances = np.asarray(index.distances)
+    probabilities = roll_probabilities()
+    moves = {}
+    for roll in probabilities:
+        moves[roll] = distances <= roll
+        for square_a, square_b in passages:
+            moves[roll][square_a, square_b] = moves[roll][square_b, square_a] = True
+    in_room = np.zeros((index.n_squares, len(room_squares)), dtype = bool)
+    in_room[room_squares, np.arange(len(room_squares))] = True
+    turns = np.where(distances[:, room_squares] >= UNREACHABLE, np.inf, 0.0)
+    for iteration in range(1000):
+        new_turns = sum(probability * (1 + np.where(moves[roll][:, :, None], turns[None], np.inf).min(axis = 1))
+                        for roll, probability in probabilities.items())
+        new_turns[in_room] = 0.0
+        if np.allclose(new_turns, turns, atol = 1e-10, rtol = 0):
+            break
+        turns = new_turns
+    entered = in_room.astype(float)
+    entry_probabilities = []
+    for turn in range(max_turns):
+        entered = sum(probability * np.where(moves[roll][:, :, None], entered[None], 0.0).max(axis = 1)
+                      for roll, probability in probabilities.items())
+        entered[in_room] = 1.0
+        entry_probabilities.append(entered)
+    return turns, np.array(entry_probabilities)
+
+# a corridor square that no roll takes to the room at room_square
+def far_square(room_square):
+    distances = np.asarray(board.index.distances)[:, room_square]
+    return int(np.flatnonzero((distances > 12) & (distances < UNREACHABLE) & ~np.isin(np.arange(board.index.n_squares), ROOM_SQUARES))[0])
+
+# the planner's tables (computed, and as compiled with the board) match value iteration over the 2d6 distribution
+def test_room_turn_tables_match_reference():
+    expected_turns, expected_entries = reference_room_tables(board.index, ROOM_SQUARES, board.passage_squares)
+    turns, entries = room_turn_tables(board.index, ROOM_SQUARES, board.passage_squares)
+    assert np.allclose(turns, expected_turns, atol = 1e-4, rtol = 0)
+    assert np.allclose(entries, expected_entries, atol = 1e-9, rtol = 0)
+    planner = MovementPlanner(board, board.room_locations)
+    compiled_turns, compiled_entries = planner.room_tables()
+    assert np.allclose(compiled_turns, expected_turns, atol = 1e-4, rtol = 0)
+    assert np.allclose(compiled_entries, expected_entries, atol = 1e-9, rtol = 0)
+    # one turn from a room square is always spent, and a room out of reach of every roll is not entered in one turn
+    square = far_square(board.room_locations['Ballroom'])
+    assert planner.entry_probabilities(square, 1)['Ballroom'] == 0.0
+    assert planner.room_turns(square)['Ballroom'] > 1
+
+# tables for an overlay with extra edges match the reference on the overlay's distances
+def test_overlay_tables_match_reference():
+    ballroom = board.room_locations['Ballroom']
+    overlay = board.overlay().with_edges([(far_square(ballroom), ballroom)])
+    expected_turns, expected_entries = reference_room_tables(overlay.index, ROOM_SQUARES, board.passage_squares)
+    turns, entries = MovementPlanner(board, board.room_locations).room_tables(overlay)
+    assert np.allclose(turns, expected_turns, atol = 1e-4, rtol = 0)
+    assert np.allclose(entries, expected_entries, atol = 1e-9, rtol = 0)
+
+# levels targeting only one room
+def single_target(planner, room):
+    levels = np.full(len(planner.rooms), -1, dtype = np.int64)
+    levels[planner.rooms.index(room)] = 0
+    return levels
+
+# a decision cached for the board is not reused for an overlay with a passage to the target room, and the overlay's decision
+# does not replace the board's
+def test_decisions_follow_overlay_edges():
+    planner = MovementPlanner(board, board.room_locations)
+    ballroom = board.room_locations['Ballroom']
+    square = far_square(ballroom)
+    levels = single_target(planner, 'Ballroom')
+    moves, headings = planner.decide(square, 2, levels)
+    assert ballroom not in moves
+    overlay = board.overlay().with_edges([(square, ballroom)])
+    overlay_moves, overlay_headings = planner.decide(square, 2, levels, overlay)
+    assert list(overlay_moves) == [ballroom] and overlay_headings == ['Ballroom']
+    assert np.isclose(planner.room_turns(square, overlay)['Ballroom'], 1.0)
+    assert np.array_equal(planner.decide(square, 2, levels)[0], moves)
+
+# adding an edge to a board's index clears the decisions cached for it
+def test_decisions_cleared_when_index_changes():
+    own_board = type(board)(board.directory)
+    planner = MovementPlanner(own_board, own_board.room_locations)
+    ballroom = own_board.room_locations['Ballroom']
+    square = far_square(ballroom)
+    levels = single_target(planner, 'Ballroom')
+    assert ballroom not in planner.decide(square, 2, levels)[0]
+    own_board.add_edge(square, ballroom)
+    assert list(planner.decide(square, 2, levels)[0]) == [ballroom]
+    assert np.isclose(planner.room_turns(square)['Ballroom'], 1.0)
+    # the shared board is untouched
+    assert ballroom not in MovementPlanner(board, board.room_locations).decide(square, 2, levels)[0]
+
+# the decision cache keeps at most max_decisions entries, evicting the least recently used
+def test_decision_cache_is_bounded():
+    planner = MovementPlanner(board, board.room_locations, max_decisions = 4)
+    levels = single_target(planner, 'Kitchen')
+    for roll in range(2, 8):
+        planner.decide(far_square(board.room_locations['Kitchen']), roll, levels)
+    decisions = planner.tables()['decisions']
+    assert len(decisions) == 4
+    # the most recently decided rolls are the ones kept
+    assert [key // board.index.n_squares % 13 for key in decisions] == [4, 5, 6, 7]
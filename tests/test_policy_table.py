@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+from ClueDo import ClueGame
+from HeadlessGame import HeadlessGame
+from PolicyTable import PolicyTable, StateCounter, write_table, open_table
+from Tournament import play_game
+
+PLAYERS = ['Miss Scarlett', 'Colonel Mustard', 'Dr Orchid']
+STRATEGIES = {player: {'suggestion_samples': 0} for player in PLAYERS}
+CATEGORIES = (ClueGame.characters, ClueGame.weapons, ClueGame.locations)
+
+class CountingGame(HeadlessGame):
+
+    # a headless game counting the state of each bot at the start of its turns (as the table's build step does)
+    def __init__(self, counter, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.counter = counter
+
+    def take_turn(self, player):
+        self.counter.add(self.bots[player])
+        super().take_turn(player)
+
+class CheckedGame(HeadlessGame):
+
+    # a headless game checking, at the start of each turn, that the table's decisions are the ones made online
+    def __init__(self, table, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.table = table
+        self.n_hits = 0
+
+    def take_turn(self, player):
+        bot = self.bots[player]
+        bot.policy_table = self.table
+        if bot.policy_decisions() is not None:
+            self.n_hits += 1
+            looked_up = decisions(bot)
+            bot.policy_table = None
+            assert decisions(bot) == looked_up
+        bot.policy_table = None
+        super().take_turn(player)
+
+# the decisions a policy table can answer
+def decisions(bot):
+    return bot.get_top_suggestions(), [bot.find_best_card(category) for category in CATEGORIES], bot.find_best_player()
+
+@pytest.fixture(scope = 'module')
+def table_path(tmp_path_factory):
+    counter = StateCounter()
+    for seed in range(10):
+        CountingGame(counter, PLAYERS, seed, STRATEGIES, max_turns = 60).play()
+    path = str(tmp_path_factory.mktemp('policy') / 'policy.bin')
+    assert write_table(path, counter, ClueGame.registry.n_cards) == len(counter.counts)
+    return path
+
+def test_lookups_match_online_decisions(table_path):
+    table = PolicyTable(table_path, ClueGame.registry.n_cards)
+    n_hits = 0
+    # games not used to build the table, some with the players in other seats
+    for seed in range(100, 110):
+        game = CheckedGame(table, PLAYERS if seed % 2 else PLAYERS[::-1], seed, STRATEGIES, max_turns = 60)
+        game.play()
+        n_hits += game.n_hits
+    assert n_hits > 0
+
+def test_games_are_unchanged_by_the_table(table_path):
+    results = []
+    for table in (None, PolicyTable(table_path, ClueGame.registry.n_cards)):
+        strategies = {player: {**strategy, 'policy_table': table} for player, strategy in STRATEGIES.items()}
+        games = [HeadlessGame(PLAYERS, seed, strategies, max_turns = 60) for seed in range(5)]
+        results.append([(result.winner, result.n_turns, result.accusations) for result in (game.play() for game in games)])
+    assert table.n_hits > 0
+    assert results[0] == results[1]
+
+# a tournament game given a table hands it to its own bots, and leaves the other games in the process without one
+def test_table_is_given_to_the_game_only(table_path):
+    record = play_game(0, 100, PLAYERS, ['greedy'] * 3, max_turns = 60, policy_table = table_path)
+    assert ClueGame.policy_table is None
+    assert open_table(table_path, ClueGame.registry.n_cards).n_hits > 0
+    assert record['winner'] == play_game(0, 100, PLAYERS, ['greedy'] * 3, max_turns = 60)['winner']
+
+def test_misses_and_empty_tables(tmp_path):
+    path = str(tmp_path / 'empty.bin')
+    assert write_table(path, StateCounter(), ClueGame.registry.n_cards) == 0
+    table = PolicyTable(path, ClueGame.registry.n_cards)
+    bot = HeadlessGame(PLAYERS, 0, STRATEGIES).bots['Dr Orchid']
+    hand_sizes, constraints = bot.solver_inputs()
+    assert table.lookup(bot.knowledge, bot.envelope, hand_sizes, constraints, ClueGame.registry.card_categories) is None
+    assert (table.n_hits, table.n_misses) == (0, 1)
+    with pytest.raises(ValueError):
+        PolicyTable(path, ClueGame.registry.n_cards + 1)
+
+def test_most_common_states_are_kept(tmp_path):
+    counter = StateCounter()
+    for seed in range(3):
+        CountingGame(counter, PLAYERS, seed, STRATEGIES, max_turns = 30).play()
+    path = str(tmp_path / 'policy.bin')
+    assert write_table(path, counter, ClueGame.registry.n_cards, n_entries = 5) == 5
+    table = PolicyTable(path, ClueGame.registry.n_cards)
+    assert sorted(table.count, reverse = True) == sorted(counter.counts.values(), reverse = True)[:5]
+    digests = np.stack([table.high, table.low], axis = 1)
+    assert (table.high[1:] >= table.high[:-1]).all() and len(np.unique(digests, axis = 0)) == 5
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+from BoardGraph import board
+from DistanceIndex import DistanceIndex
+from Reachability import ReachabilityIndex, MAX_ROLL
+
+# random symmetric adjacency matrix, sparse enough to leave some squares unconnected
+def random_adjacency(rng, n_squares, density):
+    adjacency = np.triu(rng.random((n_squares, n_squares)) < density, 1)
+    return adjacency | adjacency.T
+
+# every query of a reachability index agrees with the distances of the same board
+def check_against_distances(reachability, distances, rng):
+    n_squares = distances.shape[0]
+    for roll in range(MAX_ROLL + 1):
+        expected = distances <= roll
+        assert np.array_equal(reachability.matrix(roll), expected)
+        assert np.array_equal(reachability.counts(np.arange(n_squares), roll), expected.sum(axis = 1))
+        square = int(rng.integers(n_squares))
+        assert np.array_equal(reachability.reachable(square, roll), np.flatnonzero(expected[square]))
+        squares = rng.choice(n_squares, size = 5, replace = False)
+        assert np.array_equal(reachability.union(squares, roll), expected[squares].any(axis = 0))
+    # queries broadcast over arrays of squares and rolls
+    sources, targets = rng.integers(n_squares, size = (2, 500))
+    rolls = rng.integers(MAX_ROLL + 1, size = 500)
+    assert np.array_equal(reachability.contains(sources, targets, rolls), distances[sources, targets] <= rolls)
+    assert np.array_equal(reachability.counts(sources, rolls), (distances[sources] <= rolls[:, None]).sum(axis = 1))
+    assert np.array_equal(reachability.masks(sources, rolls), distances[sources] <= rolls[:, None])
+
+@pytest.mark.parametrize('seed', range(5))
+def test_random_boards_match_distances(seed):
+    rng = np.random.default_rng(seed)
+    adjacency = random_adjacency(rng, 60, 0.04)
+    check_against_distances(ReachabilityIndex(adjacency), np.asarray(DistanceIndex(adjacency).distances), rng)
+
+def test_board_matches_distances():
+    check_against_distances(board.index.reachability, np.asarray(board.index.distances), np.random.default_rng(0))
+
+# rolls above the largest roll reach as far as the largest roll
+def test_rolls_are_capped():
+    reachability = board.index.reachability
+    assert np.array_equal(reachability.matrix(MAX_ROLL + 3), reachability.matrix(MAX_ROLL))
+
+# the index of an overlay, and of an index an edge is added to, is rebuilt from the new distances
+def test_rebuilt_after_edges_are_added():
+    rng = np.random.default_rng(1)
+    ballroom, study = board.room_locations['Ballroom'], board.room_locations['Study']
+    overlay = board.overlay().with_edges([(ballroom, study)])
+    assert overlay.reachability is not board.index.reachability
+    check_against_distances(overlay.reachability, np.asarray(overlay.index.distances), rng)
+    assert overlay.reachability.contains(ballroom, study, 1) and not board.index.reachability.contains(ballroom, study, 1)
+    index = DistanceIndex(board.index.adjacency, np.array(board.index.distances), np.array(board.index.next_hop))
+    before = index.reachability
+    index.add_edge(ballroom, study)
+    assert index.reachability is not before
+    check_against_distances(index.reachability, np.asarray(index.distances), rng)
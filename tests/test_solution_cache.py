@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+import Cards
+import problems
+from EnvelopeSolver import EnvelopeSolver
+from Knowledge import CardRegistry, NOT_HAS_CARD
+from SolutionCache import SolutionCache, CanonicalState, MISSING, open_cache
+
+registry = CardRegistry(Cards.characters, Cards.weapons, Cards.locations)
+solver = EnvelopeSolver(registry)
+
+# a random problem from partial knowledge of a deal, with some hand sizes unknown
+def random_problem(seed):
+    return problems.random_problem(seed, p_hand_size = 0.8)
+
+# the same problem with the players, and the cards within each category, in a random order
+def relabel(problem, rng):
+    knowledge, envelope_mask, hand_sizes, constraints = problem
+    player_order = rng.permutation(knowledge.shape[0])
+    card_order = np.arange(registry.n_cards)
+    for category_slice in registry.category_slices.values():
+        card_order[category_slice] = rng.permutation(np.arange(category_slice.start, category_slice.stop))
+    player_position, card_position = np.argsort(player_order), np.argsort(card_order)
+    constraints = [(int(player_position[player_id]), sum(1 << int(card_position[card_id]) for card_id in range(registry.n_cards) if mask >> card_id & 1))
+                   for player_id, mask in constraints]
+    return knowledge[player_order][:, card_order], envelope_mask[card_order], [hand_sizes[player_id] for player_id in player_order], constraints
+
+def same_result(result, expected):
+    if expected is None:
+        return result is None
+    return np.array_equal(result.probabilities, expected.probabilities) and np.array_equal(result.envelope_certain, expected.envelope_certain)
+
+# answers from the cache, for the state that was solved or a relabelling of it, are the solver's answers
+@pytest.mark.parametrize('seed', range(30))
+def test_cached_answers_match_solver(tmp_path, seed):
+    cache = SolutionCache(str(tmp_path / 'cache.bin'), registry.n_cards, n_sets = 16, ways = 2)
+    rng = np.random.default_rng(seed)
+    problem = random_problem(seed)
+    assert same_result(cache.solve(solver, *problem), solver.solve(*problem))
+    assert same_result(cache.solve(solver, *problem), solver.solve(*problem))
+    assert cache.n_hits == 1
+    for i in range(3):
+        relabelled = relabel(problem, rng)
+        assert same_result(cache.solve(solver, *relabelled), solver.solve(*relabelled))
+    cache.close()
+
+# equal digests mean equivalent states, and relabelled states mostly get the digest of the original
+def test_digests_are_invariant_under_relabelling():
+    rng = np.random.default_rng(0)
+    n_same = 0
+    for seed in range(100):
+        problem = random_problem(seed)
+        digest = CanonicalState(*problem, registry.card_categories).digest
+        relabelled = relabel(problem, rng)
+        n_same += CanonicalState(*relabelled, registry.card_categories).digest == digest
+        # a change to the knowledge changes the digest
+        knowledge = problem[0].copy()
+        player_id, card_id = np.argwhere(knowledge == 0)[0]
+        knowledge[player_id, card_id] = NOT_HAS_CARD
+        assert CanonicalState(knowledge, *problem[1:], registry.card_categories).digest != digest
+    assert n_same >= 90
+
+def test_least_recently_used_entry_is_replaced(tmp_path):
+    cache = SolutionCache(str(tmp_path / 'cache.bin'), registry.n_cards, n_sets = 1, ways = 2)
+    states = [CanonicalState(*random_problem(seed), registry.card_categories) for seed in range(3)]
+    results = [solver.solve(*random_problem(seed)) for seed in range(3)]
+    cache.put(states[0], results[0])
+    cache.put(states[1], results[1])
+    assert cache.get(states[0]) is not MISSING
+    cache.put(states[2], results[2])
+    assert cache.get(states[1]) is MISSING
+    assert cache.get(states[0]) is not MISSING and cache.get(states[2]) is not MISSING
+    cache.close()
+
+def test_cache_file_is_reopened(tmp_path):
+    path = str(tmp_path / 'cache.bin')
+    problem = random_problem(1)
+    cache = SolutionCache(path, registry.n_cards, n_sets = 8, ways = 2)
+    cache.solve(solver, *problem)
+    cache.close()
+    # the file's own geometry is kept
+    cache = SolutionCache(path, registry.n_cards, n_sets = 64, ways = 4)
+    assert (cache.n_sets, cache.ways) == (8, 2)
+    assert same_result(cache.get(CanonicalState(*problem, registry.card_categories)), solver.solve(*problem))
+    cache.close()
+    with pytest.raises(ValueError):
+        SolutionCache(path, registry.n_cards + 1)
+    assert open_cache(path, registry.n_cards) is open_cache(path, registry.n_cards)
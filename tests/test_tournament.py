@@ -0,0 +1,36 @@
+import time
+from ClueDo import ClueGame
+from Tournament import Tournament, play_game, STRATEGIES
+from SolutionCache import open_cache
+
+# a game's summary without its timings
+def outcome(record):
+    return {**record, 'seats': [{key: value for key, value in seat.items() if key != 'compute_s'} for seat in record['seats']]}
+
+# a small tournament of every strategy runs in seconds, and replays exactly from its seed
+def test_tournament_is_quick_and_reproducible():
+    tournament = Tournament(ClueGame.player_order[:3], sorted(STRATEGIES), max_turns = 60)
+    start = time.perf_counter()
+    records = list(tournament.games(3, seed = 0))
+    assert time.perf_counter() - start < 30
+    assert [outcome(record) for record in records] == [outcome(record) for record in tournament.games(3, seed = 0)]
+    stats = tournament.run(3, seed = 0)
+    assert stats.n_games == 3
+    assert {row['strategy'] for row in stats.summary()['rows']} == set(STRATEGIES)
+
+# suggestions in six player games, where few random deals are consistent, cost a bounded time without a time budget
+def test_six_player_games_take_bounded_time():
+    start = time.perf_counter()
+    record = play_game(0, 5, ClueGame.player_order, ['information'] * 6, max_turns = 30)
+    assert time.perf_counter() - start < 30
+    assert record['n_turns'] > 0
+
+# a game given a solution cache hands it to its own bots, and leaves the other games in the process without one
+def test_solution_cache_is_given_to_the_game_only(tmp_path):
+    path = str(tmp_path / 'solutions.cache')
+    first = play_game(0, 1, ClueGame.player_order[:3], ['greedy'] * 3, max_turns = 20, solution_cache = path)
+    assert ClueGame.solution_cache is None
+    cache = open_cache(path, ClueGame.registry.n_cards)
+    assert cache.n_hits + cache.n_misses > 0
+    # the cache changes how states are solved, not what is decided
+    assert outcome(first) == outcome(play_game(0, 1, ClueGame.player_order[:3], ['greedy'] * 3, max_turns = 20))